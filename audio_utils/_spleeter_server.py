@@ -0,0 +1,91 @@
+"""
+常驻 Spleeter 分离进程（运行在 spleeter conda 环境中，Python 3.8）
+
+模型只加载一次，通过 stdin/stdout 上的 JSON 行协议为主进程服务：
+    {"cmd": "ping"}
+    {"cmd": "separate", "input": "...", "output_dir": "...", "codec": "wav",
+     "offset": 0.0, "duration": null,
+     "outputs": {"vocals": "...", "accompaniment": "..."}}   # outputs 可选
+    {"cmd": "quit"}
+每个请求回一行 JSON：{"ok": true, ...} 或 {"ok": false, "error": "..."}。
+
+注意：本文件由 spleeter 环境的解释器直接执行，不能依赖项目内其他模块。
+"""
+import json
+import os
+import sys
+import traceback
+
+
+def _open_protocol_channel():
+    # TensorFlow/Spleeter 会往 stdout 打日志，先把真正的 stdout 留给协议，
+    # 再把 fd 1 指向 stderr，避免日志混进响应行
+    proto = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    return proto
+
+
+def main():
+    proto = _open_protocol_channel()
+    model = os.environ.get("SPLEETER_MODEL", "spleeter:2stems")
+
+    try:
+        import numpy as np
+        from spleeter.audio.adapter import AudioAdapter
+        from spleeter.separator import Separator
+
+        separator = Separator(model, multiprocess=False)
+        adapter = AudioAdapter.default()
+        sample_rate = 44100
+        # 预热：触发模型加载，后续请求不再付这部分开销
+        separator.separate(np.zeros((sample_rate, 2), dtype=np.float32))
+    except Exception as exc:
+        proto.write(json.dumps({"ok": False, "error": "init failed: {}".format(exc)}) + "\n")
+        return 1
+
+    proto.write(json.dumps({"ok": True, "ready": True, "pid": os.getpid(), "model": model}) + "\n")
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+            cmd = req.get("cmd")
+            if cmd == "ping":
+                resp = {"ok": True, "pid": os.getpid()}
+            elif cmd == "quit":
+                proto.write(json.dumps({"ok": True}) + "\n")
+                break
+            elif cmd == "separate":
+                waveform, _ = adapter.load(
+                    req["input"],
+                    offset=float(req.get("offset") or 0.0),
+                    duration=req.get("duration"),
+                    sample_rate=sample_rate,
+                )
+                prediction = separator.separate(waveform)
+                codec = req.get("codec") or "wav"
+                out_dir = req["output_dir"]
+                outputs = req.get("outputs") or {}
+                os.makedirs(out_dir, exist_ok=True)
+                resp = {"ok": True}
+                for instrument, data in prediction.items():
+                    path = outputs.get(instrument) or os.path.join(out_dir, "{}.{}".format(instrument, codec))
+                    out_parent = os.path.dirname(path)
+                    if out_parent:
+                        os.makedirs(out_parent, exist_ok=True)
+                    adapter.save(path, data, sample_rate, codec, req.get("bitrate") or "192k")
+                    resp[instrument] = path
+            else:
+                resp = {"ok": False, "error": "unknown cmd: {}".format(cmd)}
+        except Exception as exc:
+            traceback.print_exc()
+            resp = {"ok": False, "error": str(exc)}
+        proto.write(json.dumps(resp) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vidgostream", "separation")
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+_digest_memo: Dict[Tuple[str, int, float], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """音频内容的 sha256（同一进程内按 路径/大小/mtime 记忆，重复调用不再读文件）"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def _place(src: str, dst: str) -> None:
+    """
+    把缓存文件复制到工作目录（先写临时文件再 rename）
+
+    不用硬链接：工作目录里的文件之后可能被原地覆盖写（生成房间底噪、用户编辑），
+    与缓存共用 inode 时会把缓存一起写坏。
+    """
+    dst_dir = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(dst_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dst_dir, suffix=".part")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        # 替换而不是覆盖写：旧版本留下的硬链接在这里被断开
+        os.replace(tmp, dst)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class SeparationCache:
+    """
+    人声/背景分离结果缓存
+
+    键 = 输入音频内容哈希 + 分离模式 + 模型；同一个键下按输出扩展名分别存放 stems。
+    总大小超过 max_bytes 时按最近使用时间淘汰整条记录。
+
+    目录与上限可用环境变量 VIDGO_SEPARATION_CACHE / VIDGO_SEPARATION_CACHE_MB 覆盖。
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.environ.get("VIDGO_SEPARATION_CACHE") or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            env_mb = os.environ.get("VIDGO_SEPARATION_CACHE_MB")
+            max_bytes = int(env_mb) * 1024 ** 2 if env_mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, input_audio_path: str, mode: str, model: str) -> str:
+        raw = f"{file_digest(input_audio_path)}|{mode}|{model}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _entry_paths(self, key: str, vocals_output_path: str, background_output_path: str) -> Tuple[str, str, str]:
+        entry = os.path.join(self.root, key)
+        vocals_ext = os.path.splitext(vocals_output_path)[1].lower()
+        bg_ext = os.path.splitext(background_output_path)[1].lower()
+        return entry, os.path.join(entry, f"vocals{vocals_ext}"), os.path.join(entry, f"background{bg_ext}")
+
+    def fetch(self, key: str, vocals_output_path: str, background_output_path: str) -> bool:
+        entry, vocals_cached, bg_cached = self._entry_paths(key, vocals_output_path, background_output_path)
+        if not (os.path.exists(vocals_cached) and os.path.exists(bg_cached)):
+            return False
+        try:
+            _place(vocals_cached, vocals_output_path)
+            _place(bg_cached, background_output_path)
+            # 刷新使用时间，供 LRU 淘汰
+            now = time.time()
+            os.utime(entry, (now, now))
+            return True
+        except OSError as exc:
+            print(f"⚠ 读取分离缓存失败: {exc}")
+            return False
+
+    def store(self, key: str, vocals_output_path: str, background_output_path: str) -> None:
+        entry, vocals_cached, bg_cached = self._entry_paths(key, vocals_output_path, background_output_path)
+        try:
+            os.makedirs(entry, exist_ok=True)
+            # 先写临时文件再 rename，避免并发任务读到写了一半的缓存
+            for src, dst in ((vocals_output_path, vocals_cached), (background_output_path, bg_cached)):
+                fd, tmp = tempfile.mkstemp(dir=entry, suffix=".part")
+                os.close(fd)
+                shutil.copy2(src, tmp)
+                os.replace(tmp, dst)
+            now = time.time()
+            os.utime(entry, (now, now))
+        except OSError as exc:
+            print(f"⚠ 写入分离缓存失败: {exc}")
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            size = 0
+            for fname in os.listdir(path):
+                try:
+                    size += os.path.getsize(os.path.join(path, fname))
+                except OSError:
+                    pass
+            entries.append((os.path.getmtime(path), size, path))
+            total += size
+
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
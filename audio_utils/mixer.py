@@ -0,0 +1,95 @@
+"""
+背景声 + 配音混音（NumPy，进程内）
+
+直接在 PCM 上做：配音包络驱动背景“闪避”（sidechain ducking），说话时背景压低、
+停顿时恢复；整条增益曲线一次向量化算出，最后只编码一次输出。
+"""
+from typing import Optional
+
+import numpy as np
+
+from .pcm import read_audio, write_audio
+
+
+def duck_gain(
+    speech: np.ndarray,
+    sample_rate: int,
+    duck_db: float = -8.0,
+    threshold_db: float = -40.0,
+    attack_ms: float = 40.0,
+    release_ms: float = 350.0,
+    frame_ms: float = 10.0,
+) -> np.ndarray:
+    """
+    根据配音包络计算背景增益曲线（逐采样，线性值）
+
+    - 帧 RMS 超过 threshold_db 视为在说话
+    - 说话区间向前扩 attack_ms（提前压低，避免第一个字被背景盖住），向后扩 release_ms（停顿后再缓慢恢复）
+    - 再用 attack_ms 长度的滑动平均抹平跳变，避免咔哒声
+    """
+    if speech.ndim == 2:
+        speech = speech.mean(axis=1)
+    hop = max(1, int(sample_rate * frame_ms / 1000.0))
+    n_frames = max(1, int(np.ceil(len(speech) / hop)))
+    padded = np.zeros(n_frames * hop, dtype=np.float32)
+    padded[:len(speech)] = speech
+
+    rms_db = 10.0 * np.log10(np.mean(padded.reshape(n_frames, hop) ** 2, axis=1) + 1e-12)
+    active = (rms_db > threshold_db).astype(np.float32)
+
+    attack = max(1, int(round(attack_ms / frame_ms)))
+    release = max(1, int(round(release_ms / frame_ms)))
+    # 非对称膨胀：卷积核覆盖 [-release, +attack]，只要窗口内有语音就算“压低”
+    kernel = np.ones(attack + release + 1, dtype=np.float32)
+    spread = np.convolve(active, kernel, mode="full")[attack:attack + n_frames] > 0
+    smooth = np.convolve(spread.astype(np.float32), np.ones(attack) / attack, mode="same")
+
+    duck = 10.0 ** (duck_db / 20.0)
+    frame_gain = 1.0 - (1.0 - duck) * np.clip(smooth, 0.0, 1.0)
+
+    centers = (np.arange(n_frames) + 0.5) * hop
+    return np.interp(np.arange(len(speech)), centers, frame_gain).astype(np.float32)
+
+
+def mix_arrays(
+    background: np.ndarray,
+    speech: np.ndarray,
+    sample_rate: int,
+    bg_volume: float = 0.35,
+    tts_volume: float = 1.0,
+    duck_db: Optional[float] = -8.0,
+) -> np.ndarray:
+    """两路 (samples, channels) PCM 混音，长度取较短者（与 ffmpeg -shortest 一致）"""
+    n = min(len(background), len(speech))
+    bg = background[:n]
+    sp = speech[:n]
+    if sp.shape[1] != bg.shape[1]:
+        sp = np.repeat(sp.mean(axis=1, keepdims=True), bg.shape[1], axis=1)
+
+    gain = np.full(n, bg_volume, dtype=np.float32)
+    if duck_db is not None and duck_db < 0:
+        gain *= duck_gain(sp, sample_rate, duck_db=duck_db)
+
+    mixed = bg * gain[:, None] + sp * tts_volume
+    return np.clip(mixed, -1.0, 1.0)
+
+
+def mix_background_and_tts(
+    bg_audio_path: str,
+    tts_audio_path: str,
+    out_audio_path: str,
+    bg_volume: float = 0.35,
+    tts_volume: float = 1.0,
+    duck_db: Optional[float] = -8.0,
+    sample_rate: int = 44100,
+) -> bool:
+    try:
+        background = read_audio(bg_audio_path, sample_rate=sample_rate, channels=2)
+        speech = read_audio(tts_audio_path, sample_rate=sample_rate, channels=2)
+        mixed = mix_arrays(background, speech, sample_rate,
+                           bg_volume=bg_volume, tts_volume=tts_volume, duck_db=duck_db)
+        write_audio(out_audio_path, mixed, sample_rate)
+        return True
+    except Exception as exc:
+        print(f"背景声混音失败: {exc}")
+        return False
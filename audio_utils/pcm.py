@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from utils.ffmpeg_runner import run_ffmpeg
+
+from .separator import _select_codec_args
+
+
+def read_audio(path: str, sample_rate: int = 44100, channels: int = 2) -> np.ndarray:
+    """用 ffmpeg 解码为 float32 PCM，返回形状 (samples, channels) 的数组"""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-i", path,
+        "-f", "f32le",
+        "-acodec", "pcm_f32le",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    res = run_ffmpeg(cmd, capture_output=True)
+    return np.frombuffer(res.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+def write_audio(path: str, data: np.ndarray, sample_rate: int = 44100) -> None:
+    """把 (samples, channels) 的 float PCM 一次编码写出，编码格式按扩展名选择"""
+    if data.ndim == 1:
+        data = data[:, None]
+    channels = data.shape[1]
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "f32le",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-i", "pipe:0",
+    ]
+    cmd += _select_codec_args(path)
+    cmd.append(path)
+    pcm = np.ascontiguousarray(np.clip(data, -1.0, 1.0), dtype=np.float32)
+    # ffmpeg -y 会原地截断重写；旧文件可能是指向分离缓存的硬链接，先删掉
+    if os.path.exists(path):
+        os.remove(path)
+    run_ffmpeg(cmd, input=pcm.tobytes())
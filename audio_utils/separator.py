@@ -1,38 +1,26 @@
 import os
 import shutil
 import subprocess
-from typing import Optional
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
-DEFAULT_SPLEETER_PYTHON = "/Users/liumeng/miniconda3/envs/spleeter/bin/python"
+from utils.ffmpeg_runner import probe_audio_channels, probe_duration, run_ffmpeg
 
+from .cache import SeparationCache
+from .spleeter_worker import SpleeterWorkerError, get_worker
 
-def _probe_channels(audio_path: str) -> Optional[int]:
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=channels",
-        "-of", "default=nw=1:nk=1",
-        audio_path,
-    ]
-    try:
-        res = subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-        )
-    except Exception:
-        return None
+DEFAULT_SPLEETER_PYTHON = "/Users/liumeng/miniconda3/envs/spleeter/bin/python"
 
-    value = res.stdout.strip()
-    if not value:
-        return None
-    try:
-        return int(value)
-    except ValueError:
-        return None
+# 分离模式 -> 模型标识（参与缓存键，换模型后旧缓存自然失效）
+SEPARATION_MODELS = {
+    "spleeter": "spleeter:2stems",
+    "center_cancel": "ffmpeg-pan",
+    "stft": "numpy-stft-hpss-v1",
+}
+
+# spleeter 能直接写出的编码格式
+SPLEETER_CODECS = {"wav", "mp3", "ogg", "m4a", "wma", "flac"}
 
 
 def _select_codec_args(output_path: str) -> list:
@@ -44,65 +32,202 @@ def _select_codec_args(output_path: str) -> list:
     return []
 
 
+def _resolve_spleeter_cmd(spleeter_python: Optional[str] = None) -> Optional[List[str]]:
+    if spleeter_python:
+        return [spleeter_python, "-m", "spleeter"]
+
+    spleeter_bin = shutil.which("spleeter")
+    if spleeter_bin:
+        return [spleeter_bin]
+
+    conda_bin = shutil.which("conda")
+    if conda_bin:
+        return [conda_bin, "run", "-n", "spleeter", "spleeter"]
+
+    return None
+
+
+def _spleeter_codec(path: str) -> Optional[str]:
+    """输出扩展名对应的 spleeter 编码；spleeter 不能直接写的格式返回 None"""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return ext if ext in SPLEETER_CODECS else None
+
+
+def _spleeter_cli_separate(
+    cmd_base: List[str],
+    input_audio_path: str,
+    out_root: str,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+    codec: str = "wav",
+) -> Tuple[str, str]:
+    # spleeter CLI 默认 -d 600，会把长音频静默截断，这里总是显式给出时长
+    if duration is None:
+        duration = (probe_duration(input_audio_path) or 86400.0) + 1.0
+    cmd = cmd_base + [
+        "separate",
+        "-p", "spleeter:2stems",
+        "-o", out_root,
+        "-c", codec,
+        "-b", "192k",
+        "-f", "{instrument}.{codec}",
+        "-s", f"{offset:.3f}",
+        "-d", f"{duration:.3f}",
+        input_audio_path,
+    ]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    vocals_src = os.path.join(out_root, f"vocals.{codec}")
+    bg_src = os.path.join(out_root, f"accompaniment.{codec}")
+    if not os.path.exists(vocals_src) or not os.path.exists(bg_src):
+        raise RuntimeError("spleeter 输出文件缺失")
+    return vocals_src, bg_src
+
+
+def _separate_window(
+    input_audio_path: str,
+    out_root: str,
+    spleeter_python: Optional[str],
+    use_worker: bool,
+    slot: int = 0,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+    codec: str = "wav",
+    outputs: Optional[Tuple[str, str]] = None,
+) -> Tuple[str, str]:
+    """
+    分离 [offset, offset+duration) 这一段，返回 (vocals, accompaniment) 路径；优先走常驻 worker
+
+    给出 outputs=(人声路径, 背景路径) 时，worker 直接按 codec 写到这两个路径；
+    命令行 spleeter 只能写到 out_root 下，由调用方移动到位
+    """
+    if use_worker:
+        worker = get_worker(spleeter_python, slot=slot)
+        if worker is not None:
+            try:
+                return worker.separate(
+                    input_audio_path,
+                    out_root,
+                    codec=codec,
+                    offset=offset,
+                    duration=duration,
+                    outputs=outputs,
+                )
+            except (SpleeterWorkerError, OSError) as exc:
+                print(f"提示: 常驻 spleeter 进程不可用({exc})，改用命令行 spleeter")
+
+    cmd_base = _resolve_spleeter_cmd(spleeter_python)
+    if cmd_base is None:
+        raise RuntimeError(
+            "未找到 spleeter；可设置环境变量 SPLEETER_PYTHON 指向含 spleeter 的 python，"
+            "或确保 conda 环境名为 spleeter 并可用 `conda run -n spleeter`"
+        )
+    return _spleeter_cli_separate(cmd_base, input_audio_path, out_root, offset=offset, duration=duration, codec=codec)
+
+
+def _plan_windows(total: float, chunk_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """切成 (offset, duration) 窗口：每个窗口比步长多 overlap 秒，与下一个窗口重叠用于交叉淡化"""
+    windows = []
+    offset = 0.0
+    while offset < total:
+        duration = min(chunk_seconds + overlap_seconds, total - offset)
+        windows.append((offset, duration))
+        offset += chunk_seconds
+    # 最后一个窗口太短时并入前一个，避免交叉淡化长度超过窗口本身
+    if len(windows) > 1 and windows[-1][1] <= overlap_seconds * 2:
+        last_offset, _ = windows[-2]
+        windows[-2:] = [(last_offset, total - last_offset)]
+    return windows
+
+
+def _crossfade_concat(parts: List[str], output_path: str, overlap_seconds: float) -> None:
+    cmd = ["ffmpeg", "-y"]
+    for part in parts:
+        cmd += ["-i", part]
+
+    if len(parts) == 1:
+        cmd += ["-map", "0:a"]
+    else:
+        chain = []
+        prev = "[0:a]"
+        for i in range(1, len(parts)):
+            label = f"[x{i}]"
+            chain.append(f"{prev}[{i}:a]acrossfade=d={overlap_seconds}:c1=tri:c2=tri{label}")
+            prev = label
+        cmd += ["-filter_complex", ";".join(chain), "-map", prev]
+
+    cmd += _select_codec_args(output_path)
+    cmd.append(output_path)
+    run_ffmpeg(cmd)
+
+
 def _separate_with_spleeter(
     input_audio_path: str,
     vocals_output_path: str,
     background_output_path: str,
     spleeter_python: Optional[str] = None,
+    use_worker: bool = True,
+    chunk_seconds: float = 300.0,
+    overlap_seconds: float = 5.0,
+    max_workers: Optional[int] = None,
 ) -> bool:
-    cmd_base = None
-    if spleeter_python:
-        cmd_base = [spleeter_python, "-m", "spleeter"]
+    """
+    长音频按 chunk_seconds 切成重叠窗口，多个 spleeter 进程并行分离，再交叉淡化拼接；
+    每个进程一次只处理一个窗口，内存占用与总时长无关。
+    """
+    total = probe_duration(input_audio_path)
+    if total and total > chunk_seconds + overlap_seconds:
+        windows = _plan_windows(total, chunk_seconds, overlap_seconds)
     else:
-        spleeter_bin = shutil.which("spleeter")
-        if spleeter_bin:
-            cmd_base = [spleeter_bin]
-
-    if cmd_base is None:
-        conda_bin = shutil.which("conda")
-        if conda_bin:
-            cmd_base = [conda_bin, "run", "-n", "spleeter", "spleeter"]
+        windows = [(0.0, None)]
 
-    if cmd_base is None:
-        print("提示: 未找到 spleeter")
-        print("提示: 可设置环境变量 SPLEETER_PYTHON 指向含 spleeter 的 python")
-        print("提示: 或确保 conda 环境名为 spleeter 并可用 `conda run -n spleeter`")
-        return False
+    if max_workers is None:
+        max_workers = max(1, min(4, (os.cpu_count() or 2) // 2))
+    max_workers = max(1, min(max_workers, len(windows)))
 
-    tmp_root = os.path.join(
-        os.path.dirname(os.path.abspath(input_audio_path)),
-        "_spleeter_tmp",
+    # 每次调用独立的临时目录（放在输出旁边，便于同盘 rename），并发任务互不干扰
+    tmp_root = tempfile.mkdtemp(
+        prefix="_spleeter_tmp_",
+        dir=os.path.dirname(os.path.abspath(vocals_output_path)),
     )
     try:
-        os.makedirs(tmp_root, exist_ok=True)
-        cmd = cmd_base + [
-            "separate",
-            "-p", "spleeter:2stems",
-            "-o", tmp_root,
-            input_audio_path,
-        ]
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        base = os.path.splitext(os.path.basename(input_audio_path))[0]
-        out_dir = os.path.join(tmp_root, base)
-        vocals_src = os.path.join(out_dir, "vocals.wav")
-        bg_src = os.path.join(out_dir, "accompaniment.wav")
-        if not os.path.exists(vocals_src) or not os.path.exists(bg_src):
-            print("spleeter 输出文件缺失")
-            return False
-
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", vocals_src] + _select_codec_args(vocals_output_path) + [vocals_output_path],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", bg_src] + _select_codec_args(background_output_path) + [background_output_path],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        codec = _spleeter_codec(vocals_output_path)
+        if len(windows) == 1 and codec and codec == _spleeter_codec(background_output_path):
+            # 单窗口：spleeter 直接按目标格式输出，省掉 WAV 中转和两次 ffmpeg 重编码
+            vocals_src, bg_src = _separate_window(
+                input_audio_path,
+                tmp_root,
+                spleeter_python,
+                use_worker,
+                codec=codec,
+                outputs=(vocals_output_path, background_output_path),
+            )
+            for src, dst in ((vocals_src, vocals_output_path), (bg_src, background_output_path)):
+                if os.path.abspath(src) != os.path.abspath(dst):
+                    shutil.move(src, dst)
+            return True
+
+        if len(windows) > 1:
+            print(f"音频时长 {total:.0f}s，切成 {len(windows)} 段，{max_workers} 路并行分离")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(
+                    _separate_window,
+                    input_audio_path,
+                    os.path.join(tmp_root, f"{i:04d}"),
+                    spleeter_python,
+                    use_worker,
+                    i % max_workers,
+                    offset,
+                    duration,
+                )
+                for i, (offset, duration) in enumerate(windows)
+            ]
+            stems = [f.result() for f in futures]
+
+        _crossfade_concat([v for v, _ in stems], vocals_output_path, overlap_seconds)
+        _crossfade_concat([b for _, b in stems], background_output_path, overlap_seconds)
         return True
     except Exception as exc:
         print(f"spleeter 分离失败: {exc}")
@@ -111,32 +236,12 @@ def _separate_with_spleeter(
         shutil.rmtree(tmp_root, ignore_errors=True)
 
 
-def separate_vocals_background(
+def _separate_center_cancel(
     input_audio_path: str,
     vocals_output_path: str,
     background_output_path: str,
-    mode: str = "spleeter",
-    spleeter_python: Optional[str] = None,
 ) -> bool:
-    if not os.path.exists(input_audio_path):
-        print(f"错误: 输入音频不存在: {input_audio_path}")
-        return False
-
-    if mode == "spleeter":
-        return _separate_with_spleeter(
-            input_audio_path=input_audio_path,
-            vocals_output_path=vocals_output_path,
-            background_output_path=background_output_path,
-            spleeter_python=spleeter_python
-            or os.environ.get("SPLEETER_PYTHON")
-            or DEFAULT_SPLEETER_PYTHON,
-        )
-
-    if mode != "center_cancel":
-        print(f"不支持的分离模式: {mode}")
-        return False
-
-    channels = _probe_channels(input_audio_path)
+    channels = probe_audio_channels(input_audio_path)
     if not channels or channels < 2:
         print("提示: 需要立体声才能做 center_cancel")
         return False
@@ -163,13 +268,78 @@ def separate_vocals_background(
     cmd.append(background_output_path)
 
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_ffmpeg(cmd)
         return True
     except Exception as exc:
         print(f"分离失败: {exc}")
         return False
 
 
+def separate_vocals_background(
+    input_audio_path: str,
+    vocals_output_path: str,
+    background_output_path: str,
+    mode: str = "spleeter",
+    spleeter_python: Optional[str] = None,
+    use_worker: bool = True,
+    chunk_seconds: float = 300.0,
+    overlap_seconds: float = 5.0,
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+    cache: Optional[SeparationCache] = None,
+) -> bool:
+    if not os.path.exists(input_audio_path):
+        print(f"错误: 输入音频不存在: {input_audio_path}")
+        return False
+
+    model = SEPARATION_MODELS.get(mode)
+    if model is None:
+        print(f"不支持的分离模式: {mode}")
+        return False
+
+    # 分离结果只取决于源音频，命中缓存直接返回
+    cache_key = None
+    if use_cache:
+        try:
+            cache = cache or SeparationCache()
+            cache_key = cache.key(input_audio_path, mode, model)
+            if cache.fetch(cache_key, vocals_output_path, background_output_path):
+                print(f"✓ 命中分离缓存 ({mode})")
+                return True
+        except OSError as exc:
+            print(f"⚠ 分离缓存不可用: {exc}")
+            cache_key = None
+
+    # 旧版本放置的输出可能是指向缓存的硬链接，先删掉再写，免得覆盖写坏缓存
+    for path in (vocals_output_path, background_output_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    if mode == "spleeter":
+        ok = _separate_with_spleeter(
+            input_audio_path=input_audio_path,
+            vocals_output_path=vocals_output_path,
+            background_output_path=background_output_path,
+            spleeter_python=spleeter_python
+            or os.environ.get("SPLEETER_PYTHON")
+            or DEFAULT_SPLEETER_PYTHON,
+            use_worker=use_worker,
+            chunk_seconds=chunk_seconds,
+            overlap_seconds=overlap_seconds,
+            max_workers=max_workers,
+        )
+    elif mode == "stft":
+        # NumPy 仅此模式需要，按需导入
+        from .stft_separator import separate_stft
+        ok = separate_stft(input_audio_path, vocals_output_path, background_output_path)
+    else:
+        ok = _separate_center_cancel(input_audio_path, vocals_output_path, background_output_path)
+
+    if ok and cache_key is not None:
+        cache.store(cache_key, vocals_output_path, background_output_path)
+    return ok
+
+
 if __name__ == "__main__":
     input_path = "data/test2.mp3"
     ok = separate_vocals_background(
@@ -0,0 +1,232 @@
+import atexit
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_spleeter_server.py")
+PRETRAINED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pretrained_models")
+
+
+class SpleeterWorkerError(RuntimeError):
+    pass
+
+
+def build_worker_command(spleeter_python: Optional[str] = None) -> Optional[List[str]]:
+    """找到能运行常驻分离进程的解释器：显式 python > PATH 上 spleeter 同目录的 python > conda 环境"""
+    if spleeter_python and os.path.exists(spleeter_python):
+        return [spleeter_python, "-u", SERVER_SCRIPT]
+
+    spleeter_bin = shutil.which("spleeter")
+    if spleeter_bin:
+        sibling = os.path.join(os.path.dirname(spleeter_bin), "python")
+        if os.path.exists(sibling):
+            return [sibling, "-u", SERVER_SCRIPT]
+
+    conda_bin = shutil.which("conda")
+    if conda_bin:
+        # --no-capture-output: 否则 conda run 会缓冲 stdout，协议行要等进程退出才出来
+        return [conda_bin, "run", "--no-capture-output", "-n", "spleeter", "python", "-u", SERVER_SCRIPT]
+
+    return None
+
+
+class SpleeterWorker:
+    """
+    常驻 Spleeter 进程的客户端
+
+    模型在子进程里只加载一次；每次请求前做存活检查，进程挂掉或请求超时会自动重启并重试一次。
+    """
+
+    def __init__(self, command: List[str], startup_timeout: float = 600.0,
+                 request_timeout: float = 3600.0, ping_timeout: float = 10.0):
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.ping_timeout = ping_timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        # 一个进程同一时间只处理一个请求
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # 进程管理
+    # ---------------------------
+    def start(self) -> None:
+        # 同一命令启动失败过（环境坏了/缺模型），不再每个窗口都等一次 startup_timeout
+        failure = _failed_start(self.command)
+        if failure is not None:
+            raise SpleeterWorkerError(f"此前启动失败: {failure}")
+        try:
+            self._start()
+        except (SpleeterWorkerError, OSError) as exc:
+            # 启动超时时子进程可能还活着
+            self.close()
+            _mark_failed_start(self.command, str(exc))
+            raise
+
+    def _start(self) -> None:
+        env = os.environ.copy()
+        if "MODEL_PATH" not in env and os.path.isdir(PRETRAINED_DIR):
+            env["MODEL_PATH"] = PRETRAINED_DIR
+
+        self._lines = queue.Queue()
+        self._proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            env=env,
+        )
+        threading.Thread(target=self._pump, args=(self._proc, self._lines), daemon=True).start()
+
+        ready = self._read(self.startup_timeout)
+        if not ready.get("ok"):
+            self.close()
+            raise SpleeterWorkerError(ready.get("error", "spleeter worker 启动失败"))
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]") -> None:
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def ping(self) -> bool:
+        if not self.is_alive():
+            return False
+        try:
+            return bool(self._call({"cmd": "ping"}, self.ping_timeout).get("ok"))
+        except SpleeterWorkerError:
+            return False
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.poll() is None:
+            try:
+                proc.stdin.write(json.dumps({"cmd": "quit"}) + "\n")
+                proc.stdin.flush()
+                proc.wait(timeout=5)
+            except Exception:
+                proc.kill()
+                proc.wait()
+
+    def restart(self) -> None:
+        self.close()
+        self.start()
+
+    # ---------------------------
+    # 请求
+    # ---------------------------
+    def separate(self, input_audio_path: str, output_dir: str, codec: str = "wav",
+                 offset: float = 0.0, duration: Optional[float] = None,
+                 outputs: Optional[Tuple[str, str]] = None) -> Tuple[str, str]:
+        """
+        分离一个文件，返回 (vocals 路径, accompaniment 路径)
+
+        outputs=(人声路径, 背景路径) 时直接写到这两个位置，否则写到 output_dir/{instrument}.{codec}
+        """
+        request = {
+            "cmd": "separate",
+            "input": os.path.abspath(input_audio_path),
+            "output_dir": os.path.abspath(output_dir),
+            "codec": codec,
+            "offset": offset,
+            "duration": duration,
+        }
+        if outputs is not None:
+            request["outputs"] = {
+                "vocals": os.path.abspath(outputs[0]),
+                "accompaniment": os.path.abspath(outputs[1]),
+            }
+        with self._lock:
+            for attempt in range(2):
+                if not self.ping():
+                    self.restart()
+                try:
+                    resp = self._call(request, self.request_timeout)
+                except SpleeterWorkerError:
+                    # 超时或进程中途退出：杀掉重启，再试一次
+                    self.close()
+                    if attempt:
+                        raise
+                    continue
+                if not resp.get("ok"):
+                    raise SpleeterWorkerError(resp.get("error", "分离失败"))
+                return resp["vocals"], resp["accompaniment"]
+        raise SpleeterWorkerError("分离失败")
+
+    def _call(self, msg: Dict, timeout: float) -> Dict:
+        try:
+            self._proc.stdin.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            self._proc.stdin.flush()
+        except (OSError, ValueError) as exc:
+            raise SpleeterWorkerError(f"写入请求失败: {exc}")
+        return self._read(timeout)
+
+    def _read(self, timeout: float) -> Dict:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise SpleeterWorkerError(f"等待 spleeter worker 响应超时 ({timeout}s)")
+        if line is None:
+            raise SpleeterWorkerError("spleeter worker 已退出")
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise SpleeterWorkerError(f"无法解析 worker 响应: {line.strip()[:200]}")
+
+
+_workers: Dict[Tuple[str, ...], SpleeterWorker] = {}
+_workers_lock = threading.Lock()
+# 启动失败的命令 -> 错误信息；进程内记住，之后直接走命令行 spleeter
+_failed_starts: Dict[Tuple[str, ...], str] = {}
+
+
+def _failed_start(command: List[str]) -> Optional[str]:
+    with _workers_lock:
+        return _failed_starts.get(tuple(command))
+
+
+def _mark_failed_start(command: List[str], error: str) -> None:
+    with _workers_lock:
+        _failed_starts[tuple(command)] = error
+
+
+def get_worker(spleeter_python: Optional[str] = None, slot: int = 0) -> Optional[SpleeterWorker]:
+    """
+    按解释器命令取进程内共享的常驻 worker（首次使用时才真正启动子进程）；
+    该命令此前启动失败过时返回 None，调用方直接改用命令行 spleeter
+
+    slot 用于并行分离：不同 slot 是互相独立的进程，各自加载一份模型
+    """
+    command = build_worker_command(spleeter_python)
+    if command is None:
+        return None
+    key = tuple(command) + (str(slot),)
+    with _workers_lock:
+        if tuple(command) in _failed_starts:
+            return None
+        worker = _workers.get(key)
+        if worker is None:
+            worker = SpleeterWorker(command)
+            _workers[key] = worker
+        return worker
+
+
+@atexit.register
+def shutdown_workers() -> None:
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.close()
@@ -0,0 +1,138 @@
+"""
+进程内 NumPy STFT 分离引擎（mode="stft"）
+
+不需要 spleeter 环境和 TensorFlow，适合草稿渲染的快速档：
+  1) 声像：mid/side 能量比，只保留声像居中的成分作为人声候选；
+  2) 谐波/打击乐：时间向与频率向的中值滤波（HPSS）得到谐波软掩码，压掉鼓点；
+  3) 频带：人声频段以外（低频贝斯/底鼓、极高频）逐渐衰减。
+人声 = 掩码 * 原始左右声道；背景 = 原始信号 - 人声（两者相加严格还原输入）。
+
+STFT 按帧分块处理，频谱、掩码等中间数组只与块大小有关；但输入 PCM 与人声/背景输出仍整段放在内存里
+（44.1 kHz 立体声 float32 约 0.35 MB/秒，三份合计 1 小时约 3.8 GB），超长音频请先切段。
+"""
+import time
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
+
+from .pcm import read_audio, write_audio
+
+N_FFT = 2048
+HOP = 512
+KERNEL = 17
+BLOCK_FRAMES = 256
+
+
+def _frames(x: np.ndarray, start: int, count: int) -> np.ndarray:
+    """x 为已补零的单声道信号，取第 start 帧起的 count 帧，形状 (count, N_FFT)，不复制数据"""
+    base = x[start * HOP:]
+    stride = base.strides[0]
+    return as_strided(base, shape=(count, N_FFT), strides=(HOP * stride, stride), writeable=False)
+
+
+def _median_filter(mag: np.ndarray, axis: int) -> np.ndarray:
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (KERNEL // 2, KERNEL // 2)
+    padded = np.pad(mag, pad, mode="edge")
+    return np.median(sliding_window_view(padded, KERNEL, axis=axis), axis=-1)
+
+
+def _band_weight(sample_rate: int) -> np.ndarray:
+    freqs = np.fft.rfftfreq(N_FFT, d=1.0 / sample_rate)
+    low = np.clip((freqs - 80.0) / 120.0, 0.0, 1.0)        # 80~200 Hz 渐入
+    high = np.clip((12000.0 - freqs) / 4000.0, 0.0, 1.0)   # 8~12 kHz 渐出
+    return (low * high).astype(np.float32)
+
+
+def _vocal_mask(left: np.ndarray, right: np.ndarray, band: np.ndarray) -> np.ndarray:
+    mid = 0.5 * (left + right)
+    side = 0.5 * (left - right)
+    mid_pow = np.abs(mid) ** 2
+    side_pow = np.abs(side) ** 2
+
+    # 居中程度：完全居中为 1，左右不相关约 0.5，反相为 0；0.5 以下视为非人声
+    centre = mid_pow / (mid_pow + side_pow + 1e-10)
+    centre = np.clip((centre - 0.5) * 2.0, 0.0, 1.0)
+
+    mag = np.sqrt(mid_pow)
+    harmonic = _median_filter(mag, axis=0)     # 沿时间平滑 -> 稳定谐波
+    percussive = _median_filter(mag, axis=1)   # 沿频率平滑 -> 瞬态打击
+    harmonic_mask = harmonic ** 2 / (harmonic ** 2 + percussive ** 2 + 1e-10)
+
+    return (centre * harmonic_mask * band).astype(np.float32)
+
+
+def separate_array(audio: np.ndarray, sample_rate: int = 44100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    audio: (samples, 2) float32
+    返回 (vocals, background)，形状与输入相同
+    """
+    n = audio.shape[0]
+    pad = N_FFT // 2
+    n_frames = (n + 2 * pad - N_FFT) // HOP + 1
+    total = (n_frames - 1) * HOP + N_FFT
+    padded = np.zeros((total + N_FFT, 2), dtype=np.float32)
+    padded[pad:pad + n] = audio
+
+    window = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+    band = _band_weight(sample_rate)
+    left_sig = np.ascontiguousarray(padded[:, 0])
+    right_sig = np.ascontiguousarray(padded[:, 1])
+
+    vocals = np.zeros((total, 2), dtype=np.float32)
+    norm = np.zeros(total, dtype=np.float32)
+    ctx = KERNEL // 2
+    pieces = N_FFT // HOP
+
+    for b0 in range(0, n_frames, BLOCK_FRAMES):
+        b1 = min(n_frames, b0 + BLOCK_FRAMES)
+        # 前后多取 ctx 帧，保证块边界处的中值滤波与整段处理一致
+        f0, f1 = max(0, b0 - ctx), min(n_frames, b1 + ctx)
+        spec_l = np.fft.rfft(_frames(left_sig, f0, f1 - f0) * window, axis=1)
+        spec_r = np.fft.rfft(_frames(right_sig, f0, f1 - f0) * window, axis=1)
+        mask = _vocal_mask(spec_l, spec_r, band)[b0 - f0:b1 - f0]
+
+        count = b1 - b0
+        for ch, spec in enumerate((spec_l, spec_r)):
+            frames = np.fft.irfft(spec[b0 - f0:b1 - f0] * mask, n=N_FFT, axis=1).astype(np.float32) * window
+            # 重叠相加：每帧拆成 N_FFT/HOP 段，按段错位累加，整块一次完成
+            for k in range(pieces):
+                seg = frames[:, k * HOP:(k + 1) * HOP].reshape(-1)
+                start = b0 * HOP + k * HOP
+                vocals[start:start + count * HOP, ch] += seg
+
+        win_sq = np.tile(window ** 2, (count, 1))
+        for k in range(pieces):
+            seg = win_sq[:, k * HOP:(k + 1) * HOP].reshape(-1)
+            start = b0 * HOP + k * HOP
+            norm[start:start + count * HOP] += seg
+
+    vocals /= np.maximum(norm, 1e-8)[:, None]
+    vocals = vocals[pad:pad + n]
+    background = audio - vocals
+    return vocals, background
+
+
+def separate_stft(
+    input_audio_path: str,
+    vocals_output_path: str,
+    background_output_path: str,
+    sample_rate: int = 44100,
+) -> bool:
+    try:
+        t0 = time.perf_counter()
+        audio = read_audio(input_audio_path, sample_rate=sample_rate, channels=2)
+        if audio.shape[0] == 0:
+            print("错误: 输入音频为空")
+            return False
+        vocals, background = separate_array(audio, sample_rate)
+        write_audio(vocals_output_path, vocals, sample_rate)
+        write_audio(background_output_path, background, sample_rate)
+        elapsed = time.perf_counter() - t0
+        duration = audio.shape[0] / sample_rate
+        print(f"STFT 分离完成: {duration:.1f}s 音频耗时 {elapsed:.1f}s ({duration / max(elapsed, 1e-6):.1f}x 实时)")
+        return True
+    except Exception as exc:
+        print(f"STFT 分离失败: {exc}")
+        return False
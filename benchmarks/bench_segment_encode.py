@@ -0,0 +1,68 @@
+"""
+分段并行重编码 vs 串行重编码
+
+同一输入分别用 parallel_workers=1（单个编码器实例）和 parallel_workers=N 编码，
+报告墙钟、加速比和扩展效率（加速比 / N）。
+
+用法：
+    python benchmarks/bench_segment_encode.py video.mp4 audio.wav [--workers 2 4 8]
+        [--codec libx264] [--video-args "-preset medium -crf 22"]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from videomerger import VideoMerger
+
+
+def run(merger: VideoMerger, video: str, audio: str, out_path: str, options: dict):
+    t0 = time.perf_counter()
+    ok = merger.merge_with_options(video, audio, out_path, options)
+    return time.perf_counter() - t0 if ok else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分段并行重编码对比')
+    parser.add_argument('video', help='输入视频')
+    parser.add_argument('audio', help='输入音频')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--codec', default='libx264')
+    parser.add_argument('--video-args', default='-preset medium', help='传给每个编码进程的参数')
+    args = parser.parse_args()
+
+    merger = VideoMerger()
+    video_args = args.video_args.split()
+    out_dir = tempfile.mkdtemp(prefix="bench_segenc_")
+    try:
+        serial_opts = {"video_codec": args.codec, "extra_args": video_args}
+        serial = run(merger, args.video, args.audio, os.path.join(out_dir, "serial.mp4"), serial_opts)
+        if serial is None:
+            print("✗ 串行编码失败")
+            return
+
+        rows = [("serial", serial)]
+        for n in args.workers:
+            opts = {"video_codec": args.codec, "parallel_workers": n, "video_args": video_args}
+            seconds = run(merger, args.video, args.audio, os.path.join(out_dir, f"par{n}.mp4"), opts)
+            if seconds is not None:
+                rows.append((n, seconds))
+
+        print(f"\nCPU 核数: {os.cpu_count()}")
+        header = f"{'workers':<10}{'seconds':>9}{'speedup':>10}{'efficiency':>12}"
+        print(header)
+        print("-" * len(header))
+        for n, seconds in rows:
+            speedup = serial / max(seconds, 1e-6)
+            eff = "-" if n == "serial" else f"{speedup / n:.0%}"
+            print(f"{str(n):<10}{seconds:>9.2f}{speedup:>10.2f}{eff:>12}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+人声/背景分离各模式的速度与质量对比（spleeter / center_cancel / stft）
+
+速度：墙钟耗时与实时倍数（关闭缓存，进程内常驻 spleeter worker 会先预热一次）。
+质量：给出参考 stems（--ref-vocals/--ref-background）时计算 SDR；
+      否则以 spleeter 的输出作为参考，计算其他模式相对 spleeter 的 SDR。
+
+用法：
+    python benchmarks/bench_separation.py data/test2.mp3 [--modes spleeter center_cancel stft]
+        [--ref-vocals vocals.wav --ref-background bg.wav] [--repeat 3]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from audio_utils import separate_vocals_background
+from audio_utils.pcm import read_audio
+
+
+def sdr(reference: np.ndarray, estimate: np.ndarray) -> float:
+    n = min(len(reference), len(estimate))
+    ref, est = reference[:n], estimate[:n]
+    noise = np.sum((ref - est) ** 2)
+    return float(10.0 * np.log10(np.sum(ref ** 2) / max(noise, 1e-12)))
+
+
+def run_mode(mode: str, input_path: str, out_dir: str, repeat: int):
+    vocals = os.path.join(out_dir, f"{mode}_vocals.wav")
+    background = os.path.join(out_dir, f"{mode}_bg.wav")
+    if mode == "spleeter":
+        # 预热常驻进程，只统计模型加载之后的分离耗时
+        separate_vocals_background(input_path, vocals, background, mode=mode, use_cache=False)
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ok = separate_vocals_background(input_path, vocals, background, mode=mode, use_cache=False)
+        times.append(time.perf_counter() - t0)
+        if not ok:
+            return None
+    return vocals, background, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='人声/背景分离模式对比')
+    parser.add_argument('input', help='输入音频')
+    parser.add_argument('--modes', nargs='+', default=['spleeter', 'center_cancel', 'stft'])
+    parser.add_argument('--ref-vocals', default=None, help='参考人声（可选）')
+    parser.add_argument('--ref-background', default=None, help='参考背景（可选）')
+    parser.add_argument('--repeat', type=int, default=1, help='每种模式重复次数，取最快一次')
+    args = parser.parse_args()
+
+    duration = len(read_audio(args.input)) / 44100.0
+    out_dir = tempfile.mkdtemp(prefix="bench_sep_")
+    try:
+        results = {}
+        for mode in args.modes:
+            print(f"运行 {mode} ...")
+            res = run_mode(mode, args.input, out_dir, args.repeat)
+            if res is None:
+                print(f"  ✗ {mode} 失败，跳过")
+                continue
+            results[mode] = res
+
+        if args.ref_vocals and args.ref_background:
+            ref_name = "参考 stems"
+            ref_v, ref_b = read_audio(args.ref_vocals), read_audio(args.ref_background)
+        elif "spleeter" in results:
+            ref_name = "spleeter"
+            ref_v, ref_b = read_audio(results["spleeter"][0]), read_audio(results["spleeter"][1])
+        else:
+            ref_name, ref_v, ref_b = None, None, None
+
+        print(f"\n音频时长 {duration:.1f}s；质量参考: {ref_name or '无'}")
+        header = f"{'mode':<15}{'seconds':>9}{'x realtime':>12}{'SDR voc':>10}{'SDR bg':>9}"
+        print(header)
+        print("-" * len(header))
+        for mode, (vocals, background, seconds) in results.items():
+            if ref_v is not None and not (ref_name == "spleeter" and mode == "spleeter"):
+                sv = f"{sdr(ref_v, read_audio(vocals)):.2f}"
+                sb = f"{sdr(ref_b, read_audio(background)):.2f}"
+            else:
+                sv = sb = "-"
+            print(f"{mode:<15}{seconds:>9.2f}{duration / max(seconds, 1e-6):>12.1f}{sv:>10}{sb:>9}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+对比 SRT 批量翻译的两种线路格式（json / lines）的 token 与延迟
+
+离线模式（默认）：只构造提示词，并用原文模拟等长的回复，估算请求+回复的 token 数。
+在线模式（--live）：真实调用翻译接口，记录 usage 中的 token 数和每批耗时。
+
+用法：
+    python benchmarks/bench_translate_wire.py data/test.srt [more.srt ...] [--live] [--lang 中文]
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from texttranslator.translator import TextTranslator
+
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENC = None
+
+
+def count_tokens(text: str) -> int:
+    if _ENC is not None:
+        return len(_ENC.encode(text))
+    # 粗略估算：CJK 每字约 1 token，其余约 4 字符 1 token
+    cjk = sum(1 for ch in text if '\u3000' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def simulated_reply(translator: TextTranslator, batch, fmt: str) -> str:
+    if fmt == 'lines':
+        return "\n".join(f"{it['id']}|{translator._escape_line(it['text'])}" for it in batch)
+    return json.dumps([{"id": it["id"], "translation": it["text"]} for it in batch], ensure_ascii=False)
+
+
+def bench_file(srt_path: str, target_lang: str, live: bool, api_key: str):
+    results = {}
+    for fmt in ('json', 'lines'):
+        translator = TextTranslator(api_key, wire_format=fmt)
+        prepared = translator._prepare_srt(srt_path)
+        if prepared is None:
+            print(f"⚠ 无法解析: {srt_path}")
+            return None
+
+        prompt_tokens = completion_tokens = 0
+        elapsed = 0.0
+        batches = list(translator._batch_items(prepared.translatable, max_chars=6500, max_n=60))
+        for batch in batches:
+            if fmt == 'lines':
+                system, user = translator._build_lines_prompt(batch, target_lang)
+            else:
+                system, user = translator._build_json_prompt(batch, target_lang)
+
+            if live:
+                t0 = time.perf_counter()
+                _, usage = translator._translate_batch_with_usage(batch, target_lang)
+                elapsed += time.perf_counter() - t0
+                prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            else:
+                prompt_tokens += count_tokens(system) + count_tokens(user)
+                completion_tokens += count_tokens(simulated_reply(translator, batch, fmt))
+
+        results[fmt] = {
+            "batches": len(batches),
+            "items": len(prepared.translatable),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "seconds": elapsed,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SRT 翻译线路格式 token/延迟对比')
+    parser.add_argument('srt', nargs='+', help='样例 SRT 文件')
+    parser.add_argument('--lang', default='中文', help='目标语言 (默认: 中文)')
+    parser.add_argument('--live', action='store_true', help='真实调用接口并计时（需要 ZHIPU_API_KEY）')
+    args = parser.parse_args()
+
+    api_key = os.environ.get('ZHIPU_API_KEY', 'offline')
+    if args.live and api_key == 'offline':
+        print("请设置ZHIPU_API_KEY环境变量")
+        sys.exit(1)
+
+    if args.live:
+        print("token 计数: 接口返回的 usage")
+    else:
+        print(f"token 计数: {'tiktoken cl100k_base' if _ENC else '字符估算'}（回复按原文等长模拟）")
+    header = f"{'file':<28}{'fmt':<7}{'items':>6}{'batches':>8}{'prompt':>9}{'reply':>8}{'total':>8}{'sec':>8}"
+    print(header)
+    print("-" * len(header))
+    for path in args.srt:
+        res = bench_file(path, args.lang, args.live, api_key)
+        if not res:
+            continue
+        for fmt, r in res.items():
+            total = r["prompt_tokens"] + r["completion_tokens"]
+            print(f"{os.path.basename(path)[:27]:<28}{fmt:<7}{r['items']:>6}{r['batches']:>8}"
+                  f"{r['prompt_tokens']:>9}{r['completion_tokens']:>8}{total:>8}{r['seconds']:>8.2f}")
+        j = res['json']["prompt_tokens"] + res['json']["completion_tokens"]
+        l = res['lines']["prompt_tokens"] + res['lines']["completion_tokens"]
+        if j:
+            print(f"{'':<28}lines 相比 json 节省 {100.0 * (j - l) / j:.1f}% token")
+
+
+if __name__ == "__main__":
+    main()
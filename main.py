@@ -1,52 +1,23 @@
 import os
-import datetime
 import argparse
-import subprocess
-from models.factory import ModelFactory
-from videomerger import VideoMerger
-from audio_utils import separate_vocals_background
+from pipeline import StageRunner, build_pipeline, run_batch
+from pipeline.batch import parse_stage_workers
+from pipeline.stages import SEPARATION_MODES
 from utils.path_manager import PathManager
 
 
-
-def _select_codec_args(output_path: str) -> list:
-    ext = os.path.splitext(output_path)[1].lower()
-    if ext == ".mp3":
-        return ["-c:a", "libmp3lame", "-b:a", "192k"]
-    if ext == ".aac":
-        return ["-c:a", "aac", "-b:a", "192k"]
-    return []
-
-def _mix_background_and_tts(bg_audio_path: str, tts_audio_path: str, out_audio_path: str,
-                            bg_volume: float = 0.35, tts_volume: float = 1.0) -> bool:
-    filter_complex = (
-        f"[0:a]volume={bg_volume}[bg];"
-        f"[1:a]volume={tts_volume}[tts];"
-        "[bg][tts]amix=inputs=2:normalize=0:dropout_transition=0[aout]"
-    )
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", bg_audio_path,
-        "-i", tts_audio_path,
-        "-filter_complex", filter_complex,
-        "-map", "[aout]",
-        "-shortest",
-    ]
-    cmd += _select_codec_args(out_audio_path)
-    cmd.append(out_audio_path)
-
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
-    except Exception as exc:
-        print(f"背景声混音失败: {exc}")
-        return False
-
 def main(stt_model='azure', tts_model='azure', translator_model='zhipu', 
-         input_audio_file=None, input_video_file=None, target_lang='中文'):
+         input_audio_file=None, input_video_file=None, target_lang='中文', target_langs=None,
+         detect_bg=True, background_fallback='none', keep_mix=False, separation_mode='spleeter',
+         url=None, udi=None, downloader=None,
+         from_stage=None, until_stage=None, force=False, jobs=4):
     """
     主函数：处理音频转文字、翻译、文字转语音的完整流程
     
+    流程按阶段执行（download → stt → translate → tts → separate → mix → merge），
+    每个阶段记录输入内容、配置与模型的指纹，重跑时未变化的阶段直接跳过。
+    互不依赖的分支并行执行：人声分离只依赖原音频，与 stt → translate → tts 同时进行。
+    
     Args:
         stt_model: 语音转文字模型名称（默认: 'azure'）
         tts_model: 文字转语音模型名称（默认: 'azure'）
@@ -54,150 +25,79 @@ def main(stt_model='azure', tts_model='azure', translator_model='zhipu',
         input_audio_file: 输入音频文件路径（如果为None，使用默认路径）
         input_video_file: 输入视频文件路径（可选，如果提供则会在最后合并视频和音频）
         target_lang: 目标翻译语言（默认: '中文'）
-    """
-    # 设置文件路径
-    if input_audio_file is None:
-        input_audio_file = "data/test2.mp3"
-    
-    if not os.path.exists(input_audio_file):
-        print(f"错误: 输入音频文件不存在: {input_audio_file}")
-        return
-    
-    basename_audio_file = os.path.splitext(os.path.basename(input_audio_file))[0]
-    
-    basename_audio_file = os.path.splitext(os.path.basename(input_audio_file))[0]
-    
-    # 初始化路径管理器
-    pm = PathManager()
-    
-    # 获取目录（PathManager会自动创建目录）
-    project_dir = pm.get_project_dir(basename_audio_file)
-    intermediate_dir = pm.get_intermediate_dir(basename_audio_file)
-    
-    # 获取音频输出路径
-    output_audio = pm.get_path('tts_audio', basename_audio_file)
-    
-    # 如果提供了视频文件，准备输出视频路径
-    output_video = None
-    if input_video_file:
-        if not os.path.exists(input_video_file):
-            print(f"警告: 视频文件不存在: {input_video_file}，将跳过视频合并步骤")
-            input_video_file = None
-        else:
-            output_video = pm.get_path('final_video', basename_audio_file)
-    
-    # SRT文件路径
-    srt_file = pm.get_path('srt', basename_audio_file)
-    translated_srt_file = pm.get_path('translated_srt', basename_audio_file)
-
-    try:
-        # 创建模型工厂
-        factory = ModelFactory()
+        target_langs: 额外输出字幕的语言列表（与 target_lang 一起翻译，配音仍用 target_lang）
+        detect_bg: 分离前先检测是否有背景声，没有则跳过分离（默认: True）
+        background_fallback: 无背景声时的处理，'none' 直接用纯TTS，'room_tone' 混入低电平房间底噪
+        keep_mix: 有视频时也单独输出混音音频文件（默认: False，混音直接合并进视频）
+        separation_mode: 人声分离引擎，'spleeter'（默认）、'stft' 或 'center_cancel'
+        url: 视频链接（可选，给出时先下载音频和字幕，视频在后台下载，合并前等待）
+        udi: 配合 url 使用的任务标识（默认: URL 的 md5）
+        downloader: 配合 url 使用的 YouTubeDownloader（默认: 新建）
+        from_stage: 从该阶段开始重跑（上游阶段沿用已有产物）
+        until_stage: 执行到该阶段为止
+        force: 忽略指纹，所有阶段都重跑
+        jobs: 同时运行的阶段数上限（默认: 4，1 为顺序执行）
         
-        # 显示可用模型
-        available_models = factory.get_available_models()
-        print(f"可用模型:")
-        print(f"  STT: {available_models['stt']}")
-        print(f"  TTS: {available_models['tts']}")
-        print(f"  Translator: {available_models['translator']}")
-        print()
-        
-        # 1. 创建并使用语音转文字模型
-        print(f"使用STT模型: {stt_model}")
-        stt = factory.create_stt(stt_model)
-        _, detected_language = stt.transcribe(input_audio_file, output_dir=intermediate_dir)
-        print(f"检测到的语言: {detected_language}")
-        print()
-        
-        # 2. 检查SRT文件是否存在
-        if not os.path.exists(srt_file):
-            print(f"错误: SRT文件不存在: {srt_file}")
-            print("请确保STT步骤已成功生成SRT文件")
-            return
-        
-        # 3. 创建并使用翻译模型翻译SRT文件
-        print(f"使用翻译模型: {translator_model}")
-        translator = factory.create_translator(translator_model)
-        translation_success = translator.translate_file(srt_file, translated_srt_file, target_lang=target_lang)
-        
-        if not translation_success:
-            print("翻译失败")
-            return
-        print()
-        
-        # 4. 创建并使用文字转语音模型（严格按SRT时间轴对齐）
-        print(f"使用TTS模型: {tts_model}")
-        tts = factory.create_tts(tts_model)
+    Returns:
+        bool: 是否全部阶段成功
+    """
+    if url:
+        from ytdownloader.downloader import udi_for_url
+        basename = udi or udi_for_url(url)
+        input_audio_file = input_video_file = None
+    else:
+        # 设置文件路径
+        if input_audio_file is None:
+            input_audio_file = "data/test2.mp3"
         
-        tmp_dir = pm.get_path('tmp_tts', basename_audio_file)
-        try:
-            tts_success = tts.synthesize_srt_aligned(
-                srt_path=translated_srt_file,
-                out_audio_path=output_audio,
-                tmp_dir=tmp_dir,
-                export_format="mp3",
-                pad_when_short=True,
-                speedup_cap=3.0,
-                slowdown_cap=0.7
-            )
-        finally:
-            # 清理中间目录（可根据需要关闭清理便于调试）
-            try:
-                tts.cleanup_tmp(tmp_dir)
-            except Exception:
-                pass
+        if not os.path.exists(input_audio_file):
+            print(f"错误: 输入音频文件不存在: {input_audio_file}")
+            return False
         
-        if tts_success:
-            print(f"✓ 中文音频生成成功，保存为 {output_audio}")
-        else:
-            print("✗ 中文音频生成失败")
-            return
-        print()
+        if input_video_file and not os.path.exists(input_video_file):
+            print(f"警告: 视频文件不存在: {input_video_file}，将跳过视频合并步骤")
+            input_video_file = None
         
-        # 5. 使用 spleeter 分离背景音并混合
-        bg_audio_path = pm.get_path('bg_audio', basename_audio_file)
-        vocals_audio_path = pm.get_path('vocals_audio', basename_audio_file)
+        basename = os.path.splitext(os.path.basename(input_audio_file))[0]
+
+    own_downloader = url and downloader is None
+    if own_downloader:
+        from ytdownloader.downloader import YouTubeDownloader
+        downloader = YouTubeDownloader()
 
-        mix_audio = output_audio
-        sep_success = separate_vocals_background(
-            input_audio_path=input_audio_file,
-            vocals_output_path=vocals_audio_path,
-            background_output_path=bg_audio_path,
-            mode="spleeter",
+    try:
+        pipeline, artifacts = build_pipeline(
+            basename,
+            input_audio_file=input_audio_file,
+            input_video_file=input_video_file,
+            url=url,
+            stt_model=stt_model,
+            tts_model=tts_model,
+            translator_model=translator_model,
+            target_lang=target_lang,
+            target_langs=target_langs,
+            detect_bg=detect_bg,
+            background_fallback=background_fallback,
+            keep_mix=keep_mix,
+            separation_mode=separation_mode,
+            downloader=downloader,
         )
-        if sep_success:
-            # 混合文件放到项目根目录
-            mix_audio_path = pm.get_path('final_mix', basename_audio_file)
-            mix_success = _mix_background_and_tts(bg_audio_path, output_audio, mix_audio_path)
-            if mix_success:
-                mix_audio = mix_audio_path
-                print(f"✓ 背景声混合成功，保存为 {mix_audio}")
-            else:
-                print("⚠ 背景声混合失败，继续使用纯TTS音频")
-        else:
-            print("⚠ 背景声分离失败，继续使用纯TTS音频")
+        print(f"阶段: {' → '.join(pipeline.order())}")
         print()
-
-        # 6. 如果提供了视频文件，合并视频和音频
-        if input_video_file and output_video:
-            print("=" * 50)
-            print("步骤6: 合并视频和音频")
-            print("=" * 50)
-            merger = VideoMerger()
-            merge_success = merger.merge(input_video_file, mix_audio, output_video)
-            if merge_success:
-                print(f"✓ 最终视频已生成: {output_video}")
-            else:
-                print("✗ 视频合并失败")
-        elif input_video_file:
-            print("⚠ 视频文件路径无效，跳过合并步骤")
-            
+        
+        runner = StageRunner(pipeline, artifacts, PathManager().get_path('stage_state', basename))
+        return runner.run(from_stage=from_stage, until_stage=until_stage, force=force, max_workers=jobs)
     except ValueError as e:
         print(f"错误: {e}")
+        return False
     except Exception as e:
         print(f"发生错误: {str(e)}")
         import traceback
         traceback.print_exc()
+        return False
+    finally:
+        if own_downloader:
+            downloader.close()
 
 
 if __name__ == "__main__":
@@ -212,16 +112,83 @@ if __name__ == "__main__":
                        help='输入音频文件路径')
     parser.add_argument('--video', type=str, default=None, 
                        help='输入视频文件路径（可选，如果提供则会在最后合并视频和音频）')
+    parser.add_argument('--url', type=str, default=None,
+                       help='视频链接：先下载音频和字幕立即开始处理，视频在后台下载，合并前等待')
+    parser.add_argument('--udi', type=str, default=None,
+                       help='配合 --url 使用的任务标识（默认: URL 的 md5）')
     parser.add_argument('--target-lang', type=str, default='中文', 
                        help='目标翻译语言 (默认: 中文)')
+    parser.add_argument('--target-langs', type=str, default=None,
+                       help='额外输出字幕的语言，逗号分隔，如 "英文,日文"；与 --target-lang 一次解析、共用请求池翻译，'
+                            '结果为 intermediate/{名称}_translated_{语言}.srt，配音仍用 --target-lang')
+    parser.add_argument('--no-bg-detect', action='store_true',
+                       help='不做背景声检测，总是执行人声分离')
+    parser.add_argument('--background-fallback', type=str, default='none', choices=['none', 'room_tone'],
+                       help='检测到无背景声时的处理: none=纯TTS, room_tone=混入房间底噪 (默认: none)')
+    parser.add_argument('--keep-mix', action='store_true',
+                       help='有视频时也单独保存混音音频（默认混音直接合并进视频，不生成中间MP3）')
+    parser.add_argument('--separation-mode', type=str, default='spleeter',
+                       choices=SEPARATION_MODES,
+                       help='人声分离引擎: spleeter=质量最好, stft=进程内NumPy快速草稿, center_cancel=ffmpeg声像相消 (默认: spleeter)')
+    parser.add_argument('--from-stage', type=str, default=None,
+                       help='从该阶段开始重跑，上游阶段沿用已有产物 (download/stt/translate/tts/separate/mix/download_video/merge)')
+    parser.add_argument('--until-stage', type=str, default=None,
+                       help='执行到该阶段为止')
+    parser.add_argument('--force', action='store_true',
+                       help='忽略阶段指纹，全部重跑')
+    parser.add_argument('--jobs', type=int, default=4,
+                       help='同时运行的阶段数上限，互不依赖的阶段（如人声分离与转写/翻译/配音）并行 (默认: 4，1=顺序执行)')
+    parser.add_argument('--batch', type=str, default=None, metavar='CSV',
+                       help='批量处理视频列表（如 config/vdc.csv），多个视频在各阶段间流水执行')
+    parser.add_argument('--max-jobs', type=int, default=3,
+                       help='批量模式下同时处理中的视频数 (默认: 3)')
+    parser.add_argument('--queue-size', type=int, default=2,
+                       help='批量模式下等待处理的任务队列长度 (默认: 2)')
+    parser.add_argument('--stage-workers', type=str, default=None,
+                       help='批量模式下各阶段同时运行的任务数，如 "stt=3,separate=2"')
+    parser.add_argument('--rate', type=float, default=1.0,
+                       help='批量模式下每秒请求站点的次数上限 (默认: 1.0)')
     
     args = parser.parse_args()
     
-    main(
+    options = dict(
         stt_model=args.stt_model,
         tts_model=args.tts_model,
         translator_model=args.translator_model,
-        input_audio_file=args.input,
-        input_video_file=args.video,
-        target_lang=args.target_lang
+        target_lang=args.target_lang,
+        target_langs=[lang.strip() for lang in (args.target_langs or '').split(',') if lang.strip()],
+        detect_bg=not args.no_bg_detect,
+        background_fallback=args.background_fallback,
+        keep_mix=args.keep_mix,
+        separation_mode=args.separation_mode,
     )
+    if args.batch:
+        try:
+            stage_workers = parse_stage_workers(args.stage_workers)
+        except ValueError as e:
+            raise SystemExit(f"错误: {e}")
+        ok = run_batch(
+            args.batch,
+            max_jobs=args.max_jobs,
+            queue_size=args.queue_size,
+            stage_workers=stage_workers,
+            requests_per_second=args.rate,
+            from_stage=args.from_stage,
+            until_stage=args.until_stage,
+            force=args.force,
+            **options
+        )
+    else:
+        ok = main(
+            input_audio_file=args.input,
+            input_video_file=args.video,
+            url=args.url,
+            udi=args.udi,
+            from_stage=args.from_stage,
+            until_stage=args.until_stage,
+            force=args.force,
+            jobs=args.jobs,
+            **options
+        )
+    if not ok:
+        raise SystemExit(1)
@@ -117,6 +117,22 @@ class ModelFactory:
         model_config = self.config['translator_models'][model_name]
         return self._create_model_instance(model_config)
     
+    def model_signature(self, kind: str, model_name: str) -> str:
+        """
+        模型的配置签名（类、模块与未展开的参数），用于判断产物是否需要重新生成
+        
+        Args:
+            kind: 模型类别（'stt'、'tts' 或 'translator'）
+            model_name: 模型名称
+            
+        Returns:
+            str: 配置的规范化 JSON（环境变量保持 ${VAR} 形式，不含密钥本身）
+        """
+        models = self.config.get(f'{kind}_models', {})
+        if model_name not in models:
+            raise ValueError(f"不支持的{kind}模型: {model_name}. 可用模型: {list(models.keys())}")
+        return json.dumps({'name': model_name, **models[model_name]}, sort_keys=True, ensure_ascii=False)
+    
     def get_available_models(self) -> dict:
         """
         获取所有可用的模型名称
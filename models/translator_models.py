@@ -4,7 +4,8 @@ from .base import BaseTranslator
 class ZhipuTranslator(BaseTranslator):
     """智谱AI翻译模型"""
     
-    def __init__(self, api_key, model='glm-4', base_url='https://open.bigmodel.cn/api/paas/v4/'):
+    def __init__(self, api_key, model='glm-4', base_url='https://open.bigmodel.cn/api/paas/v4/',
+                 shared_batching=False, linger_ms=50, wire_format='json'):
         """
         初始化智谱AI翻译模型
         
@@ -12,11 +13,16 @@ class ZhipuTranslator(BaseTranslator):
             api_key: 智谱API密钥
             model: 使用的模型名称
             base_url: API基础URL
+            shared_batching: 是否与同进程内其他任务共用翻译批处理器（批量处理多个短视频时开启）
+            linger_ms: 共用批处理器凑批的最长等待时间（毫秒）
+            wire_format: 批量翻译的请求格式，'json'（默认）或更省 token 的 'lines'
         """
         self.api_key = api_key
         self.model = model
         self.base_url = base_url
-        self._translator = ZhipuTranslatorImpl(api_key, model=model, base_url=base_url)
+        self._translator = ZhipuTranslatorImpl(api_key, model=model, base_url=base_url,
+                                               shared_batching=shared_batching, linger_ms=linger_ms,
+                                               wire_format=wire_format)
     
     def translate_file(self, input_file, output_file, target_lang='zh'):
         """
@@ -36,3 +42,16 @@ class ZhipuTranslator(BaseTranslator):
         else:
             return self._translator.translate_file(input_file, output_file, target_lang)
 
+    def translate_file_multi(self, input_file, output_files, max_workers=4):
+        """
+        将同一个SRT文件翻译成多种语言（解析与标签保护只做一次）
+        
+        Args:
+            input_file: 输入SRT文件路径
+            output_files: {目标语言: 输出文件路径}
+            max_workers: 并发请求数
+            
+        Returns:
+            dict: {目标语言: 是否成功}
+        """
+        return self._translator.translate_srt_file_multi(input_file, output_files, max_workers=max_workers)
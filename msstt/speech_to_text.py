@@ -1,5 +1,6 @@
 import azure.cognitiveservices.speech as speechsdk
 import os
+import tempfile
 from pydub import AudioSegment
 import time
 from datetime import timedelta
@@ -8,6 +9,11 @@ def convert_mp3_to_wav(mp3_path, wav_path):
     audio = AudioSegment.from_mp3(mp3_path)
     audio.export(wav_path, format="wav")
 
+def convert_to_wav(audio_path, wav_path):
+    # 任意 ffmpeg 能解码的格式（mp3/m4a/webm/opus...）
+    audio = AudioSegment.from_file(audio_path)
+    audio.export(wav_path, format="wav")
+
 def format_timestamp(total_seconds):
     """
     将秒数转换为SRT格式的时间戳 (HH:MM:SS,mmm)
@@ -63,12 +69,13 @@ class SpeechToText:
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
 
-        # 检查文件是否为MP3格式，如果是，则转换为WAV
+        # 非WAV格式（mp3、m4a 等）先转换为WAV
+        # 临时文件用唯一文件名，同一素材的多个任务并行时不会互相覆盖
         temp_wav_path = None
-        if file_extension.lower() == '.mp3':
-            # 临时文件仍然放在源目录，或者也可以放在输出目录
-            temp_wav_path = os.path.join(file_dir, base_name + '.wav')
-            convert_mp3_to_wav(audio_file_path, temp_wav_path)
+        if file_extension.lower() != '.wav':
+            fd, temp_wav_path = tempfile.mkstemp(prefix=base_name + '_', suffix='.wav', dir=save_dir or None)
+            os.close(fd)
+            convert_to_wav(audio_file_path, temp_wav_path)
             audio_file_path = temp_wav_path
 
         speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.service_region)
@@ -2,13 +2,14 @@ import os
 import re
 import math
 import shutil
-import subprocess
 from dataclasses import dataclass
 from typing import List, Optional
 
 import azure.cognitiveservices.speech as speechsdk
 from pydub import AudioSegment
 
+from utils.ffmpeg_runner import run_ffmpeg
+
 
 @dataclass
 class SrtCue:
@@ -60,7 +61,7 @@ def ffmpeg_time_stretch(in_wav: str, out_wav: str, tempo_factor: float):
         "-filter:a", chain,
         out_wav
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_ffmpeg(cmd)
 
 
 class TextToSpeech:
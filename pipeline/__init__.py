@@ -0,0 +1,4 @@
+from .graph import Pipeline, Stage
+from .runner import StageRunner
+from .stages import build_pipeline
+from .batch import run_batch
@@ -0,0 +1,186 @@
+"""
+整个视频列表（vdc.csv）的流水化批处理
+
+每个视频是一个任务，按 build_pipeline 的阶段图执行；所有任务共用按阶段划分的并发上限，
+相当于每个阶段一个工作池：一个视频在下载时，另一个在转写，再一个在配音。
+任务经有界队列进入，同时在处理中的任务不超过 max_jobs，下载不会无限领先于后面的阶段。
+每个任务的产物都在 data/{UDI}/ 下（转写临时 WAV、spleeter 临时目录均为唯一临时文件），互不覆盖。
+"""
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.path_manager import PathManager
+
+from .runner import STATUS_RAN, StageRunner
+from .stages import build_pipeline
+
+# 各阶段同时运行的任务数：下载、转写、翻译、配音主要在等网络；分离和合并吃 CPU
+DEFAULT_STAGE_WORKERS = {
+    "download": 2,
+    "download_video": 2,
+    "stt": 2,
+    "translate": 2,
+    "tts": 2,
+    "separate": 1,
+    "mix": 2,
+    "merge": 1,
+}
+
+
+def parse_stage_workers(spec: Optional[str]) -> Dict[str, int]:
+    """解析 "stt=3,separate=2" 形式的阶段并发设置，未给出的阶段取默认值"""
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in workers:
+            raise ValueError(f"无效的阶段并发设置: {item}（可选阶段: {', '.join(workers)}）")
+        workers[name] = max(1, int(value))
+    return workers
+
+
+def run_batch(
+    csv_path: str,
+    max_jobs: int = 3,
+    queue_size: int = 2,
+    stage_workers: Optional[Dict[str, int]] = None,
+    requests_per_second: float = 1.0,
+    use_ledger: bool = True,
+    from_stage: Optional[str] = None,
+    until_stage: Optional[str] = None,
+    force: bool = False,
+    **options,
+) -> bool:
+    """
+    按 CSV 批量执行完整流程
+
+    Args:
+        csv_path: 视频列表 CSV（UDI, URL 列，与下载器相同）
+        max_jobs: 同时处理中的任务数上限
+        queue_size: 等待进入处理的任务队列长度（队列满时读取 CSV 的线程阻塞）
+        stage_workers: 各阶段同时运行的任务数（默认: DEFAULT_STAGE_WORKERS）
+        requests_per_second: 所有任务共享的站点请求速率上限
+        use_ledger: 下载使用 CSV 旁的台账
+        from_stage / until_stage / force: 同 main()，作用于每个任务
+        **options: 传给 build_pipeline 的模型与处理选项
+
+    Returns:
+        bool: 是否全部任务成功
+    """
+    from ytdownloader.downloader import YouTubeDownloader
+    from ytdownloader.ledger import DownloadLedger
+    from ytdownloader.limits import TokenBucket
+    from models.factory import ModelFactory
+
+    downloader = YouTubeDownloader()
+    videos = _unique_jobs(downloader.read_video_list(csv_path))
+    if not videos:
+        print("没有找到要处理的视频")
+        return False
+
+    max_jobs = max(1, min(max_jobs, len(videos)))
+    workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+    limits = {name: threading.BoundedSemaphore(n) for name, n in workers.items()}
+
+    if use_ledger:
+        downloader.ledger = DownloadLedger.for_csv(csv_path)
+    downloader.rate_limiter = TokenBucket(requests_per_second, burst=max_jobs)
+    # 多个任务同时下载，关闭 yt-dlp 的进度条
+    downloader.quiet = max_jobs > 1
+    factory = ModelFactory()
+    pm = PathManager()
+
+    jobs: "queue.Queue[Optional[Dict[str, str]]]" = queue.Queue(maxsize=max(1, queue_size))
+    results: Dict[str, dict] = {}
+    results_lock = threading.Lock()
+
+    def feed():
+        for video in videos:
+            jobs.put(video)
+        for _ in range(max_jobs):
+            jobs.put(None)
+
+    def work():
+        while True:
+            video = jobs.get()
+            if video is None:
+                return
+            udi = video['udi']
+            t0 = time.perf_counter()
+            ok = False
+            timings: Dict[str, dict] = {}
+            try:
+                pipeline, artifacts = build_pipeline(udi, url=video['url'], downloader=downloader,
+                                                     factory=factory, **options)
+                runner = StageRunner(pipeline, artifacts, pm.get_path('stage_state', udi),
+                                     limits=limits, label=udi)
+                ok = runner.run(from_stage=from_stage, until_stage=until_stage, force=force)
+                timings = runner.timings
+            except Exception as e:
+                print(f"✗ 任务 {udi} 出错: {e}")
+            seconds = time.perf_counter() - t0
+            with results_lock:
+                results[udi] = {"ok": ok, "seconds": seconds, "timings": timings}
+                done = len(results)
+            print(f"[{done}/{len(videos)}] {'✓' if ok else '✗'} {udi} ({seconds:.1f}s)")
+
+    print(f"开始批量处理 {len(videos)} 个视频 (同时处理 {max_jobs} 个, 队列 {queue_size}, "
+          f"阶段并发 {', '.join(f'{k}={v}' for k, v in workers.items())})")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=feed, name="batch-feed", daemon=True)]
+    threads += [threading.Thread(target=work, name=f"batch-job-{i}", daemon=True) for i in range(max_jobs)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        downloader.close()
+        if downloader.ledger is not None:
+            downloader.ledger.close()
+            downloader.ledger = None
+    _report(results, time.perf_counter() - started)
+    return len(results) == len(videos) and all(r["ok"] for r in results.values())
+
+
+def _unique_jobs(videos: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # 同一 UDI 的两个任务会写同一个工作目录，只保留第一个
+    seen = set()
+    unique = []
+    for video in videos:
+        if video['udi'] in seen:
+            print(f"⚠ 重复的 UDI，已忽略: {video['udi']} ({video['url']})")
+            continue
+        seen.add(video['udi'])
+        unique.append(video)
+    return unique
+
+
+def _report(results: Dict[str, dict], wall: float) -> None:
+    stage_busy: Dict[str, float] = {}
+    stage_wait: Dict[str, float] = {}
+    for r in results.values():
+        for name, t in r["timings"].items():
+            if t["status"] == STATUS_RAN:
+                stage_busy[name] = stage_busy.get(name, 0.0) + t["seconds"]
+                stage_wait[name] = stage_wait.get(name, 0.0) + t.get("waited", 0.0)
+    busy = sum(r["seconds"] for r in results.values())
+    success = sum(1 for r in results.values() if r["ok"])
+
+    print("\n" + "=" * 50)
+    print(f"批量处理完成！成功: {success}/{len(results)}")
+    print(f"{'阶段':<16}{'累计执行':>10}{'排队等待':>10}")
+    for name in DEFAULT_STAGE_WORKERS:
+        if name in stage_busy:
+            print(f"{name:<16}{stage_busy[name]:>9.1f}s{stage_wait[name]:>9.1f}s")
+    print(f"总耗时 {wall:.1f}s，任务累计 {busy:.1f}s，流水并行收益 {busy / max(wall, 1e-6):.2f}x")
+    failed = [udi for udi, r in results.items() if not r["ok"]]
+    if failed:
+        print("以下任务失败（重跑时已完成的阶段会被跳过）:")
+        for udi in failed:
+            print(f" - {udi}")
+    print("=" * 50)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+# 阶段函数：接收当前所有产物路径（未产生的为 None），返回本阶段实际产出的 {key: 路径或 None}；失败返回 None
+StageFunc = Callable[[Dict[str, Optional[str]]], Optional[Dict[str, Optional[str]]]]
+
+
+@dataclass
+class Stage:
+    """
+    流水线中的一个阶段
+
+    inputs/outputs 是产物的键（如 "audio"、"srt"），阶段之间的依赖由它们推导。
+    optional_inputs 中的产物允许为 None（例如无背景声时不产生 bg_audio）。
+    config/model 参与指纹计算：配置、模型或任一输入内容变化时该阶段才会重跑。
+    required=False 的阶段失败时不中断流水线，其产物按 None 继续（例如分离失败时退回纯 TTS）。
+    """
+    name: str
+    func: StageFunc
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    config: Dict = field(default_factory=dict)
+    model: str = ""
+    optional_inputs: List[str] = field(default_factory=list)
+    required: bool = True
+
+
+class Pipeline:
+    """阶段图：按 inputs/outputs 自动连边，拓扑序执行"""
+
+    def __init__(self, stages: List[Stage], initial: Optional[List[str]] = None):
+        self.stages: Dict[str, Stage] = {}
+        self._producer: Dict[str, str] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"阶段重名: {stage.name}")
+            self.stages[stage.name] = stage
+            for key in stage.outputs:
+                if key in self._producer:
+                    raise ValueError(f"产物 {key} 同时由 {self._producer[key]} 和 {stage.name} 产生")
+                self._producer[key] = stage.name
+
+        initial = set(initial or [])
+        for stage in stages:
+            for key in stage.inputs:
+                if key not in self._producer and key not in initial and key not in stage.optional_inputs:
+                    raise ValueError(f"阶段 {stage.name} 的输入 {key} 没有来源")
+        self._order = self._toposort(stages)
+
+    def deps(self, name: str) -> Set[str]:
+        stage = self.stages[name]
+        return {self._producer[k] for k in stage.inputs if k in self._producer}
+
+    def order(self) -> List[str]:
+        return list(self._order)
+
+    def ancestors(self, name: str) -> Set[str]:
+        seen: Set[str] = set()
+        stack = list(self.deps(name))
+        while stack:
+            cur = stack.pop()
+            if cur not in seen:
+                seen.add(cur)
+                stack.extend(self.deps(cur))
+        return seen
+
+    def descendants(self, name: str) -> Set[str]:
+        return {n for n in self.stages if name in self.ancestors(n)}
+
+    def _toposort(self, stages: List[Stage]) -> List[str]:
+        # 稳定拓扑序：依赖满足的阶段按声明顺序排
+        remaining = [s.name for s in stages]
+        ordered: List[str] = []
+        while remaining:
+            ready = [n for n in remaining if self.deps(n) <= set(ordered)]
+            if not ready:
+                raise ValueError(f"阶段之间存在循环依赖: {remaining}")
+            ordered.append(ready[0])
+            remaining.remove(ready[0])
+        return ordered
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+
+from .graph import Pipeline, Stage
+
+STATUS_RAN = "ran"
+STATUS_SKIPPED = "skipped"
+STATUS_REUSED = "reused"
+STATUS_FAILED = "failed"
+
+
+class StageRunner:
+    """
+    按指纹跳过的阶段执行器
+
+    指纹 = sha256(阶段名 + config + model + 各输入文件的内容哈希)。
+    上次成功时的指纹与产物记录在 state_path（JSON）中；指纹一致且产物都还在时跳过该阶段。
+    输入按内容哈希而不是 mtime 比较：上游重跑但产出不变时，下游仍然跳过。
+    文件哈希按 (大小, mtime) 持久化记忆，未变化的大文件不会重复读取。
+    """
+
+    def __init__(self, pipeline: Pipeline, artifacts: Dict[str, Optional[str]], state_path: str,
+                 limits: Optional[Dict[str, threading.Semaphore]] = None, label: str = ""):
+        self.pipeline = pipeline
+        self.artifacts = dict(artifacts)
+        self.state_path = state_path
+        # 按阶段名共享的并发上限（批量处理时多个任务共用，相当于每个阶段一个工作池）
+        self.limits = limits or {}
+        self.label = label
+        self.timings: Dict[str, dict] = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault("stages", {})
+        state.setdefault("digests", {})
+        return state
+
+    def _save_state(self) -> None:
+        with self._lock:
+            data = json.dumps(self._state, ensure_ascii=False, indent=1)
+        tmp_path = f"{self.state_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_path)
+
+    def _digest(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            memo = self._state["digests"].get(key)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self._state["digests"][key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, stage: Stage) -> str:
+        inputs = {}
+        for key in stage.inputs:
+            path = self.artifacts.get(key)
+            if path is None or not os.path.exists(path):
+                if key not in stage.optional_inputs:
+                    raise FileNotFoundError(f"阶段 {stage.name} 的输入 {key} 不存在: {path}")
+                inputs[key] = None
+            else:
+                inputs[key] = self._digest(path)
+        payload = json.dumps(
+            {"stage": stage.name, "config": stage.config, "model": stage.model, "inputs": inputs},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _recorded_outputs(self, name: str) -> Optional[Dict[str, Optional[str]]]:
+        """上次成功运行记录的产物；有任一产物已不存在时返回 None"""
+        with self._lock:
+            record = self._state["stages"].get(name)
+        if not record:
+            return None
+        outputs = record.get("outputs", {})
+        if any(path is not None and not os.path.exists(path) for path in outputs.values()):
+            return None
+        return outputs
+
+    def select(self, from_stage: Optional[str] = None, until_stage: Optional[str] = None) -> List[str]:
+        """按 --from-stage / --until-stage 选出要执行的阶段（拓扑序）"""
+        for name in (from_stage, until_stage):
+            if name is not None and name not in self.pipeline.stages:
+                raise ValueError(f"未知阶段: {name}（可选: {', '.join(self.pipeline.order())}）")
+        selected = self.pipeline.order()
+        if until_stage is not None:
+            keep = self.pipeline.ancestors(until_stage) | {until_stage}
+            selected = [n for n in selected if n in keep]
+        return selected
+
+    def forced_stages(self, from_stage: Optional[str], force: bool) -> Set[str]:
+        if force:
+            return set(self.pipeline.stages)
+        if from_stage is None:
+            return set()
+        return {from_stage} | self.pipeline.descendants(from_stage)
+
+    def reuse(self, name: str) -> bool:
+        """--from-stage 之前的阶段不执行，直接沿用上次的产物"""
+        stage = self.pipeline.stages[name]
+        outputs = self._recorded_outputs(name)
+        if outputs is None:
+            # 没有记录时，规划路径上的文件已经存在也可以用
+            if all(self.artifacts.get(k) and os.path.exists(self.artifacts[k]) for k in stage.outputs):
+                outputs = {k: self.artifacts[k] for k in stage.outputs}
+            elif not stage.required:
+                outputs = {k: None for k in stage.outputs}
+            else:
+                print(f"✗ 阶段 {name} 尚无可用产物，无法跳过")
+                return False
+        with self._lock:
+            self.artifacts.update(outputs)
+        self.timings[name] = {"status": STATUS_REUSED, "seconds": 0.0}
+        return True
+
+    def run_stage(self, name: str, forced: bool = False) -> bool:
+        stage = self.pipeline.stages[name]
+        try:
+            with self._lock:
+                snapshot = dict(self.artifacts)
+            fp = self.fingerprint(stage)
+        except OSError as e:
+            # 输入缺失（FileNotFoundError）或无法读取（如 PermissionError）：该阶段失败，不中断整个运行
+            print(f"✗ {e}")
+            self.timings[name] = {"status": STATUS_FAILED, "seconds": 0.0}
+            return False
+
+        if not forced:
+            with self._lock:
+                record = self._state["stages"].get(name)
+            outputs = self._recorded_outputs(name)
+            if record and record.get("fingerprint") == fp and outputs is not None:
+                print(f"⏭ 跳过阶段 {name}（输入、配置与模型均未变化）")
+                with self._lock:
+                    self.artifacts.update(outputs)
+                self.timings[name] = {"status": STATUS_SKIPPED, "seconds": 0.0}
+                return True
+
+        limit = self.limits.get(name)
+        queued = time.perf_counter()
+        if limit is not None:
+            limit.acquire()
+        try:
+            print("=" * 50)
+            print(f"阶段: {name}" + (f" [{self.label}]" if self.label else ""))
+            print("=" * 50)
+            t0 = time.perf_counter()
+            try:
+                produced = stage.func(snapshot)
+            except Exception as e:
+                import traceback
+                print(f"✗ 阶段 {name} 出错: {e}")
+                traceback.print_exc()
+                produced = None
+            seconds = time.perf_counter() - t0
+        finally:
+            if limit is not None:
+                limit.release()
+        waited = t0 - queued
+
+        if produced is None:
+            print(f"✗ 阶段 {name} 失败 ({seconds:.1f}s)")
+            self.timings[name] = {"status": STATUS_FAILED, "seconds": seconds, "waited": waited}
+            return False
+
+        outputs = {k: snapshot.get(k) for k in stage.outputs}
+        outputs.update(produced)
+        with self._lock:
+            self.artifacts.update(outputs)
+            self._state["stages"][name] = {
+                "fingerprint": fp,
+                "outputs": outputs,
+                "finished_at": time.time(),
+                "seconds": round(seconds, 3),
+            }
+        # 产物也记下哈希，下游计算指纹时不必再读一遍
+        for path in outputs.values():
+            if path and os.path.exists(path):
+                self._digest(path)
+        self._save_state()
+        self.timings[name] = {"status": STATUS_RAN, "seconds": seconds, "waited": waited}
+        print(f"✓ 阶段 {name} 完成 ({seconds:.1f}s)")
+        return True
+
+    def _execute(self, name: str, reuse: bool, forced: bool) -> bool:
+        """执行（或沿用）一个阶段，记录相对本次运行开始的起止时间"""
+        start = time.perf_counter() - self._t0
+        ok = self.reuse(name) if reuse else self.run_stage(name, forced=forced)
+        end = time.perf_counter() - self._t0
+        self.timings[name].update(start=start, end=end)
+        if not ok:
+            stage = self.pipeline.stages[name]
+            if stage.required:
+                return False
+            print(f"⚠ 阶段 {name} 失败，其产物按空值继续")
+            with self._lock:
+                self.artifacts.update({k: None for k in stage.outputs})
+        return True
+
+    def run(self, from_stage: Optional[str] = None, until_stage: Optional[str] = None,
+            force: bool = False, max_workers: int = 4) -> bool:
+        """
+        执行选中的阶段，互不依赖的分支并行
+
+        一个阶段的上游全部结束后立即提交，例如分离只依赖原音频，会与 stt → translate → tts 同时开始，
+        mix/merge 等两条分支都结束后再执行。必需阶段失败后不再提交新阶段，已在运行的阶段跑完为止。
+
+        Args:
+            from_stage: 从该阶段开始（它及其下游强制重跑，上游直接沿用已有产物）
+            until_stage: 执行到该阶段为止（只包含它和它的上游）
+            force: 忽略指纹，全部重跑
+            max_workers: 同时运行的阶段数上限（1 为按拓扑序顺序执行）
+
+        Returns:
+            bool: 是否全部成功
+        """
+        selected = self.select(from_stage, until_stage)
+        forced = self.forced_stages(from_stage, force)
+        upstream = self.pipeline.ancestors(from_stage) if from_stage else set()
+
+        self._t0 = time.perf_counter()
+        pending = list(selected)
+        finished: Set[str] = set()
+        ok = True
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="stage") as pool:
+            running: Dict[Future, str] = {}
+            while pending or running:
+                if ok:
+                    # 按声明顺序提交所有上游已结束的阶段
+                    for name in [n for n in pending if self.pipeline.deps(n) & set(selected) <= finished]:
+                        pending.remove(name)
+                        reuse = name in upstream and name not in forced
+                        running[pool.submit(self._execute, name, reuse, name in forced)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finished.add(name)
+                    if not future.result():
+                        ok = False
+        self.report(time.perf_counter() - self._t0)
+        return ok
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """本次运行的关键路径：沿依赖累加耗时最长的阶段链，以及它的总耗时"""
+        length: Dict[str, float] = {}
+        prev: Dict[str, Optional[str]] = {}
+        for name in self.pipeline.order():
+            if name not in self.timings:
+                continue
+            deps = [d for d in self.pipeline.deps(name) if d in length]
+            best = max(deps, key=lambda d: length[d], default=None)
+            length[name] = self.timings[name]["seconds"] + (length[best] if best else 0.0)
+            prev[name] = best
+        if not length:
+            return [], 0.0
+        node: Optional[str] = max(length, key=lambda n: length[n])
+        total = length[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = prev[node]
+        return path[::-1], total
+
+    def report(self, wall: float) -> None:
+        print("\n" + "=" * 50)
+        if self.label:
+            print(f"任务 {self.label}")
+        print(f"{'阶段':<16}{'状态':<10}{'开始':>8}{'耗时':>8}")
+        for name in self.pipeline.order():
+            t = self.timings.get(name)
+            if t:
+                print(f"{name:<16}{t['status']:<10}{t.get('start', 0.0):>7.1f}s{t['seconds']:>7.1f}s")
+        path, length = self.critical_path()
+        busy = sum(t["seconds"] for t in self.timings.values())
+        print(f"关键路径: {' → '.join(path)} ({length:.1f}s)")
+        print(f"总耗时 {wall:.1f}s，各阶段累计 {busy:.1f}s，并行节省 {max(0.0, busy - wall):.1f}s")
+        print("=" * 50)
@@ -0,0 +1,266 @@
+"""
+视频翻译流水线的阶段定义
+
+download → stt → translate → tts → separate → mix → download_video → merge
+每个阶段的产物路径由 PathManager 给出（与阶段一一对应、不含时间戳），重跑时同一阶段写同一文件，
+StageRunner 据此按指纹跳过未变化的阶段。
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+from utils.path_manager import PathManager
+
+from .graph import Pipeline, Stage
+
+TTS_OPTIONS = {"pad_when_short": True, "speedup_cap": 3.0, "slowdown_cap": 0.7}
+SEPARATION_MODES = ("spleeter", "stft", "center_cancel")
+
+
+def build_pipeline(
+    basename: str,
+    input_audio_file: Optional[str] = None,
+    input_video_file: Optional[str] = None,
+    url: Optional[str] = None,
+    stt_model: str = 'azure',
+    tts_model: str = 'azure',
+    translator_model: str = 'zhipu',
+    target_lang: str = '中文',
+    target_langs: Optional[List[str]] = None,
+    detect_bg: bool = True,
+    background_fallback: str = 'none',
+    keep_mix: bool = False,
+    separation_mode: str = "spleeter",
+    downloader=None,
+    factory=None,
+) -> Tuple[Pipeline, Dict[str, Optional[str]]]:
+    """
+    按 main() 的参数组装流水线，返回 (pipeline, 各产物的规划路径)
+
+    给出 url 时由 download/download_video 阶段产生音频和视频（需要传入 downloader）；
+    否则音频（和可选的视频）作为初始产物。有视频且不保留混音时，混音在 merge 中与合并一次完成。
+    separation_mode 取 SEPARATION_MODES 之一，参与 separate 阶段的指纹。
+    target_langs 是额外输出字幕的语言：与 target_lang 在 translate 阶段一次解析、共用请求池翻译，
+    配音仍只用 target_lang 的译文。
+    """
+    if separation_mode not in SEPARATION_MODES:
+        raise ValueError(f"不支持的分离模式: {separation_mode}（可选: {', '.join(SEPARATION_MODES)}）")
+    pm = PathManager()
+    intermediate_dir = pm.get_intermediate_dir(basename)
+    has_video = bool(url or input_video_file)
+    extra_langs = [lang for lang in dict.fromkeys(target_langs or []) if lang != target_lang]
+    lang_keys = {lang: f"translated_srt:{lang}" for lang in extra_langs}
+
+    artifacts: Dict[str, Optional[str]] = {
+        "audio": input_audio_file,
+        "video": input_video_file,
+        "srt": pm.get_path('srt', basename),
+        "translated_srt": pm.get_path('translated_srt', basename),
+        "tts_audio": pm.get_path('tts_audio', basename),
+        "bg_audio": pm.get_path('bg_audio', basename),
+        "vocals_audio": pm.get_path('vocals_audio', basename),
+        "mix_audio": pm.get_path('final_mix', basename),
+        "final_video": pm.get_path('final_video', basename) if has_video else None,
+    }
+    for lang, key in lang_keys.items():
+        artifacts[key] = pm.get_path('translated_srt_lang', basename, lang=lang)
+
+    if factory is None:
+        from models.factory import ModelFactory
+        factory = ModelFactory()
+    models = {}
+
+    def model(kind: str, name: str):
+        # 模型在第一次真正需要时才创建，被跳过的阶段不连接任何服务
+        if (kind, name) not in models:
+            models[(kind, name)] = getattr(factory, f'create_{kind}')(name)
+        return models[(kind, name)]
+
+    def signature(kind: str, name: str) -> str:
+        return factory.model_signature(kind, name)
+
+    stages = []
+    initial = []
+
+    if url:
+        video = {'udi': basename, 'url': url}
+        handles = {}
+
+        def download(a):
+            handle = downloader.download_audio_first(video)
+            if handle is None or not handle.audio_path:
+                return None
+            handles['media'] = handle
+            return {"audio": handle.audio_path}
+
+        def download_video(a):
+            handle = handles.get('media')
+            if handle is not None:
+                print("等待后台视频下载完成...")
+                ok = handle.wait_video()
+                path = handle.video_path
+            else:
+                # 音频阶段被跳过：视频多半已在台账中完成，download_video 会直接返回
+                ok = downloader.download_video(video, need_audio=True)
+                path = os.path.join(pm.get_project_dir(basename), f"{basename}.mp4")
+            if not ok or not os.path.exists(path):
+                print(f"⚠ 视频下载失败: {path}")
+                return None
+            return {"video": path}
+
+        stages.append(Stage("download", download, outputs=["audio"], config={"url": url}))
+    else:
+        initial.append("audio")
+        if input_video_file:
+            initial.append("video")
+
+    def stt(a):
+        print(f"使用STT模型: {stt_model}")
+        _, detected_language = model('stt', stt_model).transcribe(a["audio"], output_dir=intermediate_dir)
+        print(f"检测到的语言: {detected_language}")
+        if not os.path.exists(a["srt"]):
+            print(f"错误: SRT文件不存在: {a['srt']}")
+            print("请确保STT步骤已成功生成SRT文件")
+            return None
+        return {"srt": a["srt"]}
+
+    def translate(a):
+        print(f"使用翻译模型: {translator_model}")
+        translator = model('translator', translator_model)
+        if not lang_keys:
+            if not translator.translate_file(a["srt"], a["translated_srt"], target_lang=target_lang):
+                print("翻译失败")
+                return None
+            return {"translated_srt": a["translated_srt"]}
+
+        if not hasattr(translator, 'translate_file_multi'):
+            print(f"翻译模型 {translator_model} 不支持多语言输出")
+            return None
+        keys = {target_lang: "translated_srt", **lang_keys}
+        results = translator.translate_file_multi(a["srt"], {lang: a[key] for lang, key in keys.items()})
+        failed = [lang for lang, ok in results.items() if not ok]
+        if failed:
+            print(f"翻译失败: {', '.join(failed)}")
+            return None
+        return {key: a[key] for key in keys.values()}
+
+    def tts(a):
+        print(f"使用TTS模型: {tts_model}")
+        engine = model('tts', tts_model)
+        output_audio = a["tts_audio"]
+        tmp_dir = pm.get_path('tmp_tts', basename)
+        try:
+            ok = engine.synthesize_srt_aligned(
+                srt_path=a["translated_srt"],
+                out_audio_path=output_audio,
+                tmp_dir=tmp_dir,
+                export_format=os.path.splitext(output_audio)[1].lstrip(".") or "wav",
+                **TTS_OPTIONS,
+            )
+        finally:
+            # 清理中间目录（可根据需要关闭清理便于调试）
+            try:
+                engine.cleanup_tmp(tmp_dir)
+            except Exception:
+                pass
+        if not ok:
+            print("✗ 中文音频生成失败")
+            return None
+        print(f"✓ 中文音频生成成功，保存为 {output_audio}")
+        return {"tts_audio": output_audio}
+
+    def separate(a):
+        from audio_utils import separate_vocals_background
+        from audio_utils.analysis import detect_background, synthesize_room_tone
+
+        report = None
+        if detect_bg:
+            report = detect_background(a["audio"])
+            print(f"背景声检测: {'有' if report.has_background else '无'}背景声 "
+                  f"(底噪 {report.floor_db:.1f}dB, 垫底窗口 {report.bed_fraction:.0%}, "
+                  f"调性 {report.tonality:.2f}, 耗时 {report.elapsed:.2f}s)")
+
+        if report is None or report.has_background:
+            ok = separate_vocals_background(
+                input_audio_path=a["audio"],
+                vocals_output_path=a["vocals_audio"],
+                background_output_path=a["bg_audio"],
+                mode=separation_mode,
+            )
+            if not ok:
+                print("⚠ 背景声分离失败，继续使用纯TTS音频")
+                return None
+            return {"bg_audio": a["bg_audio"], "vocals_audio": a["vocals_audio"]}
+        if background_fallback == 'room_tone':
+            print("跳过人声分离，使用合成房间底噪作为背景")
+            if not synthesize_room_tone(a["bg_audio"], report.duration):
+                return None
+            return {"bg_audio": a["bg_audio"], "vocals_audio": None}
+        print("跳过人声分离，直接使用纯TTS音频")
+        return {"bg_audio": None, "vocals_audio": None}
+
+    def mix(a):
+        if not a["bg_audio"]:
+            return {"mix_audio": None}
+        from audio_utils.mixer import mix_background_and_tts
+        if not mix_background_and_tts(a["bg_audio"], a["tts_audio"], a["mix_audio"]):
+            print("⚠ 背景声混合失败，继续使用纯TTS音频")
+            return None
+        print(f"✓ 背景声混合成功，保存为 {a['mix_audio']}")
+        return {"mix_audio": a["mix_audio"]}
+
+    stages += [
+        Stage("stt", stt, inputs=["audio"], outputs=["srt"], model=signature('stt', stt_model)),
+        Stage("translate", translate, inputs=["srt"], outputs=["translated_srt"] + list(lang_keys.values()),
+              config={"target_lang": target_lang, "target_langs": extra_langs},
+              model=signature('translator', translator_model)),
+        Stage("tts", tts, inputs=["translated_srt"], outputs=["tts_audio"],
+              config=dict(TTS_OPTIONS), model=signature('tts', tts_model)),
+        Stage("separate", separate, inputs=["audio"], outputs=["bg_audio", "vocals_audio"],
+              config={"detect_bg": detect_bg, "background_fallback": background_fallback,
+                      "mode": separation_mode},
+              required=False),
+    ]
+
+    # 有视频且不需要保留混音文件时，混音与合并在 merge 阶段一次完成
+    fused = has_video and not keep_mix
+    if not fused:
+        stages.append(Stage("mix", mix, inputs=["bg_audio", "tts_audio"], outputs=["mix_audio"],
+                            optional_inputs=["bg_audio"], required=False))
+
+    if has_video:
+        def merge(a):
+            from videomerger import VideoMerger
+
+            if not a["video"]:
+                if fused and a["bg_audio"]:
+                    # 视频没拿到，至少把混音单独输出
+                    mix_path = pm.get_path('final_mix', basename)
+                    from audio_utils.mixer import mix_background_and_tts
+                    if mix_background_and_tts(a["bg_audio"], a["tts_audio"], mix_path):
+                        print(f"✓ 背景声混合成功，保存为 {mix_path}")
+                print("⚠ 视频文件不可用，跳过合并步骤")
+                return None
+
+            merger = VideoMerger()
+            output_video = a["final_video"]
+            if fused and a["bg_audio"]:
+                ok = merger.mix_and_merge(a["video"], a["bg_audio"], a["tts_audio"], output_video)
+            else:
+                audio = a["tts_audio"] if fused else (a["mix_audio"] or a["tts_audio"])
+                ok = merger.merge(a["video"], audio, output_video)
+            if not ok:
+                print("✗ 视频合并失败")
+                return None
+            print(f"✓ 最终视频已生成: {output_video}")
+            return {"final_video": output_video}
+
+        merge_inputs = ["video", "tts_audio", "bg_audio"] + ([] if fused else ["mix_audio"])
+        if url:
+            # 视频只有 merge 需要：与转写、配音、分离并行等待后台下载
+            stages.append(Stage("download_video", download_video, inputs=["audio"], outputs=["video"],
+                                config={"url": url}, required=False))
+        stages.append(Stage("merge", merge, inputs=merge_inputs, outputs=["final_video"],
+                            config={"fused": fused},
+                            optional_inputs=["video", "bg_audio", "mix_audio"]))
+
+    return Pipeline(stages, initial=initial), artifacts
@@ -8,6 +8,7 @@ setup(
     install_requires=[
         "azure-cognitiveservices-speech",
         "pydub",
+        "numpy",
         "openai",
         "webvtt-py",
         "googletrans==4.0.0-rc1",
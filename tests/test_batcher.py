@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from texttranslator.batcher import TranslationBatcher
+
+
+class FakeTranslator:
+    """只实现 batcher 用到的接口，记录每个请求的批次"""
+
+    base_url = "http://fake"
+    model = "fake"
+    api_key = "key"
+
+    def __init__(self, fail=False, drop=()):
+        self.fail = fail
+        self.drop = set(drop)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def _translate_batch_with_retry(self, batch, target_lang):
+        with self._lock:
+            self.batches.append((target_lang, [it["text"] for it in batch]))
+        if self.fail:
+            raise RuntimeError("boom")
+        return {it["id"]: f"{target_lang}:{it['text']}" for it in batch if it["text"] not in self.drop}
+
+
+def run_concurrently(batcher, jobs):
+    results = [None] * len(jobs)
+    errors = [None] * len(jobs)
+
+    def call(i, items, lang):
+        try:
+            results[i] = batcher.translate(items, lang)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, items, lang)) for i, (items, lang) in enumerate(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+def test_merges_concurrent_callers_and_routes_results():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=200)
+    # 两个任务的 id 都从 1 开始，内部换成全局 id 后不会串
+    jobs = [
+        ([{"id": 1, "text": "a"}, {"id": 2, "text": "b"}], "zh"),
+        ([{"id": 1, "text": "c"}], "zh"),
+    ]
+    results, errors = run_concurrently(batcher, jobs)
+
+    assert errors == [None, None]
+    assert results == [{1: "zh:a", 2: "zh:b"}, {1: "zh:c"}]
+    assert len(translator.batches) == 1
+    assert sorted(translator.batches[0][1]) == ["a", "b", "c"]
+    assert batcher.stats()["items_per_request"] == 3
+
+
+def test_separate_languages_are_separate_requests():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=50)
+    results, _ = run_concurrently(batcher, [
+        ([{"id": 1, "text": "a"}], "zh"),
+        ([{"id": 1, "text": "a"}], "ja"),
+    ])
+
+    assert results == [{1: "zh:a"}, {1: "ja:a"}]
+    assert sorted(lang for lang, _ in translator.batches) == ["ja", "zh"]
+
+
+def test_full_batch_is_sent_without_waiting_for_linger():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=10_000, max_n=2)
+    t0 = time.monotonic()
+    result = batcher.translate([{"id": 1, "text": "a"}, {"id": 2, "text": "b"}], "zh")
+
+    assert result == {1: "zh:a", 2: "zh:b"}
+    assert time.monotonic() - t0 < 5
+
+
+def test_partial_batch_is_flushed_after_linger():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=100, max_n=10)
+    t0 = time.monotonic()
+    result = batcher.translate([{"id": 7, "text": "a"}], "zh")
+
+    assert result == {7: "zh:a"}
+    assert time.monotonic() - t0 >= 0.09
+
+
+def test_oversized_submission_is_split():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=20, max_n=2)
+    items = [{"id": i, "text": str(i)} for i in range(5)]
+    result = batcher.translate(items, "zh")
+
+    assert result == {i: f"zh:{i}" for i in range(5)}
+    assert [len(texts) for _, texts in translator.batches] == [2, 2, 1]
+
+
+def test_missing_ids_fall_back_to_source():
+    translator = FakeTranslator(drop={"b"})
+    batcher = TranslationBatcher(translator, linger_ms=20)
+    result = batcher.translate([{"id": 1, "text": "a"}, {"id": 2, "text": "b"}], "zh")
+
+    assert result == {1: "zh:a", 2: "b"}
+
+
+def test_request_error_propagates_to_every_caller():
+    translator = FakeTranslator(fail=True)
+    batcher = TranslationBatcher(translator, linger_ms=200)
+    results, errors = run_concurrently(batcher, [
+        ([{"id": 1, "text": "a"}], "zh"),
+        ([{"id": 1, "text": "b"}], "zh"),
+    ])
+
+    assert results == [None, None]
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_request_error_raises_from_translate():
+    batcher = TranslationBatcher(FakeTranslator(fail=True), linger_ms=20)
+    with pytest.raises(RuntimeError, match="boom"):
+        batcher.translate([{"id": 1, "text": "a"}], "zh")
+
+
+def test_empty_submission_returns_immediately():
+    translator = FakeTranslator()
+    batcher = TranslationBatcher(translator, linger_ms=20)
+
+    assert batcher.translate([], "zh") == {}
+    assert translator.batches == []
+
+
+def test_shared_batcher_is_keyed_by_settings():
+    translator = FakeTranslator()
+    translator.api_key = "shared-key-test"
+
+    first = TranslationBatcher.shared(translator, linger_ms=50)
+    assert TranslationBatcher.shared(translator, linger_ms=50) is first
+    # linger_ms 不同的调用方不会拿到先创建者的 batcher
+    other = TranslationBatcher.shared(translator, linger_ms=500)
+    assert other is not first
+    assert other.linger_s == 0.5
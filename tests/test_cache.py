@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from audio_utils.cache import SeparationCache
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """已存入缓存的一组 stems，返回 (cache, key)"""
+    cache = SeparationCache(root=str(tmp_path / "cache"), max_bytes=1 << 30)
+    source = tmp_path / "input.wav"
+    source.write_bytes(b"source audio")
+    key = cache.key(str(source), "spleeter", "2stems")
+
+    work = tmp_path / "first"
+    work.mkdir()
+    (work / "vocals.wav").write_bytes(b"vocals")
+    (work / "bg.wav").write_bytes(b"background")
+    cache.store(key, str(work / "vocals.wav"), str(work / "bg.wav"))
+    return cache, key
+
+
+def test_fetch_places_cached_stems(stored, tmp_path):
+    cache, key = stored
+    vocals, bg = tmp_path / "ws" / "vocals.wav", tmp_path / "ws" / "bg.wav"
+
+    assert cache.fetch(key, str(vocals), str(bg))
+    assert vocals.read_bytes() == b"vocals"
+    assert bg.read_bytes() == b"background"
+    assert not [name for name in os.listdir(tmp_path / "ws") if name.endswith(".part")]
+
+
+def test_fetch_miss(stored, tmp_path):
+    cache, _ = stored
+
+    assert not cache.fetch("0" * 32, str(tmp_path / "v.wav"), str(tmp_path / "b.wav"))
+
+
+def test_writing_fetched_file_leaves_cache_intact(stored, tmp_path):
+    cache, key = stored
+    vocals, bg = tmp_path / "ws" / "vocals.wav", tmp_path / "ws" / "bg.wav"
+    cache.fetch(key, str(vocals), str(bg))
+
+    # 原地覆盖写（与 ffmpeg -y 相同，截断后重写同一个 inode）
+    with open(bg, "r+b") as f:
+        f.truncate(0)
+        f.write(b"room tone")
+
+    again_vocals, again_bg = tmp_path / "ws2" / "vocals.wav", tmp_path / "ws2" / "bg.wav"
+    assert cache.fetch(key, str(again_vocals), str(again_bg))
+    assert again_bg.read_bytes() == b"background"
+
+
+def test_fetch_breaks_existing_hardlink(stored, tmp_path):
+    cache, key = stored
+    _, _, bg_cached = cache._entry_paths(key, "vocals.wav", "bg.wav")
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    # 旧版本留下的硬链接
+    os.link(bg_cached, ws / "bg.wav")
+
+    cache.fetch(key, str(ws / "vocals.wav"), str(ws / "bg.wav"))
+    with open(ws / "bg.wav", "r+b") as f:
+        f.write(b"XX")
+
+    with open(bg_cached, "rb") as f:
+        assert f.read() == b"background"
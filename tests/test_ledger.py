@@ -0,0 +1,133 @@
+import os
+import sys
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ytdownloader.downloader import YouTubeDownloader
+from ytdownloader.ledger import (CHECKSUM_CHUNK, STATE_DONE, STATE_FAILED, STATE_PENDING, STATE_RUNNING,
+                                 DownloadLedger, quick_checksum)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DownloadLedger(str(tmp_path / "videos.ledger.sqlite"))
+    yield ledger
+    ledger.close()
+
+
+def write(path, data: bytes):
+    path.write_bytes(data)
+    return str(path)
+
+
+def bump_mtime(path: str):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_job_states(ledger):
+    ledger.register("a", "https://youtu.be/a")
+    ledger.register("b", "https://youtu.be/b")
+    assert ledger.state("a") == STATE_PENDING
+
+    ledger.set_state("a", STATE_RUNNING)
+    ledger.set_state("a", STATE_DONE)
+    ledger.set_state("b", STATE_FAILED, error="boom")
+    # 重复登记不会重置状态
+    ledger.register("a", "https://youtu.be/a")
+
+    assert ledger.state("a") == STATE_DONE
+    assert ledger.state("missing") is None
+    assert ledger.counts() == {STATE_DONE: 1, STATE_FAILED: 1}
+    assert ledger.known_udis() == {"a", "b"}
+    assert ledger.known_udis(STATE_DONE) == {"a"}
+
+
+def test_verify_ok_and_missing(ledger, tmp_path):
+    path = write(tmp_path / "a.mp4", b"x" * 100)
+    assert ledger.verify("a", "video") == "missing"
+
+    ledger.record("a", "video", path)
+    assert ledger.verify("a", "video") == "ok"
+
+    os.remove(path)
+    assert ledger.verify("a", "video") == "missing"
+
+
+def test_verify_touched_file_is_ok_and_refreshed(ledger, tmp_path):
+    path = write(tmp_path / "a.mp4", b"x" * 100)
+    ledger.record("a", "video", path)
+    bump_mtime(path)
+
+    # 只是 mtime 变了：校验和一致仍算完好，并刷新登记的 mtime
+    assert ledger.verify("a", "video") == "ok"
+    assert ledger.artifact("a", "video")["mtime_ns"] == os.stat(path).st_mtime_ns
+
+
+def test_verify_detects_size_change(ledger, tmp_path):
+    path = write(tmp_path / "a.mp4", b"x" * 100)
+    ledger.record("a", "video", path)
+    write(tmp_path / "a.mp4", b"x" * 50)
+
+    assert ledger.verify("a", "video") == "corrupt"
+
+
+def test_verify_detects_same_size_content_change(ledger, tmp_path):
+    path = write(tmp_path / "a.mp4", b"x" * 100)
+    ledger.record("a", "video", path)
+    write(tmp_path / "a.mp4", b"y" * 100)
+    bump_mtime(path)
+
+    assert ledger.verify("a", "video") == "corrupt"
+
+
+def test_quick_checksum_reads_head_and_tail(tmp_path):
+    size = 3 * CHECKSUM_CHUNK
+    base = write(tmp_path / "a.bin", b"\0" * size)
+    head = write(tmp_path / "b.bin", b"\1" + b"\0" * (size - 1))
+    tail = write(tmp_path / "c.bin", b"\0" * (size - 1) + b"\1")
+    middle = write(tmp_path / "d.bin", b"\0" * CHECKSUM_CHUNK + b"\1" + b"\0" * (size - CHECKSUM_CHUNK - 1))
+
+    assert quick_checksum(head) != quick_checksum(base)
+    assert quick_checksum(tail) != quick_checksum(base)
+    # 中间部分不参与校验（常数开销），改动只能靠大小发现
+    assert quick_checksum(middle) == quick_checksum(base)
+
+
+@pytest.fixture
+def downloader(ledger):
+    downloader = YouTubeDownloader()
+    downloader.ledger = ledger
+    yield downloader
+    downloader.close()
+
+
+def test_artifact_ok_adopts_files_downloaded_before_ledger(downloader, ledger, tmp_path):
+    path = write(tmp_path / "a.downloaded.srt", b"1\n00:00:00,000 --> 00:00:01,000\nhi\n")
+
+    assert downloader._artifact_ok("a", "downloaded_srt", path)
+    assert ledger.artifact("a", "downloaded_srt")["path"] == os.path.abspath(path)
+    assert ledger.verify("a", "downloaded_srt") == "ok"
+
+
+def test_artifact_ok_rejects_empty_or_missing_files(downloader, ledger, tmp_path):
+    empty = write(tmp_path / "a.downloaded.srt", b"")
+
+    assert not downloader._artifact_ok("a", "downloaded_srt", empty)
+    assert not downloader._artifact_ok("a", "downloaded_srt", str(tmp_path / "missing.srt"))
+    assert not downloader._artifact_ok("a", "downloaded_srt", None)
+    assert ledger.artifact("a", "downloaded_srt") is None
+
+
+def test_artifact_ok_removes_corrupt_file(downloader, ledger, tmp_path):
+    path = write(tmp_path / "a.mp4", b"x" * 100)
+    ledger.record("a", "video", path)
+    write(tmp_path / "a.mp4", b"x" * 10)
+
+    # 损坏的文件删除并从台账移除，以便重新下载
+    assert not downloader._artifact_ok("a", "video", path)
+    assert not os.path.exists(path)
+    assert ledger.artifact("a", "video") is None
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ytdownloader.limits import HostLimiter, TokenBucket, host_key
+
+
+def test_host_key_merges_aliases():
+    assert host_key("https://www.youtube.com/watch?v=x") == "youtube.com"
+    assert host_key("https://m.youtube.com/watch?v=x") == "youtube.com"
+    assert host_key("https://youtu.be/x") == "youtube.com"
+    assert host_key("https://music.youtube.com/watch?v=x") == "youtube.com"
+    assert host_key("https://www.bilibili.com/video/BV1") == "bilibili.com"
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=20.0, burst=3)
+    t0 = time.monotonic()
+    for _ in range(3):
+        assert bucket.acquire() == 0.0
+    assert time.monotonic() - t0 < 0.05
+
+    # 桶空后按 rate 补充：再取 4 个约需 4 / 20 = 0.2s
+    for _ in range(4):
+        bucket.acquire()
+    elapsed = time.monotonic() - t0
+    assert 0.15 <= elapsed < 1.0
+
+
+def test_token_bucket_reports_wait():
+    bucket = TokenBucket(rate=10.0, burst=1)
+    bucket.acquire()
+
+    assert bucket.acquire() > 0.05
+
+
+def test_token_bucket_is_shared_across_threads():
+    bucket = TokenBucket(rate=20.0, burst=1)
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    # 5 个线程共用一个桶：第一个立即拿到，其余按 20/s 依次放行
+    assert time.monotonic() - t0 >= 0.15
+
+
+def test_token_bucket_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0)
+    t0 = time.monotonic()
+    for _ in range(100):
+        assert bucket.acquire() == 0.0
+    assert time.monotonic() - t0 < 0.05
+
+
+def run_slots(limiter, urls, hold=0.05):
+    peak = {}
+    active = {}
+    lock = threading.Lock()
+
+    def work(url):
+        with limiter.slot(url) as host:
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(hold)
+            with lock:
+                active[host] -= 1
+
+    threads = [threading.Thread(target=work, args=(url,)) for url in urls]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return peak
+
+
+def test_host_limiter_caps_concurrency_per_host():
+    urls = ["https://www.youtube.com/watch?v=a", "https://youtu.be/b", "https://m.youtube.com/watch?v=c",
+            "https://www.youtube.com/watch?v=d", "https://vimeo.com/1", "https://vimeo.com/2"]
+    peak = run_slots(HostLimiter(per_host=2), urls)
+
+    # 别名算同一站点；不同站点互不占用
+    assert peak["youtube.com"] == 2
+    assert peak["vimeo.com"] == 2
+
+
+def test_host_limiter_minimum_one_slot():
+    peak = run_slots(HostLimiter(per_host=0), ["https://vimeo.com/1", "https://vimeo.com/2"])
+
+    assert peak["vimeo.com"] == 1
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from audio_utils.mixer import duck_gain, mix_arrays
+
+SR = 1000
+DUCK = 10.0 ** (-8.0 / 20.0)
+
+
+def speech_burst(start: float = 1.0, end: float = 2.0, total: float = 4.0) -> np.ndarray:
+    """start~end 秒为 50Hz 正弦（-9dBFS 左右），其余静音"""
+    signal = np.zeros(int(total * SR), dtype=np.float32)
+    t = np.arange(int((end - start) * SR)) / SR
+    signal[int(start * SR):int(end * SR)] = 0.5 * np.sin(2 * np.pi * 50 * t)
+    return signal
+
+
+def at(gain: np.ndarray, seconds: float) -> float:
+    return float(gain[int(seconds * SR)])
+
+
+def test_silence_is_not_ducked():
+    gain = duck_gain(np.zeros((2 * SR, 2), dtype=np.float32), SR)
+
+    assert gain.shape == (2 * SR,)
+    assert gain.dtype == np.float32
+    assert np.allclose(gain, 1.0)
+
+
+def test_speech_is_ducked_to_duck_db():
+    gain = duck_gain(speech_burst(), SR, duck_db=-8.0)
+
+    assert at(gain, 1.5) == pytest.approx(DUCK, abs=1e-3)
+    assert gain.min() == pytest.approx(DUCK, abs=1e-3)
+    assert gain.max() <= 1.0
+
+
+def test_attack_ducks_before_speech_starts():
+    gain = duck_gain(speech_burst(), SR, attack_ms=40.0, release_ms=350.0)
+
+    # 提前 attack_ms 开始压低，第一个字出来时已经压到底
+    assert at(gain, 0.9) == pytest.approx(1.0)
+    assert DUCK < at(gain, 0.97) < 1.0
+    assert at(gain, 1.0) == pytest.approx(DUCK, abs=1e-3)
+
+
+def test_release_holds_after_speech_then_recovers():
+    gain = duck_gain(speech_burst(), SR, attack_ms=40.0, release_ms=350.0)
+
+    # 停顿后保持 release_ms 再恢复，短停顿时背景不会忽高忽低
+    assert at(gain, 2.2) == pytest.approx(DUCK, abs=1e-3)
+    assert at(gain, 2.3) == pytest.approx(DUCK, abs=1e-3)
+    assert DUCK < at(gain, 2.35) < 1.0
+    assert at(gain, 2.5) == pytest.approx(1.0)
+
+
+def test_longer_release_recovers_later():
+    short = duck_gain(speech_burst(), SR, release_ms=200.0)
+    long = duck_gain(speech_burst(), SR, release_ms=800.0)
+
+    assert at(short, 2.5) == pytest.approx(1.0)
+    assert at(long, 2.5) == pytest.approx(DUCK, abs=1e-3)
+
+
+def test_gain_is_monotonic_through_transitions():
+    gain = duck_gain(speech_burst(), SR)
+
+    # 过渡是平滑的斜坡，没有跳变
+    assert np.all(np.diff(gain[int(0.9 * SR):int(1.1 * SR)]) <= 1e-6)
+    assert np.all(np.diff(gain[int(2.2 * SR):int(2.5 * SR)]) >= -1e-6)
+    assert np.abs(np.diff(gain)).max() < 0.02
+
+
+def test_mix_arrays_applies_ducked_background_gain():
+    speech = np.repeat(speech_burst()[:, None], 2, axis=1)
+    background = np.full((len(speech) + 100, 2), 0.5, dtype=np.float32)
+    mixed = mix_arrays(background, speech, SR, bg_volume=0.4, tts_volume=1.0)
+
+    # 长度取较短者；静音处只有背景，说话处背景被压低后再叠加配音
+    assert mixed.shape == speech.shape
+    assert mixed[int(0.5 * SR), 0] == pytest.approx(0.2)
+    i = int(1.5 * SR)
+    assert mixed[i, 0] == pytest.approx(0.2 * DUCK + speech[i, 0], abs=1e-3)
+
+
+def test_mix_arrays_without_ducking():
+    speech = np.repeat(speech_burst()[:, None], 2, axis=1)
+    background = np.full_like(speech, 0.5)
+    mixed = mix_arrays(background, speech, SR, bg_volume=0.4, duck_db=None)
+
+    assert np.allclose(mixed, np.clip(0.2 + speech, -1.0, 1.0))
@@ -0,0 +1,249 @@
+import os
+import sys
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.batch import DEFAULT_STAGE_WORKERS, parse_stage_workers
+from pipeline.graph import Pipeline, Stage
+from pipeline.runner import STATUS_FAILED, STATUS_RAN, STATUS_REUSED, STATUS_SKIPPED, StageRunner
+
+
+def noop(a):
+    return {}
+
+
+# ---------------------------
+# 阶段图
+# ---------------------------
+def test_order_follows_dependencies_and_declaration():
+    pipeline = Pipeline([
+        Stage("c", noop, inputs=["b"], outputs=["c"]),
+        Stage("a", noop, inputs=["src"], outputs=["a"]),
+        Stage("b", noop, inputs=["a"], outputs=["b"]),
+        Stage("side", noop, inputs=["src"], outputs=["side"]),
+    ], initial=["src"])
+
+    assert pipeline.order() == ["a", "b", "c", "side"]
+    assert pipeline.deps("c") == {"b"}
+    assert pipeline.ancestors("c") == {"a", "b"}
+    assert pipeline.descendants("a") == {"b", "c"}
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="循环依赖"):
+        Pipeline([
+            Stage("a", noop, inputs=["b"], outputs=["a"]),
+            Stage("b", noop, inputs=["a"], outputs=["b"]),
+        ])
+
+
+def test_self_cycle_is_rejected():
+    with pytest.raises(ValueError, match="循环依赖"):
+        Pipeline([Stage("a", noop, inputs=["a"], outputs=["a"])])
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="重名"):
+        Pipeline([Stage("a", noop), Stage("a", noop)])
+    with pytest.raises(ValueError, match="同时由"):
+        Pipeline([Stage("a", noop, outputs=["x"]), Stage("b", noop, outputs=["x"])])
+    with pytest.raises(ValueError, match="没有来源"):
+        Pipeline([Stage("a", noop, inputs=["x"])])
+
+
+# ---------------------------
+# 按指纹跳过
+# ---------------------------
+class Chain:
+    """src → upper → count：每个阶段把结果写到文件，并记录被调用的次数"""
+
+    def __init__(self, tmp_path, suffix="!"):
+        self.tmp_path = tmp_path
+        self.src = tmp_path / "src.txt"
+        self.src.write_text("hello", encoding="utf-8")
+        self.suffix = suffix
+        self.calls = []
+
+    def path(self, name):
+        return str(self.tmp_path / f"{name}.txt")
+
+    def upper(self, a):
+        self.calls.append("upper")
+        with open(a["src"], encoding="utf-8") as f:
+            text = f.read()
+        with open(a["upper"], "w", encoding="utf-8") as f:
+            f.write(text.upper() + self.suffix)
+        return {"upper": a["upper"]}
+
+    def count(self, a):
+        self.calls.append("count")
+        with open(a["upper"], encoding="utf-8") as f:
+            text = f.read()
+        with open(a["count"], "w", encoding="utf-8") as f:
+            f.write(str(len(text)))
+        return {"count": a["count"]}
+
+    def runner(self):
+        pipeline = Pipeline([
+            Stage("upper", self.upper, inputs=["src"], outputs=["upper"], config={"suffix": self.suffix}),
+            Stage("count", self.count, inputs=["upper"], outputs=["count"]),
+        ], initial=["src"])
+        artifacts = {"src": str(self.src), "upper": self.path("upper"), "count": self.path("count")}
+        return StageRunner(pipeline, artifacts, str(self.tmp_path / "state.json"))
+
+    def run(self, **kwargs):
+        self.calls = []
+        runner = self.runner()
+        assert runner.run(**kwargs)
+        return {name: t["status"] for name, t in runner.timings.items()}
+
+
+def test_second_run_skips_unchanged_stages(tmp_path):
+    chain = Chain(tmp_path)
+
+    assert chain.run() == {"upper": STATUS_RAN, "count": STATUS_RAN}
+    assert chain.run() == {"upper": STATUS_SKIPPED, "count": STATUS_SKIPPED}
+    assert chain.calls == []
+
+
+def test_input_change_reruns_downstream(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+    chain.src.write_text("world", encoding="utf-8")
+
+    assert chain.run() == {"upper": STATUS_RAN, "count": STATUS_RAN}
+
+
+def test_unchanged_output_skips_downstream(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+    # 输入内容变了但上游产出不变（大小写不同）：下游按内容哈希比较，仍然跳过
+    chain.src.write_text("HELLO", encoding="utf-8")
+
+    assert chain.run() == {"upper": STATUS_RAN, "count": STATUS_SKIPPED}
+
+
+def test_config_change_reruns_stage(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+    chain.suffix = "?"
+
+    assert chain.run() == {"upper": STATUS_RAN, "count": STATUS_RAN}
+    assert chain.run() == {"upper": STATUS_SKIPPED, "count": STATUS_SKIPPED}
+
+
+def test_missing_output_reruns_stage(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+    os.remove(chain.path("count"))
+
+    assert chain.run() == {"upper": STATUS_SKIPPED, "count": STATUS_RAN}
+
+
+def test_force_reruns_everything(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+
+    assert chain.run(force=True) == {"upper": STATUS_RAN, "count": STATUS_RAN}
+
+
+def test_from_stage_reuses_upstream_and_forces_downstream(tmp_path):
+    chain = Chain(tmp_path)
+    chain.run()
+
+    assert chain.run(from_stage="count") == {"upper": STATUS_REUSED, "count": STATUS_RAN}
+    assert chain.calls == ["count"]
+
+
+def test_until_stage_stops_early(tmp_path):
+    chain = Chain(tmp_path)
+
+    assert chain.run(until_stage="upper") == {"upper": STATUS_RAN}
+    assert not os.path.exists(chain.path("count"))
+
+
+def test_unknown_stage_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="未知阶段"):
+        Chain(tmp_path).runner().run(from_stage="nope")
+
+
+def test_required_failure_stops_pipeline(tmp_path):
+    calls = []
+
+    def fail(a):
+        calls.append("fail")
+        return None
+
+    def after(a):
+        calls.append("after")
+        return {}
+
+    pipeline = Pipeline([
+        Stage("fail", fail, outputs=["x"]),
+        Stage("after", after, inputs=["x"], optional_inputs=["x"]),
+    ])
+    runner = StageRunner(pipeline, {"x": None}, str(tmp_path / "state.json"))
+
+    assert not runner.run()
+    assert calls == ["fail"]
+    assert runner.timings["fail"]["status"] == STATUS_FAILED
+
+
+def test_unreadable_input_fails_stage_without_aborting(tmp_path):
+    chain = Chain(tmp_path)
+    runner = chain.runner()
+
+    def denied(path):
+        raise PermissionError(13, "Permission denied", path)
+
+    runner._digest = denied
+
+    # 指纹读不了输入：该阶段记为失败，run 正常返回并输出报告，而不是把异常抛出线程池
+    assert not runner.run()
+    assert runner.timings["upper"]["status"] == STATUS_FAILED
+    assert "count" not in runner.timings
+
+
+def test_optional_failure_continues_with_none(tmp_path):
+    seen = {}
+
+    def after(a):
+        seen["x"] = a["x"]
+        return {}
+
+    pipeline = Pipeline([
+        Stage("fail", lambda a: None, outputs=["x"], required=False),
+        Stage("after", after, inputs=["x"], optional_inputs=["x"]),
+    ])
+    runner = StageRunner(pipeline, {"x": str(tmp_path / "x.txt")}, str(tmp_path / "state.json"))
+
+    assert runner.run()
+    assert seen == {"x": None}
+
+
+# ---------------------------
+# 批量处理的阶段并发设置
+# ---------------------------
+def test_parse_stage_workers_defaults():
+    assert parse_stage_workers(None) == DEFAULT_STAGE_WORKERS
+    assert parse_stage_workers("") == DEFAULT_STAGE_WORKERS
+    assert parse_stage_workers(None) is not DEFAULT_STAGE_WORKERS
+
+
+def test_parse_stage_workers_overrides():
+    workers = parse_stage_workers(" stt=3, separate=2 ,merge=0,")
+
+    assert workers["stt"] == 3
+    assert workers["separate"] == 2
+    # 至少 1 个
+    assert workers["merge"] == 1
+    assert workers["tts"] == DEFAULT_STAGE_WORKERS["tts"]
+
+
+@pytest.mark.parametrize("spec", ["unknown=2", "stt", "stt=x"])
+def test_parse_stage_workers_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_stage_workers(spec)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from audio_utils.separator import _plan_windows
+
+
+def assert_covers(windows, total, chunk, overlap):
+    assert windows[0][0] == 0.0
+    # 最后一个窗口正好到结尾
+    assert windows[-1][0] + windows[-1][1] == pytest.approx(total)
+    for (offset, duration), (next_offset, _) in zip(windows, windows[1:]):
+        # 相邻窗口按步长排列，并且重叠 overlap 秒用于交叉淡化
+        assert next_offset - offset == pytest.approx(chunk)
+        assert offset + duration - next_offset == pytest.approx(overlap)
+
+
+def test_windows_overlap_and_cover_input():
+    windows = _plan_windows(1000.0, 300.0, 5.0)
+
+    assert windows == [(0.0, 305.0), (300.0, 305.0), (600.0, 305.0), (900.0, 100.0)]
+    assert_covers(windows, 1000.0, 300.0, 5.0)
+
+
+def test_exact_multiple_has_no_empty_tail():
+    windows = _plan_windows(600.0, 300.0, 5.0)
+
+    assert windows == [(0.0, 305.0), (300.0, 300.0)]
+
+
+def test_short_tail_is_merged_into_previous_window():
+    # 尾巴 8s <= 2 * overlap，单独成窗时交叉淡化会比窗口还长
+    windows = _plan_windows(608.0, 300.0, 5.0)
+
+    assert windows == [(0.0, 305.0), (300.0, 308.0)]
+    assert windows[-1][0] + windows[-1][1] == pytest.approx(608.0)
+
+
+def test_tail_longer_than_twice_overlap_is_kept():
+    windows = _plan_windows(611.0, 300.0, 5.0)
+
+    assert windows == [(0.0, 305.0), (300.0, 305.0), (600.0, 11.0)]
+
+
+def test_short_input_is_one_window():
+    assert _plan_windows(100.0, 300.0, 5.0) == [(0.0, 100.0)]
@@ -0,0 +1,209 @@
+import os
+import sys
+import threading
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from texttranslator.translator import TextTranslator
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+Thanks for watching
+
+2
+00:00:02,000 --> 00:00:03,000
+<i>Hello</i>
+
+3
+00:00:03,000 --> 00:00:04,000
+[Music]
+
+4
+00:00:04,000 --> 00:00:05,000
+Thanks for watching
+
+5
+00:00:05,000 --> 00:00:06,000
+<b>Hello</b>
+
+6
+00:00:06,000 --> 00:00:07,000
+Thanks for watching
+"""
+
+
+def make_translator() -> TextTranslator:
+    # 只测本地解析/回填，不创建 OpenAI 客户端
+    return object.__new__(TextTranslator)
+
+
+def write_srt(tmp_path, content=SRT):
+    path = tmp_path / "in.srt"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_prepare_srt_dedups_identical_lines(tmp_path):
+    prepared = make_translator()._prepare_srt(write_srt(tmp_path))
+
+    # 相同文本只保留第一条；标签保护后 <i>Hello</i> 与 <b>Hello</b> 文本相同，也算重复
+    assert [it["id"] for it in prepared.translatable] == [1, 2]
+    assert prepared.duplicates == {1: [4, 6], 2: [5]}
+    assert prepared.dedup_count == 3
+    # 舞台提示不翻译
+    assert prepared.passthrough == {3: "[Music]"}
+
+
+def test_prepare_srt_unparseable_returns_none(tmp_path):
+    assert make_translator()._prepare_srt(write_srt(tmp_path, "not a subtitle file")) is None
+
+
+def test_write_srt_fans_out_to_duplicates(tmp_path):
+    translator = make_translator()
+    prepared = translator._prepare_srt(write_srt(tmp_path))
+    translations = dict(prepared.passthrough)
+    translations.update({1: "感谢观看", 2: "__TAG0__你好__TAG1__"})
+
+    out = tmp_path / "out.srt"
+    translator._write_srt(prepared, translations, str(out))
+
+    items = translator._parse_srt(out.read_text(encoding="utf-8"))
+    assert [(it.id, it.text) for it in items] == [
+        (1, "感谢观看"),
+        (2, "<i>你好</i>"),
+        (3, "[Music]"),
+        (4, "感谢观看"),
+        # 每个重复条目恢复自己的标签
+        (5, "<b>你好</b>"),
+        (6, "感谢观看"),
+    ]
+    assert items[3].timecode == "00:00:04,000 --> 00:00:05,000"
+
+
+def test_write_srt_keeps_source_when_translation_missing(tmp_path):
+    translator = make_translator()
+    prepared = translator._prepare_srt(write_srt(tmp_path))
+
+    out = tmp_path / "out.srt"
+    translator._write_srt(prepared, {1: "感谢观看"}, str(out))
+
+    texts = {it.id: it.text for it in translator._parse_srt(out.read_text(encoding="utf-8"))}
+    assert texts[4] == "感谢观看"
+    assert texts[2] == "<i>Hello</i>"
+    assert texts[5] == "<b>Hello</b>"
+
+
+# ---------------------------
+# 编号行线路格式
+# ---------------------------
+BATCH = [
+    {"id": 1, "text": "Hello"},
+    {"id": 2, "text": "__TAG0__Hi__TAG1__"},
+    {"id": 3, "text": "line one\nline two"},
+]
+
+
+def test_lines_round_trip():
+    translator = make_translator()
+    raw = "\n".join([
+        "```",
+        "1|你好",
+        "2 | __TAG0__嗨__TAG1__",
+        "3|第一行\\n第二行",
+        "```",
+    ])
+
+    assert translator._parse_lines_response(raw, BATCH) == {
+        1: "你好",
+        2: "__TAG0__嗨__TAG1__",
+        3: "第一行\n第二行",
+    }
+
+
+def test_lines_prompt_escapes_newlines_and_backslashes():
+    translator = make_translator()
+    _, user = translator._build_lines_prompt([{"id": 5, "text": "a\\b\nc"}], "中文")
+
+    assert "5|a\\\\b\\nc" in user
+    assert translator._unescape_line("a\\\\b\\nc") == "a\\b\nc"
+
+
+def test_lines_rejects_unknown_ids_and_junk():
+    raw = "9|多余\n你好\n1|你好"
+
+    assert make_translator()._parse_lines_response(raw, BATCH) == {1: "你好"}
+
+
+def test_lines_rejects_tag_mismatch():
+    translator = make_translator()
+
+    # 占位符丢失、多出或编号变化都作废，交给单条重试
+    for bad in ("2|嗨", "2|__TAG0__嗨", "2|__TAG0__嗨__TAG2__", "2|__TAG0__嗨__TAG1____TAG1__"):
+        assert translator._parse_lines_response(bad, BATCH) == {}
+    # 占位符顺序可以变
+    assert translator._parse_lines_response("2|__TAG1__嗨__TAG0__", BATCH) == {2: "__TAG1__嗨__TAG0__"}
+
+
+def test_lines_duplicate_id_voids_entry():
+    raw = "1|你好\n1|您好\n3|x\n1|哈喽"
+
+    assert make_translator()._parse_lines_response(raw, BATCH) == {3: "x"}
+
+
+# ---------------------------
+# 多语言：一次解析，所有 (语言, 批次) 共用请求池
+# ---------------------------
+def test_translate_srt_file_multi_one_request_per_lang_and_batch(tmp_path):
+    # 130 条不同文本 -> 每批最多 60 条，共 3 批；再加一条重复行和一条舞台提示
+    blocks = [f"{i}\n00:00:{i % 60:02d},000 --> 00:00:{i % 60:02d},500\nline {i}" for i in range(1, 131)]
+    blocks.append("131\n00:01:00,000 --> 00:01:01,000\nline 1")
+    blocks.append("132\n00:01:01,000 --> 00:01:02,000\n[Music]")
+    src = write_srt(tmp_path, "\n\n".join(blocks) + "\n")
+
+    translator = make_translator()
+    translator.batcher = None
+    requests = []
+    lock = threading.Lock()
+
+    def fake_batch(batch, target_lang):
+        with lock:
+            requests.append((target_lang, tuple(it["id"] for it in batch)))
+        return {it["id"]: f"{target_lang}:{it['text']}" for it in batch}
+
+    translator._translate_batch_with_retry = fake_batch
+    outputs = {"中文": str(tmp_path / "zh.srt"), "日文": str(tmp_path / "ja.srt")}
+
+    assert translator.translate_srt_file_multi(src, outputs, max_workers=4) == {"中文": True, "日文": True}
+
+    # 每种语言各 3 个批次，同一批次划分在语言之间共用
+    assert len(requests) == 6
+    assert len(set(requests)) == 6
+    by_lang = {lang: sorted(ids for l, ids in requests if l == lang) for lang in outputs}
+    assert by_lang["中文"] == by_lang["日文"]
+    assert sum(len(ids) for ids in by_lang["中文"]) == 130
+
+    for lang, path in outputs.items():
+        texts = {it.id: it.text for it in translator._parse_srt(open(path, encoding="utf-8").read())}
+        assert len(texts) == 132
+        assert texts[2] == f"{lang}:line 2"
+        # 重复行分发到每种语言的输出
+        assert texts[131] == f"{lang}:line 1"
+        assert texts[132] == "[Music]"
+
+
+def test_translate_srt_file_multi_failed_language_writes_no_file(tmp_path):
+    translator = make_translator()
+    translator.batcher = None
+
+    def fake_batch(batch, target_lang):
+        if target_lang == "日文":
+            raise RuntimeError("boom")
+        return {it["id"]: f"{target_lang}:{it['text']}" for it in batch}
+
+    translator._translate_batch_with_retry = fake_batch
+    outputs = {"中文": str(tmp_path / "zh.srt"), "日文": str(tmp_path / "ja.srt")}
+
+    assert translator.translate_srt_file_multi(write_srt(tmp_path), outputs) == {"中文": True, "日文": False}
+    assert os.path.exists(outputs["中文"])
+    assert not os.path.exists(outputs["日文"])
@@ -0,0 +1,147 @@
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+
+@dataclass
+class _Pending:
+    gid: int
+    text: str
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class TranslationBatcher:
+    """
+    跨任务的翻译微批处理器
+
+    多个并发的 TextTranslator 调用方（同一 model/base_url）把条目交给同一个
+    batcher，按目标语言排队；攒够 max_chars/max_n 或等待超过 linger_ms 后
+    合并成一个请求发出，结果再按调用方各自的 id 路由回去。
+    """
+
+    _registry: Dict[Tuple, "TranslationBatcher"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, translator, linger_ms: int = 50, max_chars: int = 6500,
+                 max_n: int = 60, max_inflight: int = 4):
+        # translator 只用于真正发请求（_translate_batch_with_retry）
+        self.translator = translator
+        self.linger_s = linger_ms / 1000.0
+        self.max_chars = max_chars
+        self.max_n = max_n
+
+        self._queues: Dict[str, List[_Pending]] = {}
+        self._cond = threading.Condition()
+        self._gid = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_inflight))
+        self._stats = {"requests": 0, "items": 0}
+
+        self._thread = threading.Thread(target=self._loop, name="translation-batcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def shared(cls, translator, **kwargs) -> "TranslationBatcher":
+        """
+        按 (base_url, model, api_key, wire_format) 和 batcher 参数（linger_ms 等）取进程内共享的 batcher
+
+        参数不同的调用方各用各的 batcher，不会被先创建者的设置覆盖。
+        """
+        key = (translator.base_url, translator.model, translator.api_key,
+               getattr(translator, "wire_format", "json"), tuple(sorted(kwargs.items())))
+        with cls._registry_lock:
+            batcher = cls._registry.get(key)
+            if batcher is None:
+                batcher = cls(translator, **kwargs)
+                cls._registry[key] = batcher
+            return batcher
+
+    def translate(self, items: List[Dict], target_lang: str) -> Dict[int, str]:
+        """
+        阻塞式提交一组条目（[{"id", "text"}]），返回 {id: 译文}
+
+        调用方的 id 只需在自己的列表内唯一，内部会换成全局 id 以免不同任务冲突。
+        所在批次的请求失败时抛出该请求的异常。
+        """
+        if not items:
+            return {}
+
+        local: List[Tuple[int, _Pending]] = []
+        with self._cond:
+            queue = self._queues.setdefault(target_lang, [])
+            for it in items:
+                pending = _Pending(gid=next(self._gid), text=it["text"], future=Future())
+                queue.append(pending)
+                local.append((it["id"], pending))
+            self._cond.notify()
+
+        # 请求失败时把异常抛给调用方（与不经 batcher 直接调用一致），由其判定整个文件翻译失败；
+        # 请求成功但响应里缺少的条目已在 _send 中降级为原文
+        return {sid: pending.future.result() for sid, pending in local}
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            requests = self._stats["requests"]
+            items = self._stats["items"]
+        return {
+            "requests": requests,
+            "items": items,
+            "items_per_request": (items / requests) if requests else 0.0,
+        }
+
+    # ---------------------------
+    # 后台调度
+    # ---------------------------
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not any(self._queues.values()):
+                    self._cond.wait()
+
+                ready, timeout = self._collect_ready()
+                if not ready:
+                    self._cond.wait(timeout)
+                    continue
+
+            for lang, batch in ready:
+                self._pool.submit(self._send, lang, batch)
+
+    def _collect_ready(self):
+        """在锁内调用：取出已满或已超时的批次，并返回下一次需要醒来的时间"""
+        now = time.monotonic()
+        ready = []
+        next_wake = self.linger_s
+        for lang, queue in self._queues.items():
+            while queue:
+                n, chars = 0, 0
+                for p in queue:
+                    if n and (n >= self.max_n or chars + len(p.text) > self.max_chars):
+                        break
+                    n += 1
+                    chars += len(p.text)
+                full = n < len(queue) or n >= self.max_n or chars >= self.max_chars
+                waited = now - queue[0].enqueued_at
+                if not full and waited < self.linger_s:
+                    next_wake = min(next_wake, self.linger_s - waited)
+                    break
+                ready.append((lang, queue[:n]))
+                del queue[:n]
+        return ready, max(next_wake, 0.001)
+
+    def _send(self, lang: str, batch: List[_Pending]):
+        payload = [{"id": p.gid, "text": p.text} for p in batch]
+        try:
+            result = self.translator._translate_batch_with_retry(payload, target_lang=lang)
+        except Exception as e:
+            for p in batch:
+                p.future.set_exception(e)
+            return
+
+        with self._cond:
+            self._stats["requests"] += 1
+            self._stats["items"] += len(batch)
+        for p in batch:
+            p.future.set_result(result.get(p.gid, p.text))
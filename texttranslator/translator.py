@@ -2,10 +2,15 @@ import os
 import sys
 import re
 import json
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from typing import List, Dict, Tuple, Optional
 from openai import OpenAI
 
+# Add project root to sys.path so this file can also run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from texttranslator.batcher import TranslationBatcher
+
 
 @dataclass
 class SrtItem:
@@ -14,12 +19,34 @@ class SrtItem:
     text: str
 
 
+@dataclass
+class PreparedSrt:
+    """解析 + 标签保护后的 SRT，可被多种目标语言复用"""
+    items: List[SrtItem]
+    protected_texts: Dict[int, Tuple[str, Dict[str, str]]]
+    translatable: List[Dict] = field(default_factory=list)
+    passthrough: Dict[int, str] = field(default_factory=dict)
+    # 去重：代表条目 id -> 与其文本相同的其他条目 id
+    duplicates: Dict[int, List[int]] = field(default_factory=dict)
+
+    @property
+    def dedup_count(self) -> int:
+        return sum(len(ids) for ids in self.duplicates.values())
+
+
 class TextTranslator:
-    def __init__(self, api_key, model='glm-4', base_url='https://open.bigmodel.cn/api/paas/v4/'):
+    def __init__(self, api_key, model='glm-4', base_url='https://open.bigmodel.cn/api/paas/v4/',
+                 shared_batching=False, linger_ms=50, wire_format='json'):
+        if wire_format not in ('json', 'lines'):
+            raise ValueError(f"不支持的线路格式: {wire_format}")
         self.api_key = api_key
         self.model = model
         self.base_url = base_url
+        # 'json': JSON 数组（默认）；'lines': 紧凑编号行，token 更少
+        self.wire_format = wire_format
         self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        # 开启后，同进程内相同 model/base_url 的多个任务共用一个批处理器（跨任务凑满批次）
+        self.batcher = TranslationBatcher.shared(self, linger_ms=linger_ms) if shared_batching else None
 
     # ---------------------------
     # 通用翻译（TXT）
@@ -68,55 +95,23 @@ class TextTranslator:
     # ---------------------------
     def translate_srt_file(self, input_file, output_file, target_lang='zh') -> bool:
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                srt_content = f.read()
-
-            items = self._parse_srt(srt_content)
-            if not items:
+            prepared = self._prepare_srt(input_file)
+            if prepared is None:
                 print("警告: 无法解析SRT文件格式，尝试简单文本翻译")
                 return self.translate_file(input_file, output_file, target_lang)
 
-            # 预处理：保护标签/控制符
-            protected_texts: Dict[int, Tuple[str, Dict[str, str]]] = {}
-            for it in items:
-                protected, mapping = self._protect_markup(it.text)
-                protected_texts[it.id] = (protected, mapping)
-
-            # 按批翻译（只翻译需要翻译的条目）
-            id2translation: Dict[int, str] = {}
-
-            translatable = []
-            for it in items:
-                protected, _ = protected_texts[it.id]
-                if self._should_translate(protected):
-                    translatable.append({"id": it.id, "text": protected})
-                else:
-                    # 不翻译的直接原样回填（后面仍会 restore_tags）
-                    id2translation[it.id] = protected
-
-            for batch in self._batch_items(translatable, max_chars=6500, max_n=60):
-                batch_map = self._translate_batch_with_retry(batch, target_lang=target_lang)
-                id2translation.update(batch_map)
-
-            # 回填并恢复标签
-            out_lines: List[str] = []
-            for it in items:
-                protected, mapping = protected_texts[it.id]
-                translated_protected = id2translation.get(it.id, protected)
-                restored = self._restore_markup(translated_protected, mapping)
-
-                # 可选：这里做一层“字幕友好后处理”（断行/标点等）
-                restored = self._postprocess_subtitle(restored)
-
-                out_lines.append(str(it.id))
-                out_lines.append(it.timecode)
-                out_lines.append(restored)
-                out_lines.append("")
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write("\n".join(out_lines).rstrip() + "\n")
+            id2translation = dict(prepared.passthrough)
+            if self.batcher is not None:
+                id2translation.update(self.batcher.translate(prepared.translatable, target_lang))
+            else:
+                for batch in self._batch_items(prepared.translatable, max_chars=6500, max_n=60):
+                    batch_map = self._translate_batch_with_retry(batch, target_lang=target_lang)
+                    id2translation.update(batch_map)
 
+            self._write_srt(prepared, id2translation, output_file)
             print(f"SRT翻译完成。结果已保存到 {output_file}")
+            print(f"  共 {len(prepared.items)} 条，请求 {len(prepared.translatable)} 条，"
+                  f"去重 {prepared.dedup_count} 条")
             return True
 
         except Exception as e:
@@ -125,6 +120,141 @@ class TextTranslator:
             traceback.print_exc()
             return False
 
+    # ---------------------------
+    # SRT 多语言翻译：解析/保护只做一次，多语言并发请求
+    # ---------------------------
+    def translate_srt_file_multi(self, input_file, output_files: Dict[str, str],
+                                 max_workers: int = 4) -> Dict[str, bool]:
+        """
+        一次解析，多语言输出。
+
+        Args:
+            input_file: 输入SRT路径
+            output_files: {目标语言: 输出SRT路径}
+            max_workers: 并发请求数（所有语言的所有批次共享）
+
+        Returns:
+            {目标语言: 是否成功}
+        """
+        results = {lang: False for lang in output_files}
+        try:
+            prepared = self._prepare_srt(input_file)
+        except Exception as e:
+            print(f"翻译SRT文件过程中出错: {str(e)}")
+            return results
+
+        if prepared is None:
+            print("警告: 无法解析SRT文件格式，尝试简单文本翻译")
+            for lang, out_path in output_files.items():
+                results[lang] = self.translate_file(input_file, out_path, lang)
+            return results
+
+        batches = list(self._batch_items(prepared.translatable, max_chars=6500, max_n=60))
+        per_lang: Dict[str, Dict[int, str]] = {lang: dict(prepared.passthrough) for lang in output_files}
+        failed_langs = set()
+
+        # 所有 (语言, 批次) 放进同一个线程池，往返时间互相重叠
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            if self.batcher is not None:
+                futures = {
+                    pool.submit(self.batcher.translate, prepared.translatable, lang): lang
+                    for lang in output_files
+                }
+            else:
+                futures = {
+                    pool.submit(self._translate_batch_with_retry, batch, lang): lang
+                    for lang in output_files
+                    for batch in batches
+                }
+            for fut in as_completed(futures):
+                lang = futures[fut]
+                try:
+                    per_lang[lang].update(fut.result())
+                except Exception as e:
+                    print(f"[{lang}] 批次翻译出错: {e}")
+                    failed_langs.add(lang)
+
+        for lang, out_path in output_files.items():
+            if lang in failed_langs:
+                continue
+            try:
+                self._write_srt(prepared, per_lang[lang], out_path)
+                results[lang] = True
+                print(f"[{lang}] SRT翻译完成。结果已保存到 {out_path}")
+            except Exception as e:
+                print(f"[{lang}] 写入SRT失败: {e}")
+
+        print(f"多语言翻译: {len(batches)} 个批次 x {len(output_files)} 种语言，"
+              f"去重 {prepared.dedup_count} 条，成功 {sum(results.values())}/{len(output_files)}")
+        return results
+
+    def _prepare_srt(self, input_file) -> Optional[PreparedSrt]:
+        """解析SRT并保护标签，返回可供多次翻译复用的状态；无法解析时返回 None"""
+        with open(input_file, 'r', encoding='utf-8') as f:
+            srt_content = f.read()
+
+        items = self._parse_srt(srt_content)
+        if not items:
+            return None
+
+        # 预处理：保护标签/控制符
+        protected_texts: Dict[int, Tuple[str, Dict[str, str]]] = {}
+        for it in items:
+            protected, mapping = self._protect_markup(it.text)
+            protected_texts[it.id] = (protected, mapping)
+
+        # 只翻译需要翻译的条目；相同文本只请求一次（副歌、“Thanks for watching” 等）
+        translatable: List[Dict] = []
+        passthrough: Dict[int, str] = {}
+        duplicates: Dict[int, List[int]] = {}
+        text2id: Dict[str, int] = {}
+        for it in items:
+            protected, _ = protected_texts[it.id]
+            if self._should_translate(protected):
+                rep_id = text2id.get(protected)
+                if rep_id is not None:
+                    duplicates.setdefault(rep_id, []).append(it.id)
+                    continue
+                text2id[protected] = it.id
+                translatable.append({"id": it.id, "text": protected})
+            else:
+                # 不翻译的直接原样回填（后面仍会 restore_tags）
+                passthrough[it.id] = protected
+
+        return PreparedSrt(
+            items=items,
+            protected_texts=protected_texts,
+            translatable=translatable,
+            passthrough=passthrough,
+            duplicates=duplicates,
+        )
+
+    def _write_srt(self, prepared: PreparedSrt, id2translation: Dict[int, str], output_file) -> None:
+        # 去重条目：把代表条目的译文分发回每个重复 id
+        id2translation = dict(id2translation)
+        for rep_id, dup_ids in prepared.duplicates.items():
+            if rep_id in id2translation:
+                for dup_id in dup_ids:
+                    id2translation[dup_id] = id2translation[rep_id]
+
+        # 回填并恢复标签
+        out_lines: List[str] = []
+        for it in prepared.items:
+            protected, mapping = prepared.protected_texts[it.id]
+            translated_protected = id2translation.get(it.id, protected)
+            restored = self._restore_markup(translated_protected, mapping)
+
+            # 可选：这里做一层“字幕友好后处理”（断行/标点等）
+            restored = self._postprocess_subtitle(restored)
+
+            out_lines.append(str(it.id))
+            out_lines.append(it.timecode)
+            out_lines.append(restored)
+            out_lines.append("")
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(out_lines).rstrip() + "\n")
+
     # ---------------------------
     # SRT 解析（稳健）
     # ---------------------------
@@ -238,6 +368,36 @@ class TextTranslator:
         return result
 
     def _translate_batch(self, batch: List[Dict], target_lang: str) -> Dict[int, str]:
+        return self._translate_batch_with_usage(batch, target_lang)[0]
+
+    def _translate_batch_with_usage(self, batch: List[Dict], target_lang: str):
+        """发一次请求，返回 ({id: 译文}, token 用量)；用量随返回值给出，并发调用之间互不覆盖"""
+        if self.wire_format == 'lines':
+            system, user = self._build_lines_prompt(batch, target_lang)
+        else:
+            system, user = self._build_json_prompt(batch, target_lang)
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            temperature=0.2,
+            top_p=0.95,
+            max_tokens=4000,
+        )
+        usage = getattr(response, "usage", None)
+
+        raw = response.choices[0].message.content.strip()
+        if self.wire_format == 'lines':
+            return self._parse_lines_response(raw, batch), usage
+        return self._parse_json_response(raw), usage
+
+    # ---------------------------
+    # 线路格式一：JSON（默认）
+    # ---------------------------
+    def _build_json_prompt(self, batch: List[Dict], target_lang: str) -> Tuple[str, str]:
         # 构造 JSON 输入（给模型看清结构）
         payload = {
             "target_lang": target_lang,
@@ -264,19 +424,9 @@ class TextTranslator:
 输入JSON如下：
 {payload_json}
 """
+        return system, user
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user}
-            ],
-            temperature=0.2,
-            top_p=0.95,
-            max_tokens=4000,
-        )
-
-        raw = response.choices[0].message.content.strip()
+    def _parse_json_response(self, raw: str) -> Dict[int, str]:
         arr = self._safe_parse_json_array(raw)
 
         out: Dict[int, str] = {}
@@ -294,6 +444,66 @@ class TextTranslator:
 
         return out
 
+    # ---------------------------
+    # 线路格式二：编号行（紧凑，省去引号/转义/重复键名）
+    # 每行 "编号|文本"，条目内换行写成字面量 \n
+    # ---------------------------
+    def _build_lines_prompt(self, batch: List[Dict], target_lang: str) -> Tuple[str, str]:
+        lines = "\n".join(f"{it['id']}|{self._escape_line(it['text'])}" for it in batch)
+
+        system = (
+            "你是专业字幕翻译器。"
+            "输入每行格式为 编号|原文，输出每行格式为 编号|译文，与输入一一对应。"
+            "不要新增、删除、合并、拆分行；不要改变编号。"
+            "保留 __TAG0__ 这类占位符和字面量 \\n 原样不变。"
+            "不要输出任何额外文字。"
+        )
+
+        user = f"""翻译成 {target_lang}，译文自然口语化，适合朗读（TTS）：
+{lines}
+"""
+        return system, user
+
+    def _parse_lines_response(self, raw: str, batch: List[Dict]) -> Dict[int, str]:
+        """
+        严格解析编号行：编号必须属于本批次且不重复，__TAGn__ 占位符必须与原文完全一致；
+        不合格的行直接丢弃，交给 _translate_batch_with_retry 单条重试
+        """
+        sources = {it["id"]: it["text"] for it in batch}
+        out: Dict[int, str] = {}
+        seen = set()
+
+        for line in raw.splitlines():
+            line = line.strip()
+            if not line or line.startswith("```"):
+                continue
+            m = re.match(r'^(\d+)\s*\|(.*)$', line)
+            if not m:
+                continue
+            sid = int(m.group(1))
+            if sid not in sources:
+                continue
+            if sid in seen:
+                # 同一编号出现多次：无法判断哪个正确，整条作废
+                out.pop(sid, None)
+                continue
+            seen.add(sid)
+
+            translation = self._unescape_line(m.group(2).strip())
+            if sorted(re.findall(r'__TAG\d+__', translation)) != sorted(re.findall(r'__TAG\d+__', sources[sid])):
+                continue
+            out[sid] = translation
+
+        return out
+
+    @staticmethod
+    def _escape_line(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+    @staticmethod
+    def _unescape_line(text: str) -> str:
+        return re.sub(r'\\(\\|n)', lambda m: "\n" if m.group(1) == "n" else "\\", text)
+
     # ---------------------------
     # JSON 解析容错：从模型输出里抠出 [...] 并 loads
     # ---------------------------
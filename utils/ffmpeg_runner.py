@@ -0,0 +1,367 @@
+"""
+统一的 ffmpeg / ffprobe 执行层
+
+- 能力检测（ffmpeg/ffprobe 是否存在、编码器列表）进程内只做一次
+- 媒体探测结果按 (路径, 大小, mtime) 缓存，同一文件反复 probe 不再起子进程
+- -progress 输出解析为回调：{"out_time": 秒, "speed": 倍速, "fraction": 0~1 或 None, "done": bool}
+- 超时：超时后杀掉子进程并抛出 subprocess.TimeoutExpired
+- 并发：全局信号量限制同时运行的 ffmpeg 数量；多个 ffmpeg 同时运行时按可用核数分配 -threads，
+  避免批量任务把 CPU 过度订阅
+    VIDGO_FFMPEG_JOBS     同时运行的 ffmpeg 进程上限（默认: CPU 核数）
+    VIDGO_FFMPEG_THREADS  每个进程的线程数（默认: 0 = 按当前并发数自动分配）
+- 同步接口 run_ffmpeg 与 asyncio 接口 run_ffmpeg_async 共用同一个信号量
+
+失败时抛出 subprocess.CalledProcessError（stderr 为解码后的文本），与直接调用 subprocess.run(check=True) 一致。
+"""
+import asyncio
+import json
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+ProgressCallback = Callable[[dict], None]
+
+_MAX_JOBS = max(1, int(os.environ.get("VIDGO_FFMPEG_JOBS", "0") or 0) or (os.cpu_count() or 1))
+_THREADS = max(0, int(os.environ.get("VIDGO_FFMPEG_THREADS", "0") or 0))
+
+_slots = threading.BoundedSemaphore(_MAX_JOBS)
+_running_lock = threading.Lock()
+_running = 0
+
+_probe_lock = threading.Lock()
+_probe_cache: Dict[Tuple[str, int, int], dict] = {}
+
+
+@lru_cache(maxsize=None)
+def _tool_available(tool: str) -> bool:
+    try:
+        subprocess.run([tool, "-version"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        # OSError 覆盖找不到、无执行权限等情况
+        return False
+
+
+def has_ffmpeg() -> bool:
+    return _tool_available("ffmpeg")
+
+
+def has_ffprobe() -> bool:
+    return _tool_available("ffprobe")
+
+
+@lru_cache(maxsize=None)
+def has_encoder(name: str) -> bool:
+    if not has_ffmpeg():
+        return False
+    try:
+        res = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], check=True,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except Exception:
+        return False
+    return any(len(parts) > 1 and parts[1] == name
+               for parts in (line.split() for line in res.stdout.splitlines()))
+
+
+def probe(path: str) -> Optional[dict]:
+    """ffprobe 的 format + streams（JSON），按 (路径, 大小, mtime) 缓存；失败返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _probe_lock:
+        if key in _probe_cache:
+            return _probe_cache[key]
+
+    try:
+        res = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        info = json.loads(res.stdout)
+    except Exception:
+        return None
+
+    with _probe_lock:
+        _probe_cache[key] = info
+    return info
+
+
+def _first_stream(path: str, codec_type: str) -> Optional[dict]:
+    info = probe(path)
+    if not info:
+        return None
+    return next((s for s in info.get("streams", []) if s.get("codec_type") == codec_type), None)
+
+
+def probe_duration(path: str) -> Optional[float]:
+    info = probe(path)
+    try:
+        return float(info["format"]["duration"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def probe_audio_channels(path: str) -> Optional[int]:
+    stream = _first_stream(path, "audio")
+    try:
+        return int(stream["channels"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def probe_video_height(path: str) -> Optional[int]:
+    stream = _first_stream(path, "video")
+    try:
+        return int(stream["height"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+@contextmanager
+def _slot() -> Iterator[int]:
+    """占用一个全局执行槽，返回本进程可用的线程数（0 表示不限制）"""
+    global _running
+    _slots.acquire()
+    with _running_lock:
+        _running += 1
+        running = _running
+    try:
+        if _THREADS:
+            yield _THREADS
+        elif running > 1:
+            yield max(1, (os.cpu_count() or 1) // running)
+        else:
+            yield 0
+    finally:
+        with _running_lock:
+            _running -= 1
+        _slots.release()
+
+
+# 不带参数值的 ffmpeg 选项；其余以 - 开头的参数都按“选项 + 值”处理
+_FLAG_OPTIONS = {
+    "-y", "-n", "-nostats", "-stats", "-hide_banner", "-nostdin", "-benchmark", "-shortest",
+    "-an", "-vn", "-sn", "-dn", "-re", "-copyts", "-accurate_seek", "-noaccurate_seek",
+}
+
+
+def _output_positions(cmd: List[str]) -> List[int]:
+    """命令中每个输出路径的下标（不是选项、也不是选项值的位置参数；输入都跟在 -i 后面）"""
+    positions = []
+    i = 1
+    while i < len(cmd):
+        arg = cmd[i]
+        if arg.startswith("-") and arg != "-":
+            i += 1 if arg in _FLAG_OPTIONS else 2
+        else:
+            positions.append(i)
+            i += 1
+    return positions
+
+
+def _prepare(cmd: List[str], threads: int, progress: Optional[ProgressCallback]) -> List[str]:
+    cmd = list(cmd)
+    if progress is not None:
+        cmd[1:1] = ["-progress", "pipe:1", "-nostats"]
+    # 线程数是输出选项：多输出命令（双声部分离、码率阶梯）要在每个输出前都加上；
+    # 调用方已指定 -threads 时不覆盖
+    if threads and "-threads" not in cmd:
+        for pos in reversed(_output_positions(cmd)):
+            cmd[pos:pos] = ["-threads", str(threads)]
+    return cmd
+
+
+def _input_duration(cmd: List[str]) -> Optional[float]:
+    for i, arg in enumerate(cmd[:-1]):
+        if arg == "-i" and os.path.exists(cmd[i + 1]):
+            return probe_duration(cmd[i + 1])
+    return None
+
+
+class _ProgressParser:
+    def __init__(self, callback: ProgressCallback, duration: Optional[float]):
+        self.callback = callback
+        self.duration = duration
+        self.state: Dict[str, str] = {}
+
+    def feed(self, line: str) -> None:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return
+        if key != "progress":
+            self.state[key] = value
+            return
+
+        try:
+            out_time = int(self.state.get("out_time_us") or self.state.get("out_time_ms") or 0) / 1e6
+        except ValueError:
+            out_time = 0.0
+        try:
+            speed = float(self.state.get("speed", "").rstrip("x"))
+        except ValueError:
+            speed = None
+        done = value == "end"
+        fraction = None
+        if self.duration:
+            fraction = 1.0 if done else min(1.0, out_time / self.duration)
+        self.callback({"out_time": out_time, "speed": speed, "fraction": fraction, "done": done})
+
+
+def _decode(data) -> str:
+    if data is None:
+        return ""
+    return data.decode("utf-8", errors="replace") if isinstance(data, bytes) else data
+
+
+def run_ffmpeg(
+    cmd: List[str],
+    input: Optional[bytes] = None,
+    capture_output: bool = False,
+    text: bool = False,
+    timeout: Optional[float] = None,
+    progress: Optional[ProgressCallback] = None,
+    duration: Optional[float] = None,
+) -> subprocess.CompletedProcess:
+    """
+    在全局并发限制下执行一条 ffmpeg 命令（cmd[0] 为 "ffmpeg"，最后一个参数为输出）
+
+    capture_output=True 时返回 stdout（与 progress 互斥）；stderr 始终收集，失败时随异常返回。
+    progress 回调的 fraction 依赖 duration，未给出时取第一个输入文件的时长。
+    """
+    if progress is not None and capture_output:
+        raise ValueError("progress 与 capture_output 不能同时使用")
+    if progress is not None and duration is None:
+        duration = _input_duration(cmd)
+
+    with _slot() as threads:
+        full_cmd = _prepare(cmd, threads, progress)
+        proc = subprocess.Popen(
+            full_cmd,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE if (capture_output or progress) else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            if progress is None:
+                stdout, stderr = proc.communicate(input=input, timeout=timeout)
+            else:
+                stdout, stderr = _communicate_with_progress(proc, input, timeout,
+                                                            _ProgressParser(progress, duration))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+
+    stderr = _decode(stderr)
+    if text:
+        stdout = _decode(stdout)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, full_cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(full_cmd, proc.returncode, stdout, stderr)
+
+
+def _communicate_with_progress(proc: subprocess.Popen, input: Optional[bytes],
+                               timeout: Optional[float], parser: _ProgressParser):
+    stderr_chunks: List[bytes] = []
+    readers = [threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)]
+    if input is not None:
+        def feed():
+            try:
+                proc.stdin.write(input)
+            finally:
+                proc.stdin.close()
+        readers.append(threading.Thread(target=feed, daemon=True))
+    for t in readers:
+        t.start()
+
+    timer = None
+    timed_out = threading.Event()
+    if timeout is not None:
+        def expire():
+            timed_out.set()
+            proc.kill()
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    try:
+        for raw in proc.stdout:
+            parser.feed(raw.decode("utf-8", errors="replace"))
+        proc.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    for t in readers:
+        t.join()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(proc.args, timeout, stderr=b"".join(stderr_chunks))
+    return None, b"".join(stderr_chunks)
+
+
+async def run_ffmpeg_async(
+    cmd: List[str],
+    input: Optional[bytes] = None,
+    capture_output: bool = False,
+    timeout: Optional[float] = None,
+    progress: Optional[ProgressCallback] = None,
+    duration: Optional[float] = None,
+) -> subprocess.CompletedProcess:
+    """run_ffmpeg 的 asyncio 版本，共用同一个全局信号量；stdout 为 bytes"""
+    if progress is not None and capture_output:
+        raise ValueError("progress 与 capture_output 不能同时使用")
+    loop = asyncio.get_running_loop()
+    if progress is not None and duration is None:
+        duration = await loop.run_in_executor(None, _input_duration, cmd)
+
+    slot = _slot()
+    # 信号量是线程级的，放到线程池里等待，不阻塞事件循环
+    threads = await loop.run_in_executor(None, slot.__enter__)
+    try:
+        full_cmd = _prepare(cmd, threads, progress)
+        proc = await asyncio.create_subprocess_exec(
+            *full_cmd,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if (capture_output or progress) else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        async def communicate():
+            if progress is None:
+                return await proc.communicate(input)
+            parser = _ProgressParser(progress, duration)
+            if input is not None:
+                proc.stdin.write(input)
+                await proc.stdin.drain()
+                proc.stdin.close()
+            stderr_task = asyncio.ensure_future(proc.stderr.read())
+            async for raw in proc.stdout:
+                parser.feed(raw.decode("utf-8", errors="replace"))
+            await proc.wait()
+            return None, await stderr_task
+
+        try:
+            stdout, stderr = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(full_cmd, timeout)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+    finally:
+        slot.__exit__(None, None, None)
+
+    stderr = _decode(stderr)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, full_cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(full_cmd, proc.returncode, stdout, stderr)
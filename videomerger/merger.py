@@ -1,14 +1,47 @@
 import os
+import re
+import shutil
 import subprocess
-from typing import Optional
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from utils.ffmpeg_runner import ProgressCallback, has_ffmpeg, probe_duration, probe_video_height, run_ffmpeg
+
+# 常用语言名 -> ISO 639-2 代码（容器 language 元数据）；已是代码的原样使用
+LANGUAGE_CODES = {
+    "中文": "chi", "汉语": "chi", "简体中文": "chi", "繁体中文": "chi", "zh": "chi",
+    "英文": "eng", "英语": "eng", "en": "eng",
+    "日文": "jpn", "日语": "jpn", "ja": "jpn",
+    "韩文": "kor", "韩语": "kor", "ko": "kor",
+    "法语": "fre", "fr": "fre",
+    "德语": "ger", "de": "ger",
+    "西班牙语": "spa", "es": "spa",
+    "俄语": "rus", "ru": "rus",
+}
+
+# 默认码率阶梯（高于源分辨率的档位会被跳过）
+DEFAULT_LADDER = [
+    {"name": "1080p", "height": 1080, "video_bitrate": "5000k", "audio_bitrate": "192k"},
+    {"name": "720p", "height": 720, "video_bitrate": "2800k", "audio_bitrate": "128k"},
+    {"name": "480p", "height": 480, "video_bitrate": "1400k", "audio_bitrate": "96k"},
+]
 
 
 class VideoMerger:
     """视频和音频合并器"""
     
-    def __init__(self):
-        """初始化视频合并器"""
-        self._check_ffmpeg()
+    def __init__(self, progress: Optional[ProgressCallback] = None, timeout: Optional[float] = None):
+        """
+        初始化视频合并器
+        
+        Args:
+            progress: 进度回调，参数为 {"out_time", "speed", "fraction", "done"}（默认: 不回调）
+            timeout: 单条 ffmpeg 命令的超时秒数（默认: 不限制）
+        """
+        self.progress = progress
+        self.timeout = timeout
     
     def _check_ffmpeg(self) -> bool:
         """
@@ -17,16 +50,8 @@ class VideoMerger:
         Returns:
             bool: ffmpeg是否可用
         """
-        try:
-            subprocess.run(
-                ["ffmpeg", "-version"],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            return True
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            return False
+        # 结果在进程内缓存，每次合并前调用不会再起子进程
+        return has_ffmpeg()
     
     def merge(self, video_path: str, audio_path: str, output_path: str, 
               video_codec: str = "copy", audio_codec: str = "aac",
@@ -76,18 +101,12 @@ class VideoMerger:
             
             cmd.append(output_path)
             
-            print(f"正在合并视频和音频...")
+            print("正在合并视频和音频...")
             print(f"  视频: {video_path}")
             print(f"  音频: {audio_path}")
             print(f"  输出: {output_path}")
             
-            result = subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            run_ffmpeg(cmd, timeout=self.timeout, progress=self.progress)
             
             print(f"✓ 视频和音频合并成功: {output_path}")
             return True
@@ -119,6 +138,10 @@ class VideoMerger:
                 - audio_codec: 音频编码（默认: "aac"）
                 - use_shortest: 是否以最短流为准（默认: True）
                 - extra_args: 额外的ffmpeg参数列表
+                - parallel_workers: 分段并行编码的进程数，>1 且 video_codec 不是 "copy" 时启用（默认: 1）
+                - segment_seconds: 分段并行时每段的目标时长（默认: 按时长和进程数自动计算）
+                - video_args: 分段并行时传给每个视频编码进程的参数，如 ["-preset", "fast", "-crf", "22"]；
+                  只适合与时间无关的滤镜（缩放、裁剪等），字幕烧录请用串行模式
         
         Returns:
             bool: 是否成功
@@ -130,6 +153,7 @@ class VideoMerger:
         audio_codec = options.get("audio_codec", "aac")
         use_shortest = options.get("use_shortest", True)
         extra_args = options.get("extra_args", [])
+        parallel_workers = int(options.get("parallel_workers", 1) or 1)
         
         # 验证输入文件
         if not os.path.exists(video_path):
@@ -145,6 +169,18 @@ class VideoMerger:
             print("错误: 未找到ffmpeg，请确保已安装ffmpeg")
             return False
         
+        if video_codec != "copy" and parallel_workers > 1:
+            return self._merge_segment_parallel(
+                video_path, audio_path, output_path,
+                video_codec=video_codec,
+                audio_codec=audio_codec,
+                use_shortest=use_shortest,
+                extra_args=extra_args,
+                video_args=options.get("video_args", []),
+                workers=parallel_workers,
+                segment_seconds=options.get("segment_seconds"),
+            )
+        
         try:
             # 构建ffmpeg命令
             cmd = [
@@ -166,18 +202,12 @@ class VideoMerger:
             
             cmd.append(output_path)
             
-            print(f"正在合并视频和音频（使用自定义选项）...")
+            print("正在合并视频和音频（使用自定义选项）...")
             print(f"  视频: {video_path}")
             print(f"  音频: {audio_path}")
             print(f"  输出: {output_path}")
             
-            result = subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            run_ffmpeg(cmd, timeout=self.timeout, progress=self.progress)
             
             print(f"✓ 视频和音频合并成功: {output_path}")
             return True
@@ -194,3 +224,402 @@ class VideoMerger:
             print(f"✗ 合并过程中出错: {str(e)}")
             return False
 
+    def _merge_segment_parallel(self, video_path: str, audio_path: str, output_path: str,
+                                video_codec: str, audio_codec: str, use_shortest: bool,
+                                extra_args: list, video_args: list, workers: int,
+                                segment_seconds: Optional[float] = None) -> bool:
+        """
+        分段并行重编码：按关键帧切段（-c copy，无损）-> 多进程并行编码 -> concat 无损拼接 -> 一次混入音频
+        
+        单个编码器实例吃不满多核时，按段并行能把墙钟时间压到接近 1/workers。
+        段边界都落在源关键帧上，每段编码后以 IDR 开头，concat demuxer 直接 -c copy 拼接。
+        """
+        if segment_seconds is None:
+            duration = probe_duration(video_path)
+            # 每个进程分到约 2 段，段太短时编码器启动开销占比过高
+            segment_seconds = max(10.0, duration / (workers * 2)) if duration else 30.0
+        
+        work_dir = tempfile.mkdtemp(prefix="_segenc_", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            print(f"正在分段并行编码视频 ({video_codec}, {workers} 进程, 每段约 {segment_seconds:.0f}s)...")
+            print(f"  视频: {video_path}")
+            print(f"  音频: {audio_path}")
+            print(f"  输出: {output_path}")
+            
+            split_pattern = os.path.join(work_dir, "src_%05d.mkv")
+            run_ffmpeg(
+                ["ffmpeg", "-y", "-v", "error", "-i", video_path,
+                 "-map", "0:v:0", "-c", "copy",
+                 "-f", "segment", "-segment_time", f"{segment_seconds:.3f}",
+                 "-reset_timestamps", "1", split_pattern],
+                timeout=self.timeout
+            )
+            sources = sorted(os.path.join(work_dir, f) for f in os.listdir(work_dir) if f.startswith("src_"))
+            if not sources:
+                print("✗ 切段失败: 未生成任何分段")
+                return False
+            
+            workers = min(workers, len(sources))
+            # 多个编码器同时跑时限制各自的线程数，避免互相抢核
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            encode_base = ["-c:v", video_codec, "-threads", str(threads)] + list(video_args)
+            
+            def encode(src: str):
+                dst = os.path.join(work_dir, "enc_" + os.path.basename(src)[len("src_"):])
+                # -benchmark 让 ffmpeg 在结束时报告本进程自己的 CPU 时间（需要 info 日志级别）
+                res = run_ffmpeg(
+                    ["ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "info", "-benchmark",
+                     "-i", src, "-map", "0:v:0"] + encode_base + [dst],
+                    timeout=self.timeout
+                )
+                return dst, self._bench_cpu_seconds(res.stderr)
+            
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(encode, sources))
+            wall = time.perf_counter() - t0
+            encoded = [dst for dst, _ in results]
+            # 只统计这些编码进程本身，不受同时运行的其他 ffmpeg 任务影响；任一进程没报告时不给出并行度
+            cpu_times = [c for _, c in results]
+            cpu = sum(cpu_times) if all(c is not None for c in cpu_times) else 0.0
+            
+            # 实际并行度 = 编码进程消耗的 CPU 时间 / 墙钟；扩展效率以可用核数为分母
+            if cpu > 0:
+                cores = min(workers * threads, os.cpu_count() or 1)
+                parallelism = cpu / max(wall, 1e-6)
+                print(f"  {len(sources)} 段编码完成: 墙钟 {wall:.1f}s，CPU {cpu:.1f}s，"
+                      f"并行度 {parallelism:.2f}/{cores} 核，扩展效率 {parallelism / cores:.0%}")
+            else:
+                print(f"  {len(sources)} 段编码完成: 墙钟 {wall:.1f}s")
+            
+            list_path = os.path.join(work_dir, "concat.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for dst in encoded:
+                    f.write(f"file '{dst}'\n")
+            
+            cmd = [
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-i", audio_path,
+                "-map", "0:v:0",
+                "-map", "1:a:0",
+                "-c:v", "copy",
+                "-c:a", audio_codec,
+            ]
+            if use_shortest:
+                cmd.append("-shortest")
+            if extra_args:
+                cmd.extend(extra_args)
+            cmd.append(output_path)
+            return self._run_merge_cmd(cmd, output_path)
+        
+        except subprocess.CalledProcessError as e:
+            print(f"✗ 分段编码失败: {e}")
+            if e.stderr:
+                for line in e.stderr.strip().split('\n')[-5:]:
+                    print(f"  错误详情: {line}")
+            return False
+        except Exception as e:
+            print(f"✗ 分段编码过程中出错: {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _bench_cpu_seconds(stderr: str) -> Optional[float]:
+        """从 ffmpeg -benchmark 的 "bench: utime=..s stime=..s rtime=..s" 行取出 CPU 时间"""
+        m = re.search(r"bench: utime=([\d.]+)s stime=([\d.]+)s", stderr or "")
+        return float(m.group(1)) + float(m.group(2)) if m else None
+    
+    def mix_and_merge(self, video_path: str, bg_audio_path: str, tts_audio_path: str,
+                      output_path: str, bg_volume: float = 0.35, tts_volume: float = 1.0,
+                      duck_db: Optional[float] = -8.0, audio_codec: str = "aac",
+                      audio_bitrate: str = "192k", use_shortest: bool = True,
+                      sample_rate: int = 44100) -> bool:
+        """
+        一次 ffmpeg 完成“背景声 + 配音混音”和“与视频合并”，视频流直接复制
+        
+        混音用 audio_utils.mixer.mix_arrays（与 --keep-mix 输出的混音文件是同一实现、同一闪避曲线），
+        PCM 经管道送入 ffmpeg：省掉中间的混音 MP3，音频只经过一次有损编码（直接编码为容器内的 AAC）。
+        
+        Args:
+            video_path: 输入视频文件路径
+            bg_audio_path: 背景声音频路径
+            tts_audio_path: 配音音频路径
+            output_path: 输出视频文件路径
+            bg_volume: 背景音量（默认: 0.35）
+            tts_volume: 配音音量（默认: 1.0）
+            duck_db: 配音时背景额外压低的分贝数，None 表示不闪避（默认: -8.0）
+            audio_codec: 音频编码方式（默认: "aac"）
+            audio_bitrate: 音频码率（默认: "192k"）
+            use_shortest: 是否以最短的流为准（默认: True）
+            sample_rate: 混音采样率（默认: 44100）
+            
+        Returns:
+            bool: 是否成功
+        """
+        for path, name in ((video_path, "视频"), (bg_audio_path, "背景音频"), (tts_audio_path, "配音音频")):
+            if not os.path.exists(path):
+                print(f"错误: {name}文件不存在: {path}")
+                return False
+        
+        if not self._check_ffmpeg():
+            print("错误: 未找到ffmpeg，请确保已安装ffmpeg")
+            return False
+        
+        # NumPy 只有这里需要，按需导入
+        import numpy as np
+        from audio_utils.mixer import mix_arrays
+        from audio_utils.pcm import read_audio
+        try:
+            background = read_audio(bg_audio_path, sample_rate=sample_rate, channels=2)
+            speech = read_audio(tts_audio_path, sample_rate=sample_rate, channels=2)
+            mixed = mix_arrays(background, speech, sample_rate,
+                               bg_volume=bg_volume, tts_volume=tts_volume, duck_db=duck_db)
+        except Exception as e:
+            print(f"✗ 混音失败: {e}")
+            return False
+        pcm = np.ascontiguousarray(mixed, dtype=np.float32).tobytes()
+        
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", video_path,
+            "-f", "f32le", "-ac", "2", "-ar", str(sample_rate), "-i", "pipe:0",
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-c:v", "copy",
+            "-c:a", audio_codec,
+            "-b:a", audio_bitrate,
+        ]
+        if use_shortest:
+            cmd.append("-shortest")
+        cmd.append(output_path)
+        
+        print("正在混音并合并视频（单次编码）...")
+        print(f"  视频: {video_path}")
+        print(f"  背景: {bg_audio_path}")
+        print(f"  配音: {tts_audio_path}")
+        print(f"  输出: {output_path}")
+        return self._run_merge_cmd(cmd, output_path, input=pcm)
+    
+    def merge_multi(self, video_path: str, audio_tracks: List[dict], output_path: str,
+                    subtitles: Optional[List[dict]] = None, audio_codec: str = "aac",
+                    audio_bitrate: str = "192k") -> bool:
+        """
+        把多条配音音轨和多份字幕封装进同一个容器，视频流只复制一次
+        
+        Args:
+            video_path: 输入视频文件路径
+            audio_tracks: 音轨列表，元素为 {"path", "language", "title"(可选)}；第一条为默认音轨
+            output_path: 输出文件路径（.mp4 字幕用 mov_text，.mkv 字幕保留 srt）
+            subtitles: 软字幕列表，元素为 {"path", "language", "title"(可选)}
+            audio_codec: 音频编码方式（默认: "aac"；音轨本身已是目标编码时可传 "copy"）
+            audio_bitrate: 音频码率（默认: "192k"）
+            
+        Returns:
+            bool: 是否成功
+        """
+        subtitles = subtitles or []
+        if not audio_tracks:
+            print("错误: 至少需要一条音轨")
+            return False
+        
+        if not os.path.exists(video_path):
+            print(f"错误: 视频文件不存在: {video_path}")
+            return False
+        
+        for item in audio_tracks + subtitles:
+            if not os.path.exists(item["path"]):
+                print(f"错误: 文件不存在: {item['path']}")
+                return False
+        
+        if not self._check_ffmpeg():
+            print("错误: 未找到ffmpeg，请确保已安装ffmpeg")
+            return False
+        
+        cmd = ["ffmpeg", "-y", "-i", video_path]
+        for item in audio_tracks + subtitles:
+            cmd += ["-i", item["path"]]
+        
+        cmd += ["-map", "0:v:0"]
+        for i in range(len(audio_tracks)):
+            cmd += ["-map", f"{1 + i}:a:0"]
+        for i in range(len(subtitles)):
+            cmd += ["-map", f"{1 + len(audio_tracks) + i}:s:0"]
+        
+        sub_codec = "mov_text" if output_path.lower().endswith((".mp4", ".m4v", ".mov")) else "srt"
+        cmd += ["-c:v", "copy", "-c:a", audio_codec]
+        if audio_codec != "copy":
+            cmd += ["-b:a", audio_bitrate]
+        if subtitles:
+            cmd += ["-c:s", sub_codec]
+        
+        for kind, items in (("a", audio_tracks), ("s", subtitles)):
+            for i, item in enumerate(items):
+                lang = self._language_code(item.get("language", ""))
+                cmd += [f"-metadata:s:{kind}:{i}", f"language={lang}"]
+                title = item.get("title") or item.get("language")
+                if title:
+                    cmd += [f"-metadata:s:{kind}:{i}", f"title={title}"]
+                cmd += [f"-disposition:{kind}:{i}", "default" if i == 0 and kind == "a" else "0"]
+        
+        cmd.append(output_path)
+        
+        print(f"正在封装多语言视频 ({len(audio_tracks)} 条音轨, {len(subtitles)} 份字幕)...")
+        print(f"  视频: {video_path}")
+        for item in audio_tracks:
+            print(f"  音轨[{item.get('language', '')}]: {item['path']}")
+        for item in subtitles:
+            print(f"  字幕[{item.get('language', '')}]: {item['path']}")
+        print(f"  输出: {output_path}")
+        return self._run_merge_cmd(cmd, output_path)
+    
+    @staticmethod
+    def _language_code(language: str) -> str:
+        if not language:
+            return "und"
+        code = LANGUAGE_CODES.get(language) or LANGUAGE_CODES.get(language.split("-")[0].lower())
+        if code:
+            return code
+        return language if len(language) == 3 and language.isascii() else "und"
+    
+    def merge_streaming(self, video_path: str, audio_path: str, output_dir: str,
+                        fmt: str = "hls", ladder: Optional[List[dict]] = None,
+                        segment_seconds: int = 4, video_codec: str = "libx264",
+                        preset: str = "veryfast") -> bool:
+        """
+        一次解码输出多档码率的流式格式（HLS 或分片 MP4）
+        
+        视频只解码一次，经 split 分成多路缩放后分别编码；音频同理按档位编码。
+        - fmt="hls": fMP4 分片 + event 播放列表，分片写完即可被 CDN 拉取，边转边播；
+          主播放列表为 output_dir/master.m3u8，各档位在 output_dir/{name}/ 下
+        - fmt="fmp4": 每档一个分片 MP4（empty_moov），文件写入过程中即可渐进播放
+        
+        Args:
+            video_path: 输入视频文件路径
+            audio_path: 输入音频文件路径
+            output_dir: 输出目录
+            fmt: "hls" 或 "fmp4"（默认: "hls"）
+            ladder: 码率阶梯，元素为 {name, height, video_bitrate, audio_bitrate}（默认: DEFAULT_LADDER）
+            segment_seconds: 分片/关键帧间隔秒数（默认: 4）
+            video_codec: 视频编码器（默认: "libx264"）
+            preset: 编码预设（默认: "veryfast"）
+            
+        Returns:
+            bool: 是否成功
+        """
+        if fmt not in ("hls", "fmp4"):
+            print(f"错误: 不支持的流式格式: {fmt}")
+            return False
+        
+        if not os.path.exists(video_path):
+            print(f"错误: 视频文件不存在: {video_path}")
+            return False
+        
+        if not os.path.exists(audio_path):
+            print(f"错误: 音频文件不存在: {audio_path}")
+            return False
+        
+        if not self._check_ffmpeg():
+            print("错误: 未找到ffmpeg，请确保已安装ffmpeg")
+            return False
+        
+        rungs = self._select_rungs(video_path, ladder or DEFAULT_LADDER)
+        os.makedirs(output_dir, exist_ok=True)
+        
+        n = len(rungs)
+        split_outs = "".join(f"[vs{i}]" for i in range(n))
+        chains = [f"[0:v]split={n}{split_outs}"]
+        for i, rung in enumerate(rungs):
+            chains.append(f"[vs{i}]scale=-2:{rung['height']}[v{i}]")
+        
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", video_path,
+            "-i", audio_path,
+            "-filter_complex", ";".join(chains),
+        ]
+        # 所有档位关键帧对齐到分片边界，便于播放器无缝切换码率
+        encode_args = [
+            "-c:v", video_codec, "-preset", preset,
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+            "-sc_threshold", "0",
+            "-c:a", "aac",
+        ]
+        
+        if fmt == "hls":
+            for i in range(n):
+                cmd += ["-map", f"[v{i}]", "-map", "1:a:0"]
+            cmd += encode_args
+            for i, rung in enumerate(rungs):
+                cmd += [
+                    f"-b:v:{i}", rung["video_bitrate"],
+                    f"-maxrate:v:{i}", rung["video_bitrate"],
+                    f"-bufsize:v:{i}", self._double_bitrate(rung["video_bitrate"]),
+                    f"-b:a:{i}", rung["audio_bitrate"],
+                ]
+                os.makedirs(os.path.join(output_dir, rung["name"]), exist_ok=True)
+            var_stream_map = " ".join(f"v:{i},a:{i},name:{rung['name']}" for i, rung in enumerate(rungs))
+            cmd += [
+                "-f", "hls",
+                "-hls_time", str(segment_seconds),
+                "-hls_playlist_type", "event",
+                "-hls_segment_type", "fmp4",
+                "-hls_flags", "independent_segments+temp_file",
+                "-master_pl_name", "master.m3u8",
+                "-var_stream_map", var_stream_map,
+                "-hls_segment_filename", os.path.join(output_dir, "%v", "seg_%05d.m4s"),
+                os.path.join(output_dir, "%v", "index.m3u8"),
+            ]
+            final_output = os.path.join(output_dir, "master.m3u8")
+        else:
+            for i, rung in enumerate(rungs):
+                cmd += ["-map", f"[v{i}]", "-map", "1:a:0"]
+                cmd += encode_args
+                cmd += [
+                    "-b:v", rung["video_bitrate"],
+                    "-maxrate", rung["video_bitrate"],
+                    "-bufsize", self._double_bitrate(rung["video_bitrate"]),
+                    "-b:a", rung["audio_bitrate"],
+                    "-shortest",
+                    "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+                    os.path.join(output_dir, f"{rung['name']}.mp4"),
+                ]
+            final_output = output_dir
+        
+        print(f"正在生成流式输出 ({fmt}, {', '.join(r['name'] for r in rungs)})...")
+        print(f"  视频: {video_path}")
+        print(f"  音频: {audio_path}")
+        print(f"  输出: {final_output}")
+        return self._run_merge_cmd(cmd, final_output)
+    
+    def _select_rungs(self, video_path: str, ladder: List[dict]) -> List[dict]:
+        height = probe_video_height(video_path)
+        if not height:
+            return list(ladder)
+        rungs = [r for r in ladder if r["height"] <= height]
+        # 源分辨率低于所有档位时，至少保留最低一档
+        return rungs or [min(ladder, key=lambda r: r["height"])]
+    
+    @staticmethod
+    def _double_bitrate(bitrate: str) -> str:
+        if bitrate[-1:].lower() in ("k", "m"):
+            return f"{int(float(bitrate[:-1]) * 2)}{bitrate[-1]}"
+        return str(int(float(bitrate) * 2))
+    
+    def _run_merge_cmd(self, cmd: list, output_path: str, input: Optional[bytes] = None) -> bool:
+        try:
+            run_ffmpeg(cmd, input=input, timeout=self.timeout, progress=self.progress)
+            print(f"✓ 视频生成成功: {output_path}")
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"✗ 合并失败: {e}")
+            if e.stderr:
+                error_lines = e.stderr.split('\n')
+                for line in error_lines[-10:]:
+                    if line.strip() and ('error' in line.lower() or 'failed' in line.lower()):
+                        print(f"  错误详情: {line}")
+            return False
+        except Exception as e:
+            print(f"✗ 合并过程中出错: {str(e)}")
+            return False
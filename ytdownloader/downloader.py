@@ -1,14 +1,67 @@
 import os
 import csv
+import copy
 import glob
+import hashlib
+import json
+import re
+import time
+import threading
 import yt_dlp
-import subprocess
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Optional
 import sys
 
 # Add project root to sys.path to import path_manager
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.path_manager import PathManager
+from utils.ffmpeg_runner import has_ffprobe, probe_duration
+from ytdownloader.ledger import DownloadLedger, STATE_DONE, STATE_FAILED, STATE_RUNNING
+from ytdownloader.limits import HostLimiter, TokenBucket, host_key
+
+# 纯音频流保存为原生容器（不转码），按优先级查找
+AUDIO_EXTS = ('.m4a', '.webm', '.opus', '.ogg', '.aac', '.mp3')
+
+# 纯视频流、纯音频流分开下载，各自只落盘一次
+VIDEO_FORMAT = 'bv*[ext=mp4]/bv*'
+AUDIO_FORMAT = 'ba[ext=m4a]/ba'
+
+# 元数据缓存有效期：语言判断、跳过检查只看缓存，不联网
+INFO_TTL = 7 * 24 * 3600
+# 媒体直链会过期（YouTube 约 6 小时），超过此时长的缓存在下载前重新解析
+MEDIA_TTL = 3 * 3600
+
+# 不带标签页的频道地址：扁平展开时得到的是“视频/Shorts/直播”等标签页条目，而不是视频
+CHANNEL_URL_RE = re.compile(
+    r'^(https?://(?:www\.|m\.)?youtube\.com/(?:@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+))/?$')
+# 单个视频的 YouTube 地址
+YOUTUBE_VIDEO_RE = re.compile(r'(?:youtube\.com/(?:watch\?|shorts/|live/)|youtu\.be/)')
+# 播放列表嵌套（频道标签页 → 播放列表）最多跟进的层数
+MAX_PLAYLIST_DEPTH = 2
+
+def udi_for_url(url: str) -> str:
+    """没有给出 UDI 时，用规范化 URL 的 md5 作为 UDI"""
+    return hashlib.md5(url.strip().replace('\\', '').encode('utf-8')).hexdigest()
+
+
+@dataclass
+class MediaHandle:
+    """音频优先下载的结果：音频/字幕已就绪，视频在后台下载"""
+    udi: str
+    audio_path: str
+    srt_path: Optional[str]
+    video_path: str
+    video_future: Future
+
+    def wait_video(self, timeout: Optional[float] = None) -> bool:
+        """阻塞直到视频下载结束，返回是否成功"""
+        try:
+            return bool(self.video_future.result(timeout)) and os.path.exists(self.video_path)
+        except Exception as e:
+            print(f"❌ 后台视频下载失败: {e}")
+            return False
+
 
 class YouTubeDownloader:
     def __init__(self):
@@ -16,6 +69,19 @@ class YouTubeDownloader:
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.cookies_file = os.path.join(base_dir, 'config', 'cookies.txt')
         self.pm = PathManager()
+        # 批量并发下载时由 batch_download 设置
+        self.rate_limiter: Optional[TokenBucket] = None
+        self.ledger: Optional[DownloadLedger] = None
+        self.quiet = False
+        self.info_ttl = INFO_TTL
+        self.media_ttl = MEDIA_TTL
+        # 每个线程复用一个只做解析的 YoutubeDL，保留 extractor 状态（cookies、播放器 JS 缓存等）
+        self._local = threading.local()
+        self._ydls: List[yt_dlp.YoutubeDL] = []
+        self._ydls_lock = threading.Lock()
+        # 音频优先模式下的后台视频下载
+        self._video_pool: Optional[ThreadPoolExecutor] = None
+        self._video_pool_lock = threading.Lock()
         
     def read_video_list(self, csv_path: str) -> List[Dict[str, str]]:
         """从CSV文件读取视频信息列表"""
@@ -49,49 +115,121 @@ class YouTubeDownloader:
         print(f"总共读取到 {len(videos)} 个视频")
         return videos
 
-    def _extract_audio(self, video_path: str, audio_path: str) -> bool:
-        """调用 ffmpeg 本地提取音频，比重新下载快得多"""
-        try:
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-vn",             # 禁用视频流
-                "-acodec", "libmp3lame",
-                "-q:a", "2",       # 高质量 VBR
-                audio_path
-            ]
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except Exception as e:
-            print(f"音频提取失败: {e}")
-            return False
+    def _find_audio(self, project_dir: str, udi: str) -> Optional[str]:
+        """查找已下载的音频（原生容器，兼容旧版本的 mp3）"""
+        for ext in AUDIO_EXTS:
+            path = os.path.join(project_dir, f"{udi}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
 
-    def _remove_audio_track(self, video_path: str) -> bool:
-        """移除视频文件中的音频轨，生成纯视频文件"""
-        try:
-            tmp_path = video_path + ".tmp.mp4"
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-c", "copy",
-                "-an",             # 移除音频
-                tmp_path
-            ]
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            # 覆盖原文件
-            os.replace(tmp_path, video_path)
-            return True
-        except Exception as e:
-            print(f"移除音频轨失败: {e}")
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            return False
+    def _throttle(self) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def _info_ydl(self) -> yt_dlp.YoutubeDL:
+        ydl = getattr(self._local, 'info_ydl', None)
+        if ydl is None:
+            opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'noplaylist': True,
+            }
+            if os.path.exists(self.cookies_file):
+                opts['cookiefile'] = self.cookies_file
+            ydl = yt_dlp.YoutubeDL(opts)
+            self._local.info_ydl = ydl
+            with self._ydls_lock:
+                self._ydls.append(ydl)
+        return ydl
+
+    def _get_info(self, video: Dict[str, str], max_age: float, force: bool = False) -> Optional[dict]:
+        """
+        取视频元数据：{udi}.info.json 在 max_age 秒内有效则直接读取，否则解析一次并写回缓存
+        返回已清理的 info dict（可直接交给 process_ie_result）；解析失败返回 None
+        """
+        info_path = self.pm.get_path('info_json', video['udi'])
+        if not force and os.path.exists(info_path):
+            age = time.time() - os.path.getmtime(info_path)
+            if age < max_age:
+                try:
+                    with open(info_path, 'r', encoding='utf-8') as f:
+                        return json.load(f)
+                except (OSError, ValueError):
+                    pass
+
+        self._throttle()
+        info = self._info_ydl().extract_info(video['url'], download=False)
+        info = yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+        tmp_path = info_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_path, info_path)
+        return info
+
+    def _download_ydl(self, opts: dict) -> yt_dlp.YoutubeDL:
+        """
+        取当前线程复用的下载用 YoutubeDL
+
+        格式选择器和后处理器在构造时就固定了，按 (format, postprocessors, skip_download) 区分实例，
+        每个线程每种组合只构造一次；输出模板、字幕语言等随视频变化的选项每次调用时换进 params。
+        """
+        key = (opts.get('format'), repr(opts.get('postprocessors')), bool(opts.get('skip_download')))
+        cache = getattr(self._local, 'download_ydls', None)
+        if cache is None:
+            cache = self._local.download_ydls = {}
+        ydl = cache.get(key)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(opts)
+            cache[key] = ydl
+            with self._ydls_lock:
+                self._ydls.append(ydl)
+            return ydl
+
+        outtmpl = opts['outtmpl'] if isinstance(opts['outtmpl'], dict) else {'default': opts['outtmpl']}
+        # 构造时 params['outtmpl'] 已被规范化为 dict（并补齐了默认模板），只替换我们给出的几项
+        ydl.params['outtmpl'].update(outtmpl)
+        ydl.params.update({k: v for k, v in opts.items() if k not in ('outtmpl', 'format', 'postprocessors')})
+        return ydl
+
+    def _download_with_info(self, opts: dict, video: Dict[str, str], info: Optional[dict]) -> None:
+        """用已有的 info 直接下载（不再重复解析）；没有 info 或直链已失效时重新解析后再试一次"""
+        self._throttle()
+        ydl = self._download_ydl(opts)
+        if info is not None:
+            try:
+                ydl.process_ie_result(copy.deepcopy(info), download=True)
+                return
+            except Exception as e:
+                print(f"⚠ 使用缓存元数据下载失败，重新解析: {e}")
+
+        fresh = self._get_info(video, 0, force=True)
+        ydl.process_ie_result(copy.deepcopy(fresh), download=True)
+
+    def close(self) -> None:
+        """关闭各线程复用的 YoutubeDL（解析用和下载用，保存 cookies）"""
+        with self._video_pool_lock:
+            pool, self._video_pool = self._video_pool, None
+        if pool is not None:
+            # 等待仍在后台下载的视频
+            pool.shutdown(wait=True)
+        with self._ydls_lock:
+            ydls, self._ydls = self._ydls, []
+        for ydl in ydls:
+            try:
+                ydl.__exit__(None, None, None)
+            except Exception:
+                pass
+        self._local = threading.local()
 
     def _consolidate_subtitles(self, udi: str, detected_lang: str) -> None:
-        """合并/清理字幕文件，只保留一份最佳字幕，重命名为 {udi}.srt (存放在 intermediate 目录)"""
+        """
+        合并/清理字幕文件，只保留一份最佳字幕，重命名为 {udi}.downloaded.srt (存放在 intermediate 目录)
+
+        与转写输出的 {udi}.srt 分开存放：音频优先下载时后台视频任务可能在转写的同时整理字幕
+        """
         project_dir = self.pm.get_project_dir(udi)
-        final_path = self.pm.get_path('srt', udi)
+        final_path = self.pm.get_path('downloaded_srt', udi)
         
         # 查找所有相关字幕 (yt-dlp 默认下载在项目根目录)
         # 注意: yt-dlp 可能会生成 udi.Code.srt
@@ -151,135 +289,285 @@ class YouTubeDownloader:
             print(f"⚠ 字幕合并出错: {e}")
 
     def download_video(self, video: Dict[str, str], need_audio: bool = True) -> bool:
-        """下载单个视频（智能跳过、本地提取音频、生成纯视频、下载字幕）"""
+        """下载单个视频（智能跳过、纯视频流与纯音频流分开下载、下载字幕）"""
+        if self.ledger is None:
+            return self._download_video(video, need_audio)
+
+        udi = video['udi']
+        if self._ledger_skip(video, need_audio):
+            return True
+        self.ledger.set_state(udi, STATE_RUNNING)
+        return self._download_and_record(video, need_audio)
+
+    def _ledger_skip(self, video: Dict[str, str], need_audio: bool) -> bool:
+        """登记任务；台账记为完成且产物校验通过时返回 True（不扫描目录、不联网，直接跳过）"""
+        udi = video['udi']
+        self.ledger.register(udi, video['url'])
+        if self.ledger.state(udi) == STATE_DONE and self._ledger_complete(udi, need_audio):
+            print(f"✓ 台账记录已完成，跳过任务: {udi}")
+            return True
+        return False
+
+    def _download_and_record(self, video: Dict[str, str], need_audio: bool) -> bool:
+        """下载并在台账中登记产物和最终状态；调用方已把任务置为 running"""
+        udi = video['udi']
+        ok = self._download_video(video, need_audio)
+        if self.ledger is None:
+            return ok
+        if ok:
+            try:
+                self._record_artifacts(video, need_audio)
+                self.ledger.set_state(udi, STATE_DONE)
+            except OSError as e:
+                print(f"⚠ 台账登记失败: {e}")
+                ok = False
+        if not ok:
+            self.ledger.set_state(udi, STATE_FAILED, error='download failed')
+        return ok
+
+    def download_audio_first(self, video: Dict[str, str]) -> Optional[MediaHandle]:
+        """
+        先下载纯音频流和字幕，立即返回；视频在后台线程继续下载
+
+        下游的转写、翻译、配音、分离只需要音频和字幕，合并前再调用 handle.wait_video()。
+        音频或字幕阶段失败时返回 None。整个任务在台账中只算一次尝试：
+        这里置为 running，后台视频任务只负责登记产物和最终状态。
+        """
+        udi = video['udi']
+        project_dir = self.pm.get_project_dir(udi)
+        video_path = os.path.join(project_dir, f"{udi}.mp4")
+        srt_path = self.pm.get_path('downloaded_srt', udi)
+
+        if self.ledger is not None and self._ledger_skip(video, need_audio=True):
+            # 没有字幕的视频 subs_exists 永远为假，不先查台账的话每次重跑都会去补充下载字幕
+            done: Future = Future()
+            done.set_result(True)
+            return MediaHandle(
+                udi=udi,
+                audio_path=self._find_audio(project_dir, udi),
+                srt_path=srt_path if os.path.exists(srt_path) else None,
+                video_path=video_path,
+                video_future=done,
+            )
+
+        if self.ledger is not None:
+            self.ledger.set_state(udi, STATE_RUNNING)
+        if not self._download_video(video, need_audio=True, skip_video=True):
+            if self.ledger is not None:
+                self.ledger.set_state(udi, STATE_FAILED, error='audio download failed')
+            return None
+
+        with self._video_pool_lock:
+            if self._video_pool is None:
+                self._video_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='video-download')
+            # 音频和字幕已就位，这里实际只会下载视频（元数据取自刚写入的缓存）
+            future = self._video_pool.submit(self._download_and_record, video, True)
+        return MediaHandle(
+            udi=udi,
+            audio_path=self._find_audio(project_dir, udi),
+            srt_path=srt_path if os.path.exists(srt_path) else None,
+            video_path=video_path,
+            video_future=future,
+        )
+
+    def _ledger_complete(self, udi: str, need_audio: bool) -> bool:
+        kinds = ['video'] + (['audio'] if need_audio else [])
+        # 字幕不是每个视频都有，登记过才校验；
+        # 旧台账里的 'srt' 记录指向转写输出的 {udi}.srt，不再参与校验（否则会被当作损坏文件删除）
+        if self.ledger.artifact(udi, 'downloaded_srt') is not None:
+            kinds.append('downloaded_srt')
+        return all(self.ledger.verify(udi, kind) == 'ok' for kind in kinds)
+
+    def _record_artifacts(self, video: Dict[str, str], need_audio: bool) -> None:
+        udi = video['udi']
+        project_dir = self.pm.get_project_dir(udi)
+        self.ledger.record(udi, 'video', os.path.join(project_dir, f"{udi}.mp4"))
+        if need_audio:
+            self.ledger.record(udi, 'audio', self._find_audio(project_dir, udi))
+        srt_path = self.pm.get_path('downloaded_srt', udi)
+        if os.path.exists(srt_path):
+            self.ledger.record(udi, 'downloaded_srt', srt_path)
+
+    def _artifact_ok(self, udi: str, kind: str, path: Optional[str]) -> bool:
+        """产物是否完整可用；有台账时按台账校验，损坏的文件会被删除以便重新下载"""
+        if self.ledger is None:
+            return path is not None and os.path.exists(path)
+
+        status = self.ledger.verify(udi, kind)
+        if status == 'ok':
+            return True
+        if status == 'corrupt':
+            bad_path = self.ledger.artifact(udi, kind)['path']
+            print(f"⚠ 检测到损坏的文件（大小或校验和不符），将重新下载: {bad_path}")
+            try:
+                os.remove(bad_path)
+            except OSError:
+                pass
+            self.ledger.forget(udi, kind)
+            return False
+
+        # 台账里没有：可能是台账之前下载的文件，也可能是写了一半的文件
+        self.ledger.forget(udi, kind)
+        if path is None or not os.path.exists(path) or not self._looks_complete(kind, path):
+            return False
+        self.ledger.record(udi, kind, path)
+        return True
+
+    @staticmethod
+    def _looks_complete(kind: str, path: str) -> bool:
+        if os.path.getsize(path) == 0:
+            return False
+        if kind == 'downloaded_srt' or not has_ffprobe():
+            return True
+        # 截断的媒体文件通常读不出时长（mp4 缺 moov 等）
+        return probe_duration(path) is not None
+
+    def _download_video(self, video: Dict[str, str], need_audio: bool, skip_video: bool = False) -> bool:
         try:
             # 获取项目目录和路径
             project_dir = self.pm.get_project_dir(video['udi'])
             os.makedirs(project_dir, exist_ok=True)
             
             video_path = os.path.join(project_dir, f"{video['udi']}.mp4")
-            audio_path = os.path.join(project_dir, f"{video['udi']}.mp3")
             # 最终期望的字幕文件 (在 intermediate 目录)
-            final_sub_path = self.pm.get_path('srt', video['udi'])
+            final_sub_path = self.pm.get_path('downloaded_srt', video['udi'])
 
-            # 1. 检查是否存在 (Video & Audio & Subtitles)
-            video_exists = os.path.exists(video_path)
-            audio_exists = os.path.exists(audio_path)
+            # 1. 检查是否存在且完整 (Video & Audio & Subtitles)
+            video_exists = self._artifact_ok(video['udi'], 'video', video_path)
+            audio_exists = self._artifact_ok(video['udi'], 'audio', self._find_audio(project_dir, video['udi']))
             # 检查是否有标准命名的srt字幕
-            subs_exists = os.path.exists(final_sub_path)
+            subs_exists = self._artifact_ok(video['udi'], 'downloaded_srt', final_sub_path)
             
             # 如果没找到标准字幕，检查是否有任何相关字幕(可能是上次没合并成功)
             if not subs_exists:
                 pattern = os.path.join(project_dir, f"{video['udi']}*.srt")
                 if len(glob.glob(pattern)) > 0:
-                     # 或者是未合并的状态，尝试合并一下
+                     # 或者是未合并的状态，尝试合并一下（语言取自本地缓存的元数据）
                      print(f"Found unmerged subtitles for {video['udi']}, consolidating...")
-                     self._consolidate_subtitles(video['udi'], None)
+                     self._consolidate_subtitles(video['udi'], self._cached_language(video['udi']))
                      # 再次检查
-                     subs_exists = os.path.exists(final_sub_path)
+                     subs_exists = self._artifact_ok(video['udi'], 'downloaded_srt', final_sub_path)
 
             # 如果所有需要的文件都存在，则跳过
-            if video_exists and (not need_audio or audio_exists) and subs_exists:
+            if (skip_video or video_exists) and (not need_audio or audio_exists) and subs_exists:
                 print(f"✓ 所有文件已存在，跳过任务: {video['udi']}")
                 return True
 
-            # 2. 如果视频不存在，或者字幕缺失，我们需要获取信息来决定下载策略
-            # 为了优先下载原语言字幕，先获取视频元数据
+            # 2. 还有文件要下载：取一次元数据（本地缓存的直链未过期时不联网），
+            # 用于确定字幕语言，并直接交给后续下载复用，不再重复解析
             detected_lang = None
-            if not video_exists or not subs_exists:
-                print(f"🔍 正在解析视频信息以确定字幕语言: {video['udi']} ...")
-                temp_opts = {
-                    'quiet': True, 
-                    'no_warnings': True,
-                    'noplaylist': True,
-                }
-                if os.path.exists(self.cookies_file):
-                    temp_opts['cookiefile'] = self.cookies_file
-                
-                try:
-                    with yt_dlp.YoutubeDL(temp_opts) as ydl_temp:
-                        info = ydl_temp.extract_info(video['url'], download=False)
-                        detected_lang = info.get('language')
-                        if detected_lang:
-                            print(f"✓ 检测到视频语言: {detected_lang}")
-                        else:
-                            print(f"⚠ 未能检测到语言元数据，将尝试下载所有字幕")
-                except Exception as e:
-                    print(f"获取元数据失败，将尝试默认下载: {e}")
+            info = None
+            try:
+                info = self._get_info(video, self.media_ttl)
+                detected_lang = info.get('language')
+                if detected_lang:
+                    print(f"✓ 检测到视频语言: {detected_lang}")
+                else:
+                    print("⚠ 未能检测到语言元数据，将尝试下载所有字幕")
+            except Exception as e:
+                print(f"获取元数据失败，将尝试默认下载: {e}")
 
             # 配置 yt-dlp 选项
-            video_opts = {
-                'format': 'bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4] / bv*+ba/b',
-                'outtmpl': os.path.join(project_dir, f"{video['udi']}.%(ext)s"),
-                'merge_output_format': 'mp4',
+            base_opts = {
                 'noplaylist': True,
                 'geo_bypass': True,
-                'quiet': False,
+                'quiet': self.quiet,
+                'noprogress': self.quiet,
                 'no_warnings': True,
-                
-                # 字幕相关配置
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitlesformat': 'srt',
+            }
+            if os.path.exists(self.cookies_file):
+                base_opts['cookiefile'] = self.cookies_file
+
+            # 纯视频流：非 mp4 时只做封装转换（-c copy），不转码；
+            # 先落到 {udi}.video.*，避免与同为 webm 的音频流重名
+            video_opts = {
+                **base_opts,
+                'format': VIDEO_FORMAT,
+                'outtmpl': os.path.join(project_dir, f"{video['udi']}.video.%(ext)s"),
                 'postprocessors': [
-                    {'key': 'FFmpegSubtitlesConvertor', 'format': 'srt'}
+                    {'key': 'FFmpegVideoRemuxer', 'preferedformat': 'mp4'},
                 ],
             }
 
+            # 纯音频流：保留原生容器（m4a/webm），不转码
+            audio_opts = {
+                **base_opts,
+                'format': AUDIO_FORMAT,
+                'outtmpl': os.path.join(project_dir, f"{video['udi']}.%(ext)s"),
+            }
+
+            # 字幕跟随第一个下载任务一起获取
+            subs_opts = {
+                'writesubtitles': True,
+                'writeautomaticsub': True,
+                'subtitlesformat': 'srt',
+                'outtmpl': {
+                    'default': video_opts['outtmpl'],
+                    'subtitle': os.path.join(project_dir, f"{video['udi']}.%(ext)s"),
+                },
+            }
             # 设置字幕语言优先级
             if detected_lang:
                 # 优先下载检测到的语言，使用正则匹配 (例如 'en' 匹配 'en-US')
-                video_opts['subtitleslangs'] = [f"{detected_lang}.*", 'orig'] 
+                subs_opts['subtitleslangs'] = [f"{detected_lang}.*", 'orig']
             else:
                 # 无法检测时，下载所有以确保包含原语言
-                video_opts['subtitleslangs'] = ['all']
-            
-            if os.path.exists(self.cookies_file):
-                video_opts['cookiefile'] = self.cookies_file
+                subs_opts['subtitleslangs'] = ['all']
+            subs_pp = {'key': 'FFmpegSubtitlesConvertor', 'format': 'srt'}
+
+            def with_subs(opts: dict) -> dict:
+                # 字幕已存在时不再重复下载
+                if subs_exists:
+                    return opts
+                merged = {**opts, **subs_opts}
+                merged['outtmpl'] = {**subs_opts['outtmpl'], 'default': opts['outtmpl']}
+                merged['postprocessors'] = [subs_pp] + opts.get('postprocessors', [])
+                return merged
+
+            # 音频优先：字幕跟随音频一起下载，视频留给后台任务
+            first, first_label = (audio_opts, "纯音频流") if skip_video else (video_opts, "纯视频流")
+            first_needed = (need_audio and not audio_exists) if skip_video else not video_exists
 
             # 3. 执行下载
             try:
-                if not video_exists:
-                    print(f"⬇️ 正在下载视频及字幕 ({detected_lang or 'ALL'}): {video['udi']} ...")
-                    with yt_dlp.YoutubeDL(video_opts) as ydl:
-                        ydl.download([video['url']])
+                if first_needed:
+                    print(f"⬇️ 正在下载{first_label}{'' if subs_exists else '及字幕'} "
+                          f"({detected_lang or 'ALL'}): {video['udi']} ...")
+                    self._download_with_info(with_subs(first), video, info)
+                    if not skip_video:
+                        self._finalize_video(project_dir, video['udi'], video_path)
                 
                 elif not subs_exists:
-                    print(f"⬇️ 视频已存在，正在补充下载字幕 ({detected_lang or 'ALL'}): {video['udi']} ...")
+                    print(f"⬇️ 正在补充下载字幕 ({detected_lang or 'ALL'}): {video['udi']} ...")
                     # 开启 skip_download 只下字幕
-                    opts_subs_only = video_opts.copy()
-                    opts_subs_only['skip_download'] = True
-                    with yt_dlp.YoutubeDL(opts_subs_only) as ydl:
-                        ydl.download([video['url']])
+                    opts_subs_only = {**base_opts, **subs_opts, 'skip_download': True,
+                                      'postprocessors': [subs_pp]}
+                    self._download_with_info(opts_subs_only, video, info)
                 
                 # 下载完成后，合并/清理字幕文件
-                self._consolidate_subtitles(video['udi'], detected_lang)
+                if not subs_exists:
+                    self._consolidate_subtitles(video['udi'], detected_lang)
+
+                # 4. 如果需要音频且音频不存在，单独下载纯音频流
+                if need_audio and not audio_exists and not skip_video:
+                    print(f"🎵 正在下载纯音频流: {video['udi']} ...")
+                    self._download_with_info(audio_opts, video, info)
 
             except Exception as dl_err:
                  print(f"下载过程出错: {dl_err}")
                  return False
 
-            # 再次确认视频是否就位
-            if not os.path.exists(video_path):
+            # 再次确认视频/音频是否就位
+            if not skip_video and not os.path.exists(video_path):
                  print(f"❌ 视频下载失败或文件未生成: {video['udi']}")
                  return False
-
-            # 4. 如果需要音频且音频不存在，从本地视频提取
-            if need_audio and not os.path.exists(audio_path):
-                print(f"🎵 正在从本地提取音频: {video['udi']} ...")
-                if self._extract_audio(video_path, audio_path):
-                    print(f"✓ 音频提取成功")
-                else:
+            if need_audio:
+                audio_path = self._find_audio(project_dir, video['udi'])
+                if not audio_path:
+                    print(f"❌ 音频下载失败或文件未生成: {video['udi']}")
                     return False
-            
-            # 5. 生成纯视频 (仅在刚刚下载了新视频时执行，或者强制检查？)
-            # 由于 video_exists 是初始状态，如果是新下载(not video_exists)，肯定有声音
-            if not video_exists: 
-                print(f"✂️ 正在移除视频原声以生成纯视频...")
-                if self._remove_audio_track(video_path):
-                    print(f"✓ 纯视频生成成功")
-                else:
-                    print(f"⚠ 无法移除视频原声")
+                if not audio_exists:
+                    print(f"✓ 音频已保存: {os.path.basename(audio_path)}")
 
             return True
             
@@ -287,44 +575,291 @@ class YouTubeDownloader:
             print(f"处理出错 {video['url']}: {str(e)}")
             return False
 
-    def batch_download(self, csv_path: str, need_audio: bool = True) -> None:
-        """批量下载视频"""
+    def _cached_language(self, udi: str) -> Optional[str]:
+        info_path = self.pm.get_path('info_json', udi)
+        if not os.path.exists(info_path) or time.time() - os.path.getmtime(info_path) > self.info_ttl:
+            return None
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('language')
+        except (OSError, ValueError):
+            return None
+
+    def _finalize_video(self, project_dir: str, udi: str, video_path: str) -> None:
+        """把 {udi}.video.mp4 改名为 {udi}.mp4"""
+        pattern = os.path.join(project_dir, f"{udi}.video.*")
+        candidates = [f for f in glob.glob(pattern) if not f.endswith(('.part', '.ytdl'))]
+        if not candidates:
+            return
+        # 转封装后应只剩 mp4；异常情况下取 mp4 优先
+        candidates.sort(key=lambda f: not f.endswith('.mp4'))
+        os.replace(candidates[0], video_path)
+        for f in candidates[1:]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def batch_download(self, csv_path: str, need_audio: bool = True, max_workers: int = 1,
+                       per_host: int = 2, requests_per_second: float = 1.0,
+                       use_ledger: bool = True) -> None:
+        """
+        批量下载视频
+
+        max_workers > 1 时并发处理：同一站点最多 per_host 个任务同时进行，
+        所有线程共享一个令牌桶，对站点的请求（解析/下载）总速率不超过 requests_per_second。
+        use_ledger 时在 CSV 旁维护 {csv名}.ledger.sqlite，记录每个 UDI 的状态与产物校验和，
+        中断后重跑只处理未完成的部分，并能发现损坏的文件。
+        """
         videos = self.read_video_list(csv_path)
         if not videos:
             print("没有找到要下载的视频")
             return
 
+        if use_ledger:
+            self.ledger = DownloadLedger.for_csv(csv_path)
+        self._run_batch(videos, need_audio, max_workers, per_host, requests_per_second)
+
+    def list_playlist(self, url: str, known: Optional[set] = None,
+                      stop_after_known: int = 0) -> List[Dict[str, str]]:
+        """
+        扁平展开播放列表/频道（只取条目列表，不解析每个视频），返回 [{udi, url, title}]
+
+        频道按上传时间倒序列出；给出 known（已知 UDI 集合）和 stop_after_known 时，
+        连续遇到 stop_after_known 个已知条目即停止翻页，日常同步通常只需要第一页。
+        """
+        opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+            'skip_download': True,
+        }
+        if os.path.exists(self.cookies_file):
+            opts['cookiefile'] = self.cookies_file
+
+        entries: List[Dict[str, str]] = []
+        seen_known = 0
+        url = self._normalize_source_url(url)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            for entry, entry_url in self._iter_videos(ydl, url, depth=0, visited=set()):
+                udi = udi_for_url(entry_url)
+                if known is not None and udi in known:
+                    seen_known += 1
+                    if stop_after_known and seen_known >= stop_after_known:
+                        break
+                else:
+                    seen_known = 0
+                entries.append({'udi': udi, 'url': entry_url, 'title': entry.get('title') or ''})
+        return entries
+
+    def _iter_videos(self, ydl: yt_dlp.YoutubeDL, url: str, depth: int, visited: set):
+        """惰性产出列表中的 (条目, 视频 URL)"""
+        visited.add(url)
+        self._throttle()
+        # process=False 时 entries 是惰性的，提前停止就不会再请求后续分页
+        info = ydl.extract_info(url, download=False, process=False)
+        yield from self._iter_entries(ydl, info, depth, visited)
+
+    def _iter_entries(self, ydl: yt_dlp.YoutubeDL, info: dict, depth: int, visited: set):
+        # 指向标签页/播放列表的条目按需跟进（最多 MAX_PLAYLIST_DEPTH 层），其他非视频条目跳过
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist':
+                if depth < MAX_PLAYLIST_DEPTH:
+                    yield from self._iter_entries(ydl, entry, depth + 1, visited)
+                continue
+            entry_url = self._entry_url(entry)
+            if entry_url:
+                yield entry, entry_url
+                continue
+            nested = self._nested_url(entry)
+            if nested and nested not in visited and depth < MAX_PLAYLIST_DEPTH:
+                yield from self._iter_videos(ydl, nested, depth + 1, visited)
+
+    @staticmethod
+    def _normalize_source_url(url: str) -> str:
+        """频道主页改为“视频”标签页，直接列出上传的视频"""
+        url = url.strip()
+        m = CHANNEL_URL_RE.match(url)
+        return f"{m.group(1)}/videos" if m else url
+
+    @staticmethod
+    def _is_video_entry(entry: dict) -> bool:
+        ie_key = entry.get('ie_key') or ''
+        url = entry.get('webpage_url') or entry.get('url') or ''
+        if ie_key:
+            # YoutubeTab / YoutubePlaylist 等是列表，不是视频
+            return not ie_key.endswith(('Tab', 'Playlist', 'Channel', 'Search'))
+        if 'youtube.com' in url or 'youtu.be' in url:
+            return bool(YOUTUBE_VIDEO_RE.search(url))
+        return True
+
+    @classmethod
+    def _entry_url(cls, entry: dict) -> Optional[str]:
+        """视频条目的 URL；标签页、播放列表等非视频条目返回 None"""
+        if not cls._is_video_entry(entry):
+            return None
+        url = entry.get('webpage_url') or entry.get('url')
+        if url and '://' in url:
+            return url
+        # 部分 extractor 的扁平条目只有 id
+        video_id = entry.get('id') or url
+        if video_id and (entry.get('ie_key') or '').startswith('Youtube'):
+            return f"https://www.youtube.com/watch?v={video_id}"
+        return None
+
+    @staticmethod
+    def _nested_url(entry: dict) -> Optional[str]:
+        """指向另一个列表（频道标签页、播放列表）的 url / url_transparent 条目"""
+        if entry.get('_type') not in ('url', 'url_transparent'):
+            return None
+        url = entry.get('url') or entry.get('webpage_url')
+        return url if url and '://' in url else None
+
+    def sync(self, source_url: str, ledger_path: str, need_audio: bool = True, max_workers: int = 1,
+             per_host: int = 2, requests_per_second: float = 1.0, stop_after_known: int = 30,
+             dry_run: bool = False) -> List[Dict[str, str]]:
+        """
+        增量同步播放列表/频道：一次扁平列表请求，与台账比对，只下载新上传（及之前未完成）的视频
+
+        返回本次入队的任务列表。
+        """
+        self.ledger = DownloadLedger(ledger_path)
+        try:
+            ledger_udis = self.ledger.known_udis()
+            done = self.ledger.known_udis(STATE_DONE)
+            print(f"🔄 正在同步: {source_url} ...")
+            entries = self.list_playlist(source_url, known=done, stop_after_known=stop_after_known)
+            queue = [e for e in entries if e['udi'] not in done]
+            new_count = sum(1 for e in queue if e['udi'] not in ledger_udis)
+            print(f"列表 {len(entries)} 条，新增 {new_count} 条，重试未完成 {len(queue) - new_count} 条")
+            self.ledger.record_sync(source_url, seen=len(entries), added=new_count)
+        except Exception:
+            self.ledger.close()
+            self.ledger = None
+            raise
+
+        if dry_run or not queue:
+            for e in queue:
+                print(f" + {e['udi']}  {e['title']}  {e['url']}")
+            self.ledger.close()
+            self.ledger = None
+            return queue
+
+        self._run_batch(queue, need_audio, max_workers, per_host, requests_per_second)
+        return queue
+
+    def _run_batch(self, videos: List[Dict[str, str]], need_audio: bool, max_workers: int,
+                   per_host: int, requests_per_second: float) -> None:
         total = len(videos)
+        max_workers = max(1, min(max_workers, total))
+        host_limiter = HostLimiter(per_host)
+        self.rate_limiter = TokenBucket(requests_per_second, burst=max_workers)
+        # 并发时关闭 yt-dlp 的进度条，避免多路输出交错
+        self.quiet = max_workers > 1
+
+        if self.ledger is not None:
+            for video in videos:
+                self.ledger.register(video['udi'], video['url'])
+            counts = self.ledger.counts()
+            print(f"台账 {os.path.basename(self.ledger.db_path)}: 已完成 {counts.get(STATE_DONE, 0)}，"
+                  f"失败 {counts.get(STATE_FAILED, 0)}，未完成 {counts.get('pending', 0) + counts.get(STATE_RUNNING, 0)}")
+        print(f"开始处理 {total} 个任务 (并发 {max_workers}, 每站点 {per_host}, 限速 {requests_per_second}/s)...")
+
+        def run(index: int, video: Dict[str, str]):
+            with host_limiter.slot(video['url']) as host:
+                if max_workers == 1:
+                    print(f"\n--- 任务 {index}/{total} : {video['udi']} ---")
+                t0 = time.perf_counter()
+                ok = self.download_video(video, need_audio)
+                return host, ok, time.perf_counter() - t0
+
+        started = time.perf_counter()
         success = 0
+        busy = 0.0
         failed = []
+        per_host_counts: Dict[str, List[int]] = {}
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {pool.submit(run, i, video): video for i, video in enumerate(videos, 1)}
+                for done, future in enumerate(as_completed(futures), 1):
+                    video = futures[future]
+                    try:
+                        host, ok, seconds = future.result()
+                    except Exception as e:
+                        print(f"处理出错 {video['url']}: {e}")
+                        host, ok, seconds = host_key(video['url']), False, 0.0
+                    busy += seconds
+                    counts = per_host_counts.setdefault(host, [0, 0])
+                    counts[0 if ok else 1] += 1
+                    if ok:
+                        success += 1
+                    else:
+                        failed.append(f"{video['udi']} ({video['url']})")
+                    if max_workers > 1:
+                        print(f"[{done}/{total}] {'✓' if ok else '✗'} {video['udi']} ({seconds:.1f}s)")
+        finally:
+            self.close()
+            self.rate_limiter = None
+            self.quiet = False
+            if self.ledger is not None:
+                self.ledger.close()
+                self.ledger = None
+        wall = time.perf_counter() - started
 
-        print(f"开始处理 {total} 个任务...")
-        
-        for i, video in enumerate(videos, 1):
-            print(f"\n--- 任务 {i}/{total} : {video['udi']} ---")
-            if self.download_video(video, need_audio):
-                success += 1
-            else:
-                failed.append(f"{video['udi']} ({video['url']})")
-
-        print(f"\n==================================================")
+        print("\n==================================================")
         print(f"全部完成！成功: {success}/{total}")
+        print(f"总耗时 {wall:.1f}s，任务累计 {busy:.1f}s，并发收益 {busy / max(wall, 1e-6):.2f}x")
+        for host, (ok_count, fail_count) in sorted(per_host_counts.items()):
+            print(f"  {host or '(unknown)'}: 成功 {ok_count}，失败 {fail_count}")
         if failed:
             print("以下任务失败:")
             for item in failed:
                 print(f" - {item}")
-        print(f"==================================================")
+        print("==================================================")
 
 def main():
+    import argparse
+
+    # 修正：使用相对路径查找 CSV
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    default_csv = os.path.join(base_dir, 'config', 'vdc.csv')
+
+    parser = argparse.ArgumentParser(description='YouTube 视频批量下载 / 频道增量同步')
+    parser.add_argument('--csv', default=default_csv, help='视频列表 CSV (默认: config/vdc.csv)')
+    parser.add_argument('--sync', metavar='URL', action='append', default=[],
+                        help='增量同步播放列表/频道（可重复），只下载台账中没有的新视频')
+    parser.add_argument('--ledger', default=None,
+                        help='同步使用的台账 (默认: 与 CSV 共用 {csv名}.ledger.sqlite)')
+    parser.add_argument('--stop-after-known', type=int, default=30,
+                        help='同步时连续遇到 N 个已完成视频即停止翻页，0 表示列出全部 (默认: 30)')
+    parser.add_argument('--dry-run', action='store_true', help='同步时只列出将要下载的视频')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='并发任务数 (默认: 与 --per-host 相同，多出的线程只会在站点并发上限处等待)')
+    parser.add_argument('--per-host', type=int, default=2, help='每个站点的并发上限 (默认: 2)')
+    parser.add_argument('--rate', type=float, default=1.0, help='每秒请求数上限 (默认: 1.0)')
+    parser.add_argument('--no-audio', action='store_true', help='不下载音频')
+    parser.add_argument('--no-ledger', action='store_true', help='CSV 批量下载时不使用台账')
+    args = parser.parse_args()
+
+    workers = args.workers or args.per_host
     try:
         downloader = YouTubeDownloader()
-        # 修正：使用相对路径查找 CSV
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        csv_path = os.path.join(base_dir, 'config', 'vdc.csv')
-        
-        downloader.batch_download(csv_path, need_audio=True)
+        if args.sync:
+            ledger_path = args.ledger or os.path.splitext(args.csv)[0] + '.ledger.sqlite'
+            for url in args.sync:
+                downloader.sync(url, ledger_path, need_audio=not args.no_audio,
+                                max_workers=workers, per_host=args.per_host,
+                                requests_per_second=args.rate,
+                                stop_after_known=args.stop_after_known, dry_run=args.dry_run)
+        else:
+            downloader.batch_download(args.csv, need_audio=not args.no_audio,
+                                      max_workers=workers, per_host=args.per_host,
+                                      requests_per_second=args.rate, use_ledger=not args.no_ledger)
     except Exception as e:
         print(f"发生错误: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# 快速校验只读首尾各 1MB，大文件也是常数开销
+CHECKSUM_CHUNK = 1024 * 1024
+
+STATE_PENDING = 'pending'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+
+def quick_checksum(path: str) -> str:
+    """文件大小 + 首尾各 1MB 的 sha1"""
+    size = os.path.getsize(path)
+    h = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(CHECKSUM_CHUNK))
+        if size > CHECKSUM_CHUNK:
+            f.seek(max(CHECKSUM_CHUNK, size - CHECKSUM_CHUNK))
+            h.update(f.read(CHECKSUM_CHUNK))
+    return h.hexdigest()
+
+
+class DownloadLedger:
+    """
+    批量下载的任务台账（SQLite，与 CSV 放在一起）
+
+    jobs:      每个 UDI 的状态（pending/running/done/failed）、尝试次数和最后一次错误
+    artifacts: 每个产物（video/audio/srt）的路径、大小、mtime 和快速校验和
+    syncs:     播放列表/频道的最近一次同步时间与条目数
+    产物只有在下载完成后登记才算数；大小不符或内容校验不符即视为损坏。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' udi TEXT PRIMARY KEY, url TEXT, state TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated_at REAL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS artifacts ('
+            ' udi TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL,'
+            ' size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, checksum TEXT NOT NULL,'
+            ' PRIMARY KEY (udi, kind))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS syncs ('
+            ' source TEXT PRIMARY KEY, synced_at REAL NOT NULL, seen INTEGER NOT NULL, added INTEGER NOT NULL)'
+        )
+
+    @classmethod
+    def for_csv(cls, csv_path: str) -> 'DownloadLedger':
+        return cls(os.path.splitext(csv_path)[0] + '.ledger.sqlite')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def register(self, udi: str, url: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (udi, url, state, updated_at) VALUES (?, ?, ?, ?)'
+                ' ON CONFLICT(udi) DO UPDATE SET url = excluded.url',
+                (udi, url, STATE_PENDING, time.time()),
+            )
+
+    def set_state(self, udi: str, state: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, updated_at = ?,'
+                ' attempts = attempts + (CASE WHEN ? = ? THEN 1 ELSE 0 END) WHERE udi = ?',
+                (state, error, time.time(), state, STATE_RUNNING, udi),
+            )
+
+    def state(self, udi: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT state FROM jobs WHERE udi = ?', (udi,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return dict(rows)
+
+    def known_udis(self, state: Optional[str] = None) -> set:
+        with self._lock:
+            if state is None:
+                rows = self._conn.execute('SELECT udi FROM jobs')
+            else:
+                rows = self._conn.execute('SELECT udi FROM jobs WHERE state = ?', (state,))
+            return {row[0] for row in rows}
+
+    def record_sync(self, source: str, seen: int, added: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO syncs (source, synced_at, seen, added) VALUES (?, ?, ?, ?)',
+                (source, time.time(), seen, added),
+            )
+
+    def last_sync(self, source: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT synced_at, seen, added FROM syncs WHERE source = ?', (source,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'synced_at': row[0], 'seen': row[1], 'added': row[2]}
+
+    def record(self, udi: str, kind: str, path: str) -> None:
+        st = os.stat(path)
+        checksum = quick_checksum(path)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO artifacts (udi, kind, path, size, mtime_ns, checksum)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (udi, kind, os.path.abspath(path), st.st_size, st.st_mtime_ns, checksum),
+            )
+
+    def forget(self, udi: str, kind: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM artifacts WHERE udi = ? AND kind = ?', (udi, kind))
+
+    def artifact(self, udi: str, kind: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path, size, mtime_ns, checksum FROM artifacts WHERE udi = ? AND kind = ?',
+                (udi, kind),
+            ).fetchone()
+        if not row:
+            return None
+        return {'path': row[0], 'size': row[1], 'mtime_ns': row[2], 'checksum': row[3]}
+
+    def verify(self, udi: str, kind: str) -> str:
+        """
+        检查登记过的产物，返回:
+            'ok'       大小与 mtime 均未变（只做一次 stat），或 mtime 变了但内容校验一致
+            'missing'  未登记或文件不存在
+            'corrupt'  大小或校验和与登记不符
+        """
+        entry = self.artifact(udi, kind)
+        if entry is None:
+            return 'missing'
+        try:
+            st = os.stat(entry['path'])
+        except OSError:
+            return 'missing'
+        if st.st_size != entry['size']:
+            return 'corrupt'
+        if st.st_mtime_ns == entry['mtime_ns']:
+            return 'ok'
+        if quick_checksum(entry['path']) != entry['checksum']:
+            return 'corrupt'
+        # 内容没变（例如被 touch 过），刷新 mtime
+        self.record(udi, kind, entry['path'])
+        return 'ok'